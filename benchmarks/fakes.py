@@ -0,0 +1,158 @@
+import math
+import time
+import calendar
+import threading
+
+import requests
+
+from src.config import DAY_MILLISECONDS, HOUR_MILLISECONDS
+
+
+class FakeServer():
+    """
+    Simulated API server shared by the fake clients.
+
+    Every simulated request sleeps for latency seconds, and once more than rate_limit
+    requests were made in the last minute, further requests wait as a throttled client
+    would. Requests are counted per endpoint.
+    """
+    def __init__(self, latency=0.0, rate_limit=None):
+        self.latency = latency
+        self.rate_limit = rate_limit
+
+        self.calls = {}
+        self.history = []
+        self.lock = threading.Lock()
+
+    def request(self, endpoint, count=1):
+        for _ in range(count):
+            with self.lock:
+                self.calls[endpoint] = self.calls.get(endpoint, 0) + 1
+
+                wait = 0
+                if self.rate_limit:
+                    now = time.monotonic()
+                    self.history = [sent for sent in self.history if now - sent < 60]
+
+                    if len(self.history) >= self.rate_limit:
+                        wait = 60 - (now - self.history[0])
+
+                    self.history.append(now + wait)
+
+            time.sleep(wait + self.latency)
+
+    def get_total_calls(self):
+        with self.lock:
+            return sum(self.calls.values())
+
+    def reset(self):
+        with self.lock:
+            self.calls = {}
+            self.history = []
+
+
+def get_price(timestamp):
+    """
+    Deterministic price of every fake coin at a timestamp in milliseconds.
+    """
+    return 100 + 10 * math.sin(timestamp / DAY_MILLISECONDS)
+
+
+class FakeBinanceClient():
+    """
+    Stand-in for binance.client.Client, covering the endpoints BinanceClient uses.
+    """
+    KLINE_INTERVAL_1HOUR = "1h"
+
+    def __init__(self, server, symbols=("BTCUSDT", "ETHUSDT", "ADAUSDT", "BNBUSDT", "VETUSDT"), records_per_day=1):
+        self.server = server
+        self.symbols = symbols
+        self.records_per_day = records_per_day
+        self.session = requests.Session()
+
+    def get_exchange_info(self):
+        self.server.request("exchange_info")
+
+        return {"symbols": [{"symbol": symbol, "status": "TRADING"} for symbol in self.symbols]}
+
+    def get_symbol_info(self, symbol):
+        self.server.request("symbol_info")
+
+        return {"symbol": symbol} if symbol in self.symbols else None
+
+    def get_historical_klines(self, symbol, interval, start_str, end_str=None, limit=1000):
+        start = -(-int(start_str) // HOUR_MILLISECONDS) * HOUR_MILLISECONDS
+        end = int(end_str)
+
+        klines = []
+        for open_time in range(start, end + 1, HOUR_MILLISECONDS):
+            open_price = get_price(open_time)
+            close_price = get_price(open_time + HOUR_MILLISECONDS)
+
+            volume = 1000 + open_time // HOUR_MILLISECONDS % 24 * 10
+
+            klines.append([open_time, str(open_price), str(max(open_price, close_price) + 1),
+                           str(min(open_price, close_price) - 1), str(close_price), str(volume),
+                           open_time + HOUR_MILLISECONDS - 1, str(volume * (open_price + close_price) / 2),
+                           100, "0", "0", "0"])
+
+        # python-binance requests one page of klines at a time
+        self.server.request("klines", count=max(1, math.ceil(len(klines) / limit)))
+
+        return klines
+
+    def get_lending_interest_history(self, asset, startTime, endTime, size=10, **kwargs):
+        self.server.request("lending_interest_history")
+
+        return [{"asset": asset, "interest": "0.01", "lendingType": "DAILY", "productName": asset, "time": time}
+                for time in self.__get_record_times(startTime, endTime, size)]
+
+    def get_asset_dividend_history(self, asset, startTime, endTime, limit=20, **kwargs):
+        self.server.request("asset_dividend_history")
+
+        rows = [{"id": time, "tranId": time, "asset": asset, "amount": "0.5", "divTime": time, "enInfo": "Airdrop"}
+                for time in self.__get_record_times(startTime, endTime, limit)]
+
+        return {"rows": rows, "total": len(rows)}
+
+    def __get_record_times(self, start, end, limit):
+        step = DAY_MILLISECONDS // self.records_per_day
+        first = -(-start // step) * step
+
+        return list(range(first, end + 1, step))[:limit]
+
+
+class FakeGeckoClient():
+    """
+    Stand-in for pycoingecko.CoinGeckoAPI, covering the endpoints GeckoClient uses.
+    """
+    def __init__(self, server, coins=(("vethor-token", "vtho"), ("cardano", "ada"), ("dogecoin", "doge"))):
+        self.server = server
+        self.coins = coins
+        self.session = requests.Session()
+
+    def get_coins_list(self):
+        self.server.request("coins_list")
+
+        return [{"id": coin_id, "symbol": symbol, "name": coin_id.title()} for coin_id, symbol in self.coins]
+
+    def get_coin_history_by_id(self, id, date, **kwargs):
+        self.server.request("coin_history")
+
+        day, month, year = (int(part) for part in date.split("-"))
+        timestamp = calendar.timegm((year, month, day, 0, 0, 0)) * 1000
+        price = get_price(timestamp)
+
+        return {"id": id, "market_data": {"current_price": {"usd": price, "eur": price * 0.9, "cad": price * 1.3}}}
+
+    def get_coin_market_chart_range_by_id(self, id, vs_currency, from_timestamp, to_timestamp, **kwargs):
+        self.server.request("market_chart_range")
+
+        start = int(from_timestamp) * 1000
+        end = int(to_timestamp) * 1000
+        # CoinGecko returns hourly points for ranges up to 90 days, and daily points beyond that
+        step = HOUR_MILLISECONDS if end - start <= 90 * DAY_MILLISECONDS else DAY_MILLISECONDS
+        rate = {"usd": 1, "eur": 0.9, "cad": 1.3}[vs_currency]
+
+        first = -(-start // step) * step
+        return {"prices": [[timestamp, get_price(timestamp) * rate] for timestamp in range(first, end + 1, step)]}
@@ -0,0 +1,279 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import csv
+import json
+import time
+import click
+import tempfile
+import statistics
+import tracemalloc
+
+from decimal import Decimal
+from contextlib import redirect_stdout
+from datetime import datetime, timedelta
+from typing import Dict, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from binance_data_cleaner import filter_binance_csv
+from benchmarks.fakes import FakeServer, FakeBinanceClient, FakeGeckoClient
+from src.api import BinanceClient, GeckoClient
+from src.models.coin import Coin
+from src.utils import datetime_to_string
+from src.config import BINANCE_AIRDROP, BINANCE_SAVINGS, AMOUNT, OUTPUT_FORMAT_PARQUET
+
+
+BASELINES_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baselines.json")
+START_DATE = datetime(2015, 1, 1)
+
+# Smaller runs finish in milliseconds, so their throughput and memory are too noisy to gate on
+MIN_GATED_SIZE = 1000
+
+# Small savings and airdrop amounts print in scientific notation, which typed output must still store exactly
+REWARD_AMOUNTS = ["1.5", "0.00001234", "1e-05"]
+
+SCENARIOS = [
+    "process_data[binance]",
+    "process_data[coingecko]",
+    "process_data[parquet]",
+    "process_income[savings]",
+    "process_income[airdrop]",
+    "clean_binance_csv",
+]
+
+
+def run_scenario(scenario: str, size: int, server: FakeServer) -> int:
+    """
+    Runs one scenario over size days or rows in the current directory.
+
+    Args:
+        scenario (str): Name of the scenario, one of SCENARIOS
+        size (int): Number of days of rewards, or rows of the Binance export
+        server (FakeServer): Simulated server the fake clients talk to
+
+    Returns:
+        int: Number of rows processed
+    """
+    if scenario == "clean_binance_csv":
+        filter_binance_csv(input_filename="export.csv", output_filename="export_clean.csv")
+        return size
+
+    binance = BinanceClient(client=FakeBinanceClient(server=server))
+    gecko = GeckoClient(client=FakeGeckoClient(server=server), id_overrides={})
+
+    if scenario == "process_data[parquet]":
+        coin = Coin(ticker="BTC", currencies=None, output_filename="output.parquet", binance=binance, gecko=gecko,
+                    output_format=OUTPUT_FORMAT_PARQUET)
+        coin.process_data(input_filename="rewards.csv")
+        coin.write_to_disk()
+
+        check_parquet_amounts(filename="output.parquet", size=size)
+
+        return len(coin.processed_data)
+
+    if scenario.startswith("process_data"):
+        ticker = "BTC" if scenario == "process_data[binance]" else "DOGE"
+
+        coin = Coin(ticker=ticker, currencies=None, output_filename="output.csv", binance=binance, gecko=gecko)
+        coin.process_data(input_filename="rewards.csv")
+    else:
+        income_type = BINANCE_SAVINGS if scenario == "process_income[savings]" else BINANCE_AIRDROP
+        end_date = START_DATE + timedelta(days=size - 1)
+
+        coin = Coin(ticker="BNB", currencies=None, output_filename="output.csv", binance=binance, gecko=gecko)
+        coin.process_income(income_type=income_type,
+                            start_date=datetime_to_string(START_DATE),
+                            end_date=datetime_to_string(end_date))
+
+    coin.write_to_disk()
+
+    return len(coin.processed_data)
+
+
+def check_parquet_amounts(filename: str, size: int) -> None:
+    """
+    Checks that every amount of rewards.csv was written to a Parquet report exactly.
+
+    Args:
+        filename (str): Parquet report of rewards.csv
+        size (int): Number of days of rewards
+    """
+    import pyarrow.parquet
+
+    table = pyarrow.parquet.read_table(filename)
+    amounts = table.column(AMOUNT.format(ticker="BTC")).to_pylist()
+    expected = [Decimal(REWARD_AMOUNTS[day % len(REWARD_AMOUNTS)]) for day in range(size)]
+
+    if amounts != expected:
+        mismatched = next(index for index, (amount, value) in enumerate(zip(amounts, expected)) if amount != value)
+        raise ValueError(f"Parquet amount {amounts[mismatched]} of row {mismatched} should be {expected[mismatched]}")
+
+
+def write_inputs(size: int) -> None:
+    """
+    Writes the input files of every scenario to the current directory.
+
+    Args:
+        size (int): Number of days of rewards, and rows of the Binance export
+    """
+    with open("rewards.csv", "w", newline="") as write_file:
+        writer = csv.writer(write_file)
+
+        for day in range(size):
+            writer.writerow([datetime_to_string(START_DATE + timedelta(days=day)),
+                             REWARD_AMOUNTS[day % len(REWARD_AMOUNTS)], 0.01])
+
+    operations = ["Deposit", "Withdraw", "Buy", "Sell", "Fee", "Transaction Related",
+                  "Small assets exchange BNB", "POS savings interest", "Savings Interest", "Launchpool Interest"]
+
+    with open("export.csv", "w", newline="") as write_file:
+        writer = csv.writer(write_file)
+        writer.writerow(["User_ID", "UTC_Time", "Account", "Operation", "Coin", "Change", "Remark"])
+
+        for row in range(size):
+            utc_time = START_DATE + timedelta(minutes=row)
+            writer.writerow([12345678, utc_time.strftime("%Y-%m-%d %H:%M:%S"), "Spot",
+                             operations[row % len(operations)], "BNB", 0.001 * row, ""])
+
+
+def measure(scenario: str, size: int, latency: float, rate_limit: int, warmup: int, repeat: int) -> Dict[str, float]:
+    """
+    Measures throughput, API calls per row and peak memory of one scenario.
+
+    Every run happens in a fresh directory, so that caches never carry over. Warmup runs
+    come first and are discarded, so that lazy imports and first-use setup are not
+    measured, then the scenario runs repeat times for timing and API calls, and repeat
+    times under tracemalloc for peak memory, and the median of each is reported.
+
+    Returns:
+        Dict[str, float]: Dictionary of rows_per_second, calls_per_row and peak_memory_mb
+    """
+    def run_once(traced):
+        with tempfile.TemporaryDirectory() as temp_dir:
+            cwd = os.getcwd()
+            os.chdir(temp_dir)
+
+            try:
+                write_inputs(size=size)
+                server = FakeServer(latency=latency, rate_limit=rate_limit)
+
+                if traced:
+                    tracemalloc.start()
+
+                start = time.perf_counter()
+                with redirect_stdout(open(os.devnull, "w")):
+                    rows = run_scenario(scenario=scenario, size=size, server=server)
+                elapsed = time.perf_counter() - start
+
+                peak = None
+                if traced:
+                    _, peak = tracemalloc.get_traced_memory()
+                    tracemalloc.stop()
+            finally:
+                os.chdir(cwd)
+
+        return rows, elapsed, server.get_total_calls(), peak
+
+    for _ in range(warmup):
+        run_once(traced=False)
+
+    timed_runs = [run_once(traced=False) for _ in range(repeat)]
+    traced_runs = [run_once(traced=True) for _ in range(repeat)]
+
+    return {
+        "rows_per_second": round(statistics.median(rows / elapsed for rows, elapsed, _, _ in timed_runs), 1),
+        "calls_per_row": round(statistics.median(calls / rows for rows, _, calls, _ in timed_runs), 4),
+        "peak_memory_mb": round(statistics.median(peak for _, _, _, peak in traced_runs) / (1024 * 1024), 3),
+    }
+
+
+def find_regressions(scenario: str, size: int, result: Dict, baseline: Dict, tolerance: float) -> list:
+    regressions = []
+
+    # API calls are deterministic, so any increase is a regression at every size
+    if result["calls_per_row"] > baseline["calls_per_row"] + 1e-9:
+        regressions.append(f"calls/row {result['calls_per_row']} > baseline {baseline['calls_per_row']}")
+
+    if size >= MIN_GATED_SIZE:
+        if result["rows_per_second"] < baseline["rows_per_second"] * (1 - tolerance):
+            regressions.append(f"rows/s {result['rows_per_second']} < baseline {baseline['rows_per_second']}")
+
+        if result["peak_memory_mb"] > baseline["peak_memory_mb"] * (1 + tolerance):
+            regressions.append(f"peak memory {result['peak_memory_mb']} MB > baseline {baseline['peak_memory_mb']} MB")
+
+    return [f"{scenario} @ {size}: {regression}" for regression in regressions]
+
+
+@click.command()
+@click.option("--scenario", "scenarios", multiple=True, type=click.Choice(SCENARIOS), default=SCENARIOS,
+    help="Scenarios to run, defaults to all")
+@click.option("--size", "sizes", multiple=True, type=int, default=(100, 1000, 5000),
+    help="Days of rewards, or rows of the Binance export, to run each scenario with")
+@click.option("--latency", type=float, default=0.0,
+    help="Simulated seconds of latency per API request")
+@click.option("--rate-limit", type=int, default=None,
+    help="Simulated API requests allowed per minute")
+@click.option("--warmup", type=click.IntRange(min=0), default=1,
+    help="Discarded runs of each scenario and size before measuring")
+@click.option("--repeat", type=click.IntRange(min=1), default=3,
+    help="Measured runs of each scenario and size, the median is reported")
+@click.option("--tolerance", type=float, default=0.5,
+    help="Allowed fractional drop in throughput, or growth in memory, against the baselines")
+@click.option("--update-baselines", is_flag=True, default=False,
+    help="Store the results as the new baselines instead of comparing against them")
+def benchmark(scenarios: Tuple[str], sizes: Tuple[int], latency: float, rate_limit: int, warmup: int, repeat: int,
+              tolerance: float, update_baselines: bool):
+    """
+    Benchmarks the tracker offline, against simulated Binance and CoinGecko servers.
+
+    Reports rows per second, API calls per row and peak memory for each scenario and size,
+    and fails if any result regresses against benchmarks/baselines.json. API calls are
+    compared at every size, while throughput and memory are only compared from
+    MIN_GATED_SIZE up.
+
+    Args:
+        scenarios (Tuple[str]): Scenarios to run
+        sizes (Tuple[int]): Sizes to run each scenario with
+        latency (float): Simulated seconds of latency per API request
+        rate_limit (int): Simulated API requests allowed per minute
+        warmup (int): Discarded runs before measuring
+        repeat (int): Measured runs, the median of which is reported
+        tolerance (float): Allowed fractional drop in throughput or growth in memory
+        update_baselines (bool): Whether to store the results as the new baselines
+    """
+    baselines = {}
+    if os.path.exists(BASELINES_FILENAME):
+        with open(BASELINES_FILENAME) as read_file:
+            baselines = json.load(read_file)
+
+    regressions = []
+    click.echo(f"{'scenario':<28}{'size':>8}{'rows/s':>14}{'calls/row':>12}{'peak MB':>10}")
+
+    for scenario in scenarios:
+        for size in sizes:
+            result = measure(scenario=scenario, size=size, latency=latency, rate_limit=rate_limit,
+                             warmup=warmup, repeat=repeat)
+            click.echo(f"{scenario:<28}{size:>8}{result['rows_per_second']:>14}"
+                       f"{result['calls_per_row']:>12}{result['peak_memory_mb']:>10}")
+
+            if update_baselines:
+                baselines.setdefault(scenario, {})[str(size)] = result
+            elif str(size) in baselines.get(scenario, {}):
+                regressions.extend(find_regressions(scenario=scenario, size=size, result=result,
+                                                    baseline=baselines[scenario][str(size)], tolerance=tolerance))
+
+    if update_baselines:
+        with open(BASELINES_FILENAME, "w") as write_file:
+            json.dump(baselines, write_file, indent=4, sort_keys=True)
+            write_file.write("\n")
+
+        click.echo(f"Baselines written to {BASELINES_FILENAME}")
+    elif regressions:
+        click.echo("\n".join(["Regressions found:"] + regressions), err=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    benchmark()
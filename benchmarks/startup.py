@@ -0,0 +1,148 @@
+#!/usr/bin/env python
+
+import os
+import sys
+import json
+import click
+import statistics
+import subprocess
+import tempfile
+
+from typing import Dict, Tuple
+
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BASELINES_FILENAME = os.path.join(os.path.dirname(os.path.abspath(__file__)), "startup_baselines.json")
+
+# Dependencies that are slow to import, and should only load once a run needs them
+HEAVY_MODULES = ["binance", "pycoingecko", "numpy", "pyarrow", "currency_converter", "requests"]
+
+STEPS = {
+    "cli_help": "import crypto_rewards_tracker\n"
+                "try:\n"
+                "    crypto_rewards_tracker.cli(['--help'])\n"
+                "except SystemExit:\n"
+                "    pass\n",
+    "command_help": "import crypto_rewards_tracker\n"
+                    "try:\n"
+                    "    crypto_rewards_tracker.cli(['--no-cache', 'track-generic-rewards', '--help'])\n"
+                    "except SystemExit:\n"
+                    "    pass\n",
+    "import_coin": "import src.models.coin\n",
+    "build_coin": "from src.models.coin import Coin\n"
+                  "Coin(ticker='BTC', currencies=None, output_filename='output.csv')\n",
+}
+
+RUNNER = """
+import io, sys, json, time
+from contextlib import redirect_stdout
+
+sys.path.insert(0, {root!r})
+
+start = time.perf_counter()
+with redirect_stdout(io.StringIO()):
+    exec({step!r})
+elapsed = time.perf_counter() - start
+
+print(json.dumps({{"milliseconds": elapsed * 1000,
+                  "modules": sorted(name for name in {modules!r} if name in sys.modules)}}))
+"""
+
+
+def measure(step: str, repeat: int) -> Dict:
+    """
+    Measures one step in fresh interpreters, so that nothing is imported beforehand.
+
+    Each run happens in an empty directory, without a .env file or caches.
+
+    Args:
+        step (str): Name of the step, one of STEPS
+        repeat (int): Number of interpreters to run the step in
+
+    Returns:
+        Dict: Dictionary of the median milliseconds and the heavy modules the step loaded
+    """
+    code = RUNNER.format(root=ROOT, step=STEPS[step], modules=HEAVY_MODULES)
+
+    timings = []
+    with tempfile.TemporaryDirectory() as temp_dir:
+        for _ in range(repeat):
+            output = subprocess.run([sys.executable, "-c", code], cwd=temp_dir, check=True,
+                                    capture_output=True, text=True).stdout
+            result = json.loads(output.splitlines()[-1])
+            timings.append(result["milliseconds"])
+
+    return {
+        "milliseconds": round(statistics.median(timings), 1),
+        "modules": result["modules"],
+    }
+
+
+def find_regressions(step: str, result: Dict, baseline: Dict, tolerance: float) -> list:
+    regressions = []
+
+    if result["milliseconds"] > baseline["milliseconds"] * (1 + tolerance):
+        regressions.append(f"{result['milliseconds']} ms > baseline {baseline['milliseconds']} ms")
+
+    # Which modules load is deterministic, so any new one is a regression
+    added = sorted(set(result["modules"]) - set(baseline["modules"]))
+    if added:
+        regressions.append(f"now imports {', '.join(added)}")
+
+    return [f"{step}: {regression}" for regression in regressions]
+
+
+@click.command()
+@click.option("--step", "steps", multiple=True, type=click.Choice(list(STEPS)), default=list(STEPS),
+    help="Steps to measure, defaults to all")
+@click.option("--repeat", type=click.IntRange(min=1), default=5,
+    help="Fresh interpreters to run each step in, the median is reported")
+@click.option("--tolerance", type=float, default=0.5,
+    help="Allowed fractional growth in time against the baselines")
+@click.option("--update-baselines", is_flag=True, default=False,
+    help="Store the results as the new baselines instead of comparing against them")
+def benchmark(steps: Tuple[str], repeat: int, tolerance: float, update_baselines: bool):
+    """
+    Benchmarks import time and startup of the tracker.
+
+    Reports the median time of each step in a fresh interpreter, along with the heavy
+    dependencies it imported, and fails if any step regresses against
+    benchmarks/startup_baselines.json.
+
+    Args:
+        steps (Tuple[str]): Steps to measure
+        repeat (int): Fresh interpreters to run each step in
+        tolerance (float): Allowed fractional growth in time
+        update_baselines (bool): Whether to store the results as the new baselines
+    """
+    baselines = {}
+    if os.path.exists(BASELINES_FILENAME):
+        with open(BASELINES_FILENAME) as read_file:
+            baselines = json.load(read_file)
+
+    regressions = []
+    click.echo(f"{'step':<16}{'ms':>10}  heavy modules")
+
+    for step in steps:
+        result = measure(step=step, repeat=repeat)
+        click.echo(f"{step:<16}{result['milliseconds']:>10}  {', '.join(result['modules']) or '-'}")
+
+        if update_baselines:
+            baselines[step] = result
+        elif step in baselines:
+            regressions.extend(find_regressions(step=step, result=result, baseline=baselines[step],
+                                                tolerance=tolerance))
+
+    if update_baselines:
+        with open(BASELINES_FILENAME, "w") as write_file:
+            json.dump(baselines, write_file, indent=4, sort_keys=True)
+            write_file.write("\n")
+
+        click.echo(f"Baselines written to {BASELINES_FILENAME}")
+    elif regressions:
+        click.echo("\n".join(["Regressions found:"] + regressions), err=True)
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    benchmark()
@@ -1,14 +1,23 @@
 #1/usr/bin/env python
 
+import os
 import csv
 import click
+import shutil
+import tempfile
 
-from src.utils import write_csv_to_file
+from concurrent.futures import ProcessPoolExecutor
+
+from src.utils import get_output_filename, compile_operation_matcher
+from src.config import (BINANCE_EXPORT_OPERATIONS, BINANCE_EXPORT_OPERATION_PREFIXES,
+                        CLEANER_BATCH_SIZE, CLEANER_BUFFER_SIZE)
 
 
 @click.command()
 @click.argument("binance_data")
-def clean_binance_csv(binance_data: str) -> None:
+@click.option("--workers", type=click.IntRange(min=1), default=1,
+    help="Processes to filter with, splitting the file into chunks when more than one")
+def clean_binance_csv(binance_data: str, workers: int) -> None:
     """
     Generates a CSV file, based on input parameter binance_data.
 
@@ -24,40 +33,138 @@ def clean_binance_csv(binance_data: str) -> None:
     This really targets Savings and Staking, as that is calculated with
     this calculator, and therefore is not applicable in that data.
 
+    Rows are streamed from the input to the output, so memory use does not grow
+    with the size of the export. With more than one worker, the file is split into
+    byte ranges on line boundaries that are filtered in parallel and then joined in
+    order, which assumes no field contains a line break.
+
     Args:
         binance_data (str): Input Binance data
+        workers (int): Processes to filter with
+    """
+    output_filename = get_output_filename(output_prefix="binance_data")
+
+    if workers == 1:
+        filter_binance_csv(input_filename=binance_data, output_filename=output_filename)
+    else:
+        filter_binance_csv_parallel(input_filename=binance_data, output_filename=output_filename, workers=workers)
+
+    print(f"CSV File written to {output_filename}")
+
+
+def filter_binance_csv(input_filename: str, output_filename: str) -> None:
+    """
+    Streams the rows of a Binance export whose operation is kept into a new CSV.
+
+    Args:
+        input_filename (str): Input Binance data
+        output_filename (str): CSV file to write kept rows to
+    """
+    matcher = compile_operation_matcher(operations=BINANCE_EXPORT_OPERATIONS, prefixes=BINANCE_EXPORT_OPERATION_PREFIXES)
+
+    with open(input_filename, "r", newline="", buffering=CLEANER_BUFFER_SIZE) as read_file, \
+         open(output_filename, "w", newline="", buffering=CLEANER_BUFFER_SIZE) as write_file:
+        reader = csv.reader(read_file, skipinitialspace=True, delimiter=",", quotechar="|")
+        writer = csv.writer(write_file)
+
+        field_names = next(reader)
+        operation_index = field_names.index("Operation")
+        writer.writerow(field_names)
+
+        write_rows(reader=reader, writer=writer, matcher=matcher, operation_index=operation_index)
+
+
+def filter_binance_csv_parallel(input_filename: str, output_filename: str, workers: int) -> None:
     """
-    operations_to_keep = [
-        "Deposit",
-        "Withdraw",
-        "Buy",
-        "Sell",
-        "Fee",
-        "Transaction Related",
-    ]
-
-    operations_to_keep_match = [
-        "Small assets exchange"
-    ]
-
-    to_write = []
-    with open(binance_data, "r", newline="") as read_file:
-        reader = csv.DictReader(read_file, skipinitialspace=True, delimiter=",", quotechar="|")
-        field_names = reader.fieldnames
-
-        for row in reader:
-            operation = row["Operation"].strip()
-
-            # Direct match
-            if operation in operations_to_keep:
-                to_write.append(row)
-
-            # Startswith match - could be done with Regex
-            for item in operations_to_keep_match:
-                if operation.startswith(item):
-                    to_write.append(row)
-
-    write_csv_to_file(field_names=field_names, output_prefix="binance_data", data_to_write=to_write)
+    Filters a Binance export like filter_binance_csv, using several processes.
+
+    Args:
+        input_filename (str): Input Binance data
+        output_filename (str): CSV file to write kept rows to
+        workers (int): Number of processes to filter with
+    """
+    with open(input_filename, "rb") as read_file:
+        header = read_file.readline()
+        data_start = read_file.tell()
+        data_end = os.path.getsize(input_filename)
+
+    field_names = next(csv.reader([header.decode()], skipinitialspace=True, delimiter=",", quotechar="|"))
+    operation_index = field_names.index("Operation")
+
+    # A few chunks per worker keeps every process busy when chunks filter at different speeds
+    chunk_count = workers * 4
+    chunk_size = max(1, -(-(data_end - data_start) // chunk_count))
+    boundaries = list(range(data_start, data_end, chunk_size)) + [data_end]
+
+    with tempfile.TemporaryDirectory(dir=os.path.dirname(os.path.abspath(output_filename))) as temp_dir:
+        parts = [os.path.join(temp_dir, f"part_{index}.csv") for index in range(len(boundaries) - 1)]
+
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(filter_binance_csv_chunk,
+                              [input_filename] * len(parts), parts, boundaries[:-1], boundaries[1:],
+                              [data_start] * len(parts), [operation_index] * len(parts)))
+
+        with open(output_filename, "w", newline="") as write_file:
+            csv.writer(write_file).writerow(field_names)
+
+        with open(output_filename, "ab", buffering=CLEANER_BUFFER_SIZE) as write_file:
+            for part in parts:
+                with open(part, "rb") as part_file:
+                    shutil.copyfileobj(part_file, write_file, CLEANER_BUFFER_SIZE)
+
+
+def filter_binance_csv_chunk(input_filename: str, output_filename: str, start: int, end: int,
+                             data_start: int, operation_index: int) -> None:
+    """
+    Filters the lines of a Binance export that start within the byte range [start, end).
+
+    Args:
+        input_filename (str): Input Binance data
+        output_filename (str): CSV file to write kept rows to, without a header
+        start (int): Byte offset of the start of the chunk
+        end (int): Byte offset of the end of the chunk
+        data_start (int): Byte offset of the first line after the header
+        operation_index (int): Index of the Operation column
+    """
+    matcher = compile_operation_matcher(operations=BINANCE_EXPORT_OPERATIONS, prefixes=BINANCE_EXPORT_OPERATION_PREFIXES)
+
+    def read_lines(read_file):
+        read_file.seek(start)
+
+        # A line that starts before the chunk belongs to the previous chunk
+        if start > data_start:
+            read_file.seek(start - 1)
+            read_file.readline()
+
+        while read_file.tell() < end:
+            line = read_file.readline()
+            if not line:
+                break
+
+            yield line.decode()
+
+    with open(input_filename, "rb", buffering=CLEANER_BUFFER_SIZE) as read_file, \
+         open(output_filename, "w", newline="", buffering=CLEANER_BUFFER_SIZE) as write_file:
+        reader = csv.reader(read_lines(read_file), skipinitialspace=True, delimiter=",", quotechar="|")
+        writer = csv.writer(write_file)
+
+        write_rows(reader=reader, writer=writer, matcher=matcher, operation_index=operation_index)
+
+
+def write_rows(reader, writer, matcher, operation_index) -> None:
+    """
+    Writes the rows of reader whose operation matches, in batches of CLEANER_BATCH_SIZE.
+    """
+    batch = []
+    for row in reader:
+        if len(row) > operation_index and matcher.match(row[operation_index].strip()):
+            batch.append(row)
+
+            if len(batch) == CLEANER_BATCH_SIZE:
+                writer.writerows(batch)
+                batch = []
+
+    writer.writerows(batch)
 
 
 if __name__ == "__main__":
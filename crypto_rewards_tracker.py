@@ -1,12 +1,23 @@
 #!/usr/bin/env python
 
+import os
+import sys
+import json
 import click
+import cProfile
 
 from typing import Tuple
 
 # Importing data
-from src.models.coin import Coin
-from src.config import BINANCE_AIRDROP, BINANCE_SAVINGS
+# Modules that pull in NumPy, the API clients or pyarrow are imported by the commands that use them,
+# so that --help and argument errors stay fast
+from src import profiling
+from src.cache import PriceCache, clear_json_cache
+from src.config import (FIAT_USD, BINANCE_AIRDROP, BINANCE_SAVINGS, SOURCE_BINANCE, SOURCE_COINGECKO, STREAM_WINDOW_SIZE,
+                        MANIFEST_WORKERS, PROFILE_FORMATS, PRICE_METHODS, PRICE_METHOD_AVERAGE,
+                        OUTPUT_FORMATS, OUTPUT_FORMAT_CSV, OUTPUT_FORMAT_ARROW, OUTPUT_COMPRESSIONS,
+                        COMMAND_BINANCE_REWARDS, COMMAND_GENERIC_REWARDS, SERVER_SOCKET, SERVER_COMMAND_PING,
+                        SERVER_COMMAND_PRICE, SERVER_COMMAND_SHUTDOWN, ROLLUP_FILENAME)
 
 
 @click.group()
@@ -15,13 +26,55 @@ from src.config import BINANCE_AIRDROP, BINANCE_SAVINGS
     help="Output filename, will be generated if not specified")
 @click.option("--currencies", multiple=True, default=None,
     help="Additional currencies to process for")
-def cli(ctx: click.Context, output_filename: str, currencies: Tuple[str]):
+@click.option("--no-cache", is_flag=True, default=False,
+    help="Bypass the on-disk price cache")
+@click.option("--clear-cache", is_flag=True, default=False,
+    help="Clear the on-disk price and symbol caches before running")
+@click.option("--offline", is_flag=True, default=False,
+    help="Use cached exchange rates without refreshing them")
+@click.option("--binance-concurrency", type=click.IntRange(min=1), default=None,
+    help="Maximum concurrent Binance price requests")
+@click.option("--gecko-concurrency", type=click.IntRange(min=1), default=None,
+    help="Maximum concurrent CoinGecko price requests")
+@click.option("--price-method", type=click.Choice(PRICE_METHODS), default=PRICE_METHOD_AVERAGE,
+    help="How a day's price is computed from Binance hourly klines, defaults to average of open and close")
+@click.option("--format", "output_format", type=click.Choice(OUTPUT_FORMATS), default=OUTPUT_FORMAT_CSV,
+    help="Output file format, defaults to csv")
+@click.option("--compression", type=click.Choice(OUTPUT_COMPRESSIONS), default=None,
+    help="Compression of Parquet and Arrow output, defaults to snappy for Parquet and none for Arrow")
+@click.option("--dataset", type=click.Path(file_okay=False), default=None,
+    help="Append rows to a Parquet or Arrow dataset in this directory, partitioned by ticker and year")
+@click.option("--rollup", "rollup_filename", type=click.Path(dir_okay=False), default=None,
+    help="Also add the written rows to this rollup of monthly and yearly totals")
+@click.option("--profile", "profile_format", type=click.Choice(PROFILE_FORMATS), default=None,
+    help="Report per-stage timings, API calls and cache hits at exit")
+@click.option("--profile-output", type=click.Path(), default=None,
+    help="File to write the profile report to, defaults to stderr")
+@click.option("--cprofile", "cprofile_filename", type=click.Path(), default=None,
+    help="Capture a cProfile of the main thread into this file")
+def cli(ctx: click.Context, output_filename: str, currencies: Tuple[str], no_cache: bool, clear_cache: bool,
+        offline: bool, binance_concurrency: int, gecko_concurrency: int, price_method: str, output_format: str,
+        compression: str, dataset: str, rollup_filename: str, profile_format: str, profile_output: str,
+        cprofile_filename: str):
     """
     Cryptocurrency Rewards Tracker entrypoint.
 
     Args:
         output_filename (str): Output file name, if not specified, will be generated
         currencies (Tuple[str]): Tuple of additional currencies to process for
+        no_cache (bool): Whether to bypass the on-disk price cache
+        clear_cache (bool): Whether to clear the on-disk price and symbol caches before running
+        offline (bool): Whether to use cached exchange rates without refreshing them
+        binance_concurrency (int): Maximum concurrent Binance price requests
+        gecko_concurrency (int): Maximum concurrent CoinGecko price requests
+        price_method (str): How a day's price is computed from Binance hourly klines
+        output_format (str): Output file format, csv, parquet or arrow
+        compression (str): Compression of Parquet and Arrow output, if not the format's default
+        dataset (str): Directory of a Parquet or Arrow dataset to append rows to, instead of writing a file
+        rollup_filename (str): Rollup file to add the written rows to, if any
+        profile_format (str): Format of the profile report to print at exit, if any
+        profile_output (str): File to write the profile report to, instead of stderr
+        cprofile_filename (str): File to write a cProfile capture of the main thread to, if any
 
     """
     # Ensure that ctx.obj exists and is a dict (in case `cli()` is called outside of main)
@@ -29,6 +82,101 @@ def cli(ctx: click.Context, output_filename: str, currencies: Tuple[str]):
 
     ctx.obj["OUTPUT_FILENAME"] = output_filename
     ctx.obj["CURRENCIES"] = list(currencies)
+    ctx.obj["CONCURRENCY"] = {
+        SOURCE_BINANCE: binance_concurrency,
+        SOURCE_COINGECKO: gecko_concurrency,
+    }
+    ctx.obj["PRICE_METHOD"] = price_method
+
+    if dataset and output_format == OUTPUT_FORMAT_CSV:
+        raise click.UsageError("--dataset requires --format parquet or --format arrow")
+
+    if compression and output_format == OUTPUT_FORMAT_CSV:
+        raise click.UsageError("--compression only applies to --format parquet or --format arrow")
+
+    if output_format == OUTPUT_FORMAT_ARROW and compression not in (None, "none", "lz4", "zstd"):
+        raise click.UsageError("Arrow output only supports lz4 and zstd compression")
+
+    ctx.obj["OUTPUT"] = {
+        "output_format": output_format,
+        "compression": compression,
+        "dataset": dataset,
+    }
+
+    ctx.obj["ROLLUP"] = None
+    if rollup_filename:
+        from src.rollup import Rollup
+
+        ctx.obj["ROLLUP"] = Rollup.load(rollup_filename) if os.path.exists(rollup_filename) else Rollup()
+        ctx.obj["ROLLUP_FILENAME"] = rollup_filename
+
+    if offline:
+        from src.fx import set_offline
+
+        set_offline(True)
+
+    # The price cache is only opened by the commands that price rows, see get_cache
+    ctx.obj["NO_CACHE"] = no_cache
+    ctx.obj["CACHE"] = None
+    if clear_cache:
+        cache = PriceCache()
+        cache.clear()
+        clear_json_cache()
+
+        ctx.obj["CACHE"] = None if no_cache else cache
+
+    if profile_format:
+        profiling.enable()
+        ctx.call_on_close(lambda: write_profile(profile_format=profile_format, profile_output=profile_output))
+
+    if cprofile_filename:
+        profiler = cProfile.Profile()
+        profiler.enable()
+        ctx.call_on_close(lambda: (profiler.disable(), profiler.dump_stats(cprofile_filename)))
+
+
+@cli.result_callback()
+@click.pass_context
+def save_rollup(ctx: click.Context, result, **kwargs):
+    """
+    Saves the rollup the run added its rows to, once the command has succeeded.
+    """
+    if ctx.obj["ROLLUP"] is not None:
+        ctx.obj["ROLLUP"].save(ctx.obj["ROLLUP_FILENAME"])
+
+
+def get_cache(ctx: click.Context) -> PriceCache:
+    """
+    Gets the price cache of the run, opening it on first use.
+
+    Args:
+        ctx (click.Context): Click context object
+
+    Returns:
+        PriceCache: Shared price cache, or None with --no-cache
+    """
+    if ctx.obj["CACHE"] is None and not ctx.obj["NO_CACHE"]:
+        ctx.obj["CACHE"] = PriceCache()
+
+    return ctx.obj["CACHE"]
+
+
+def write_profile(profile_format: str, profile_output: str) -> None:
+    """
+    Writes the profile report of the run.
+
+    Args:
+        profile_format (str): Format of the report, text or json
+        profile_output (str): File to write the report to, or None for stderr
+    """
+    report = profiling.get_report()
+    content = json.dumps(report, indent=4) if profile_format == "json" else profiling.format_report(report)
+
+    if profile_output:
+        with open(profile_output, "w") as write_file:
+            write_file.write(content + "\n")
+    else:
+        print(content, file=sys.stderr)
 
 
 @cli.command()
@@ -38,7 +186,12 @@ def cli(ctx: click.Context, output_filename: str, currencies: Tuple[str]):
 @click.argument("end_date")
 @click.option("--income_type", type=click.Choice([BINANCE_AIRDROP, BINANCE_SAVINGS]), default=BINANCE_AIRDROP,
     help="Income type for Binance, defaults to AIRDROP")
-def track_binance_rewards(ctx: click.Context, ticker: str, start_date: str, end_date: str, income_type: str):
+@click.option("--incremental", is_flag=True, default=False,
+    help="Only fetch records newer than the last run and append them to its output")
+@click.option("--group-by-day", is_flag=True, default=False,
+    help="Sum the records of each day into one row")
+def track_binance_rewards(ctx: click.Context, ticker: str, start_date: str, end_date: str, income_type: str,
+                          incremental: bool, group_by_day: bool):
     """
     Tracks Binance Airdrops and Savings.
 
@@ -55,17 +208,53 @@ def track_binance_rewards(ctx: click.Context, ticker: str, start_date: str, end_
         start_date (str): Start date to process from
         end_date (str): End date to process to
         income_type (str): Income type
+        incremental (bool): Whether to only fetch records newer than the last run and append them to its output
+        group_by_day (bool): Whether to sum the records of each day into one row
     """
-    coin = Coin(ticker=ticker, currencies=ctx.obj["CURRENCIES"], output_filename=ctx.obj["OUTPUT_FILENAME"])
-    coin.process_income(income_type=income_type, start_date=start_date, end_date=end_date)
-    coin.write_to_disk()
+    from src.fx import get_native_currencies
+    from src.models.coin import Coin
+    from src.checkpoint import Checkpoint
+
+    output_filename = ctx.obj["OUTPUT_FILENAME"]
+
+    # Binance only prices in USD, so every other currency needs an ECB rate
+    try:
+        get_native_currencies(currencies=[currency.upper() for currency in ctx.obj["CURRENCIES"]
+                                          if currency.upper() != FIAT_USD], source=SOURCE_BINANCE)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="--currencies")
+
+    if incremental and (ctx.obj["OUTPUT"]["output_format"] != OUTPUT_FORMAT_CSV or ctx.obj["OUTPUT"]["dataset"]):
+        raise click.UsageError("--incremental only supports CSV output")
+
+    if incremental and group_by_day:
+        raise click.UsageError("--incremental cannot be combined with --group-by-day")
+
+    if incremental:
+        checkpoint = Checkpoint(ticker=ticker, income_type=income_type)
+        output_filename = output_filename or checkpoint.output_filename
+
+    coin = Coin(ticker=ticker, currencies=ctx.obj["CURRENCIES"], output_filename=output_filename,
+                cache=get_cache(ctx), concurrency=ctx.obj["CONCURRENCY"],
+                price_method=ctx.obj["PRICE_METHOD"], rollup=ctx.obj["ROLLUP"], **ctx.obj["OUTPUT"])
+
+    if incremental:
+        coin.stream_income(income_type=income_type, start_date=start_date, end_date=end_date, checkpoint=checkpoint)
+    else:
+        coin.process_income(income_type=income_type, start_date=start_date, end_date=end_date,
+                            group_by_day=group_by_day)
+        coin.write_to_disk()
 
 
 @cli.command()
 @click.pass_context
 @click.argument("ticker")
 @click.argument("input_filename", type=click.Path())
-def track_generic_rewards(ctx: click.Context, ticker: str, input_filename: str):
+@click.option("--stream", is_flag=True, default=False,
+    help="Price and write rows in windows instead of all at once")
+@click.option("--window-size", type=click.IntRange(min=1), default=STREAM_WINDOW_SIZE,
+    help="Rows priced and written together when streaming")
+def track_generic_rewards(ctx: click.Context, ticker: str, input_filename: str, stream: bool, window_size: int):
     """
     Tracks generic crypto rewards from staking.
 
@@ -73,13 +262,409 @@ def track_generic_rewards(ctx: click.Context, ticker: str, input_filename: str):
         ctx (click.Context): Click context object
         ticker (str): Ticker of the cryptocurrency
         input_filename (str): CSV file to read from that contains reward information
+        stream (bool): Whether to price and write rows in windows instead of all at once
+        window_size (int): Rows priced and written together when streaming
+    """
+    from src.models.coin import Coin
+
+    coin = Coin(ticker=ticker, currencies=ctx.obj["CURRENCIES"], output_filename=ctx.obj["OUTPUT_FILENAME"],
+                cache=get_cache(ctx), concurrency=ctx.obj["CONCURRENCY"],
+                price_method=ctx.obj["PRICE_METHOD"], rollup=ctx.obj["ROLLUP"], **ctx.obj["OUTPUT"])
+    if stream:
+        coin.stream_data(input_filename=input_filename, window_size=window_size)
+    else:
+        coin.process_data(input_filename=input_filename)
+        coin.write_to_disk()
+
+
+@cli.command()
+@click.pass_context
+@click.argument("manifest_filename", type=click.Path(exists=True))
+@click.option("--workers", type=click.IntRange(min=1), default=MANIFEST_WORKERS,
+    help="Jobs that load or write in parallel")
+def run_manifest(ctx: click.Context, manifest_filename: str, workers: int):
+    """
+    Runs every job of a JSON or YAML manifest together.
+
+    Each job is a track-binance-rewards or track-generic-rewards run, for example
+    {"ticker": "ADA", "command": "track-binance-rewards", "start_date": "01/01/2021",
+    "end_date": "12/31/2021", "income_type": "SAVINGS"}. Jobs share clients, and prices
+    needed by several jobs are fetched once.
+
+    Args:
+        ctx (click.Context): Click context object
+        manifest_filename (str): Manifest file listing the jobs to run
+        workers (int): Jobs that load or write in parallel
+    """
+    from src.manifest import ManifestRunner, load_manifest
+
+    try:
+        jobs = load_manifest(manifest_filename=manifest_filename)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="MANIFEST_FILENAME")
+
+    runner = ManifestRunner(jobs=jobs, currencies=ctx.obj["CURRENCIES"], cache=get_cache(ctx),
+                            concurrency=ctx.obj["CONCURRENCY"], workers=workers,
+                            price_method=ctx.obj["PRICE_METHOD"], rollup=ctx.obj["ROLLUP"], **ctx.obj["OUTPUT"])
+    runner.run()
+
+
+
+@cli.command()
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+def import_klines(paths: Tuple[str]):
+    """
+    Imports Binance hourly kline dumps into the local kline store.
+
+    Dumps are the monthly or daily files published at data.binance.vision, such as
+    BTCUSDT-1h-2021-01.zip, either zipped or extracted. Directories are searched for
+    dumps. Prices for days the imported dumps cover are then computed locally instead
+    of being fetched.
+
+    Args:
+        paths (Tuple[str]): Dump files, or directories containing them
+    """
+    from src.klines import KlineStore
+
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            filenames.extend(sorted(os.path.join(path, name) for name in os.listdir(path)
+                                    if name.endswith((".zip", ".csv"))))
+        else:
+            filenames.append(path)
+
+    try:
+        imported = KlineStore().import_files(filenames=filenames)
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="PATHS")
+
+    for symbol, klines in imported.items():
+        print(f"{symbol}: {klines} klines stored")
+
+
+@cli.command()
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True, dir_okay=False))
+def ingest_export(paths: Tuple[str]):
+    """
+    Ingests Binance transaction exports into the local export store.
+
+    Each export is read once and stored indexed by time, coin and operation, so that
+    query can pull filtered extracts without reading the export again. Only rows that
+    are not stored yet are added, so ingesting overlapping or newer exports never
+    duplicates rows, and exports of several accounts can share the store.
+
+    Args:
+        paths (Tuple[str]): Binance export CSV files
+    """
+    from src.exports import ExportStore
+
+    store = ExportStore()
+    try:
+        for path in paths:
+            try:
+                rows = store.ingest(filename=path)
+            except ValueError as error:
+                raise click.BadParameter(str(error), param_hint="PATHS")
+
+            print(f"{path}: {rows} new rows stored")
+    finally:
+        store.close()
+
+
+@cli.command()
+@click.pass_context
+@click.option("--operation", "operations", multiple=True, default=None,
+    help="Operation to keep, can be given more than once")
+@click.option("--operation-prefix", "operation_prefixes", multiple=True, default=None,
+    help="Prefix of operations to keep, can be given more than once")
+@click.option("--coin", "coins", multiple=True, default=None,
+    help="Coin to keep, can be given more than once")
+@click.option("--start", "start_date", default=None,
+    help="First day to keep, as mm/dd/yyyy")
+@click.option("--end", "end_date", default=None,
+    help="Last day to keep, as mm/dd/yyyy")
+@click.option("--cleaned", is_flag=True, default=False,
+    help="Keep the operations binance_data_cleaner.py keeps")
+def query(ctx: click.Context, operations: Tuple[str], operation_prefixes: Tuple[str], coins: Tuple[str],
+          start_date: str, end_date: str, cleaned: bool):
+    """
+    Writes the rows of ingested Binance exports that match every filter to a CSV file.
+
+    Rows are read from the export store through its indexes, in time order, so an
+    extract only costs the rows it returns. With --cleaned, the operations kept are the
+    ones binance_data_cleaner.py keeps, but unlike the cleaner's output, rows of every
+    ingested export are merged in time order under the standard export columns, rather
+    than kept in the order and with the columns of their export.
+
+    Args:
+        ctx (click.Context): Click context object
+        operations (Tuple[str]): Operations to keep
+        operation_prefixes (Tuple[str]): Prefixes of operations to keep
+        coins (Tuple[str]): Coins to keep
+        start_date (str): First day to keep
+        end_date (str): Last day to keep
+        cleaned (bool): Whether to keep the operations the cleaner keeps
+    """
+    import csv
+
+    from src.exports import ExportStore
+    from src.utils import get_output_filename, string_to_datetime
+    from src.config import (BINANCE_EXPORT_FIELDS, BINANCE_EXPORT_OPERATIONS, BINANCE_EXPORT_OPERATION_PREFIXES,
+                            CLEANER_BUFFER_SIZE)
+
+    if cleaned:
+        operations = tuple(operations) + tuple(BINANCE_EXPORT_OPERATIONS)
+        operation_prefixes = tuple(operation_prefixes) + tuple(BINANCE_EXPORT_OPERATION_PREFIXES)
+
+    dates = {}
+    for name, date in [("--start", start_date), ("--end", end_date)]:
+        try:
+            dates[name] = string_to_datetime(date) if date else None
+        except ValueError:
+            raise click.BadParameter(f"{date} is not a mm/dd/yyyy date", param_hint=name)
+
+    output_filename = ctx.obj["OUTPUT_FILENAME"] or get_output_filename(output_prefix="binance_data")
+
+    store = ExportStore()
+    try:
+        rows = store.query(operations=operations, operation_prefixes=operation_prefixes, coins=coins,
+                           start_date=dates["--start"], end_date=dates["--end"])
+
+        written = 0
+        with open(output_filename, "w", newline="", buffering=CLEANER_BUFFER_SIZE) as write_file:
+            writer = csv.writer(write_file)
+            writer.writerow(BINANCE_EXPORT_FIELDS)
+
+            for row in rows:
+                writer.writerow(row)
+                written += 1
+    finally:
+        store.close()
+
+    print(f"{written} rows written to {output_filename}")
+
+
+@cli.command()
+@click.pass_context
+@click.argument("paths", nargs=-1, required=True, type=click.Path(exists=True))
+@click.option("--replace", is_flag=True, default=False,
+    help="Replace the output instead of merging into it")
+def summarize(ctx: click.Context, paths: Tuple[str], replace: bool):
     """
+    Totals amount, value and fees per ticker, month, year and currency across reports.
+
+    Reports written by the tracker, as CSV, Parquet or Arrow files or directories of
+    them, are read in chunks and totalled into a rollup, which is merged into the output
+    if it exists, so new reports can be added without reading old ones again. Reports
+    the rollup already has are skipped if unchanged, and replace their earlier totals
+    otherwise, so summarizing the same reports again never counts them twice. Saved
+    rollups can be given as paths too, and are merged the same way.
+
+    Args:
+        ctx (click.Context): Click context object
+        paths (Tuple[str]): Reports, rollups, or directories containing reports
+        replace (bool): Whether to replace the output instead of merging into it
+    """
+    from src.rollup import Rollup, COLUMNAR_EXTENSIONS
+
+    output_filename = ctx.obj["OUTPUT_FILENAME"] or ROLLUP_FILENAME
+
+    filenames = []
+    for path in paths:
+        if os.path.isdir(path):
+            for directory, _, names in sorted(os.walk(path)):
+                filenames.extend(os.path.join(directory, name) for name in sorted(names)
+                                 if name.endswith((".csv",) + COLUMNAR_EXTENSIONS))
+        else:
+            filenames.append(path)
+
+    # The output may sit among the reports, and is merged below unless replaced
+    filenames = [filename for filename in filenames if os.path.abspath(filename) != os.path.abspath(output_filename)]
+
+    rollup = Rollup.load(output_filename) if os.path.exists(output_filename) and not replace else Rollup()
+    skipped = 0
+    for filename in filenames:
+        try:
+            skipped += not rollup.add_file(filename=filename)
+        except (ValueError, KeyError) as error:
+            raise click.BadParameter(f"{filename} is not a report or rollup: {error}", param_hint="PATHS")
+
+    rollup.save(output_filename)
+    print(f"Rollup of {len(filenames)} files written to {output_filename}, {skipped} unchanged since last summarized")
+
+
+@cli.command()
+@click.pass_context
+@click.option("--socket", "socket_path", type=click.Path(), default=SERVER_SOCKET,
+    help="Unix socket to listen on")
+def serve(ctx: click.Context, socket_path: str):
+    """
+    Runs a tracker server that keeps clients, exchange rates and prices loaded.
+
+    Price lookups and reports are requested over a Unix socket, with the client command
+    or any program speaking its JSON lines protocol, and repeated requests are answered
+    from memory. The global options apply to every request, unless the request overrides
+    its currencies or output.
+
+    Args:
+        ctx (click.Context): Click context object
+        socket_path (str): Unix socket to listen on
+    """
+    from src.server import TrackerServer
+
+    server = TrackerServer(socket_path=socket_path, currencies=ctx.obj["CURRENCIES"], cache=get_cache(ctx),
+                           concurrency=ctx.obj["CONCURRENCY"], price_method=ctx.obj["PRICE_METHOD"],
+                           **ctx.obj["OUTPUT"])
+    try:
+        server.serve()
+    except ValueError as error:
+        raise click.BadParameter(str(error), param_hint="--socket")
+
+
+@cli.group()
+@click.pass_context
+@click.option("--socket", "socket_path", type=click.Path(), default=SERVER_SOCKET,
+    help="Unix socket of the tracker server")
+def client(ctx: click.Context, socket_path: str):
+    """
+    Sends requests to a tracker server started with serve.
+
+    Args:
+        ctx (click.Context): Click context object
+        socket_path (str): Unix socket of the tracker server
+    """
+    ctx.obj["SOCKET"] = socket_path
+
+
+def send_request(ctx: click.Context, command: str, **arguments):
+    """
+    Sends one request to the tracker server.
+
+    Args:
+        ctx (click.Context): Click context object
+        command (str): Command to run
+        arguments: Arguments of the command
+
+    Returns:
+        Result of the command
+    """
+    from src.protocol import ServerConnection
+
+    try:
+        with ServerConnection(socket_path=ctx.obj["SOCKET"]) as connection:
+            return connection.request(command, **arguments)
+    except ValueError as error:
+        raise click.ClickException(str(error))
+
+
+def get_job_options(ctx: click.Context) -> dict:
+    """
+    Gets the global options given on the command line that apply to a report.
+
+    Options that were not given are left out, so that the server's own defaults apply.
+
+    Args:
+        ctx (click.Context): Click context object
+
+    Returns:
+        dict: Dictionary of request keys to their values
+    """
+    root = ctx.find_root()
+
+    options = {}
     if ctx.obj["CURRENCIES"]:
-        print("Note: Additional currencies are not supported at this moment.")
+        options["currencies"] = ctx.obj["CURRENCIES"]
+    if ctx.obj["OUTPUT_FILENAME"]:
+        options["output"] = os.path.abspath(ctx.obj["OUTPUT_FILENAME"])
+
+    for key, value in ctx.obj["OUTPUT"].items():
+        if root.get_parameter_source(key) != click.core.ParameterSource.DEFAULT:
+            options[key] = os.path.abspath(value) if key == "dataset" else value
 
-    coin = Coin(ticker=ticker, currencies=None, output_filename=ctx.obj["OUTPUT_FILENAME"])
-    coin.process_data(input_filename=input_filename)
-    coin.write_to_disk()
+    return options
+
+
+@client.command("ping")
+@click.pass_context
+def client_ping(ctx: click.Context):
+    """
+    Checks that the tracker server is running.
+    """
+    print(send_request(ctx, SERVER_COMMAND_PING))
+
+
+@client.command("price")
+@click.pass_context
+@click.argument("ticker")
+@click.argument("dates", nargs=-1, required=True)
+def client_price(ctx: click.Context, ticker: str, dates: Tuple[str]):
+    """
+    Prints the prices of a cryptocurrency on each date, as JSON.
+
+    Args:
+        ctx (click.Context): Click context object
+        ticker (str): Ticker of the cryptocurrency
+        dates (Tuple[str]): Dates to price, as mm/dd/yyyy
+    """
+    prices = send_request(ctx, SERVER_COMMAND_PRICE, ticker=ticker, dates=list(dates),
+                          currencies=ctx.obj["CURRENCIES"] or None)
+    print(json.dumps(prices, indent=4))
+
+
+@client.command(COMMAND_BINANCE_REWARDS)
+@click.pass_context
+@click.argument("ticker")
+@click.argument("start_date")
+@click.argument("end_date")
+@click.option("--income_type", type=click.Choice([BINANCE_AIRDROP, BINANCE_SAVINGS]), default=BINANCE_AIRDROP,
+    help="Income type for Binance, defaults to AIRDROP")
+@click.option("--group-by-day", is_flag=True, default=False,
+    help="Sum the records of each day into one row")
+def client_track_binance_rewards(ctx: click.Context, ticker: str, start_date: str, end_date: str, income_type: str,
+                                 group_by_day: bool):
+    """
+    Tracks Binance Airdrops and Savings on the tracker server.
+
+    Args:
+        ctx (click.Context): Click context object
+        ticker (str): Ticker of the cryptocurrency
+        start_date (str): Start date to process from
+        end_date (str): End date to process to
+        income_type (str): Income type
+        group_by_day (bool): Whether to sum the records of each day into one row
+    """
+    result = send_request(ctx, COMMAND_BINANCE_REWARDS, ticker=ticker, start_date=start_date, end_date=end_date,
+                          income_type=income_type, group_by_day=group_by_day, **get_job_options(ctx))
+    print(f"{result['rows']} rows written to {result['output']}")
+
+
+@client.command(COMMAND_GENERIC_REWARDS)
+@click.pass_context
+@click.argument("ticker")
+@click.argument("input_filename", type=click.Path(exists=True))
+def client_track_generic_rewards(ctx: click.Context, ticker: str, input_filename: str):
+    """
+    Tracks generic crypto rewards from staking on the tracker server.
+
+    Args:
+        ctx (click.Context): Click context object
+        ticker (str): Ticker of the cryptocurrency
+        input_filename (str): CSV file to read from that contains reward information
+    """
+    result = send_request(ctx, COMMAND_GENERIC_REWARDS, ticker=ticker, input_filename=os.path.abspath(input_filename),
+                          **get_job_options(ctx))
+    print(f"{result['rows']} rows written to {result['output']}")
+
+
+@client.command("stop")
+@click.pass_context
+def client_stop(ctx: click.Context):
+    """
+    Stops the tracker server.
+    """
+    send_request(ctx, SERVER_COMMAND_SHUTDOWN)
+    print("Tracker server stopping")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,91 @@
+import numpy
+
+from typing import Dict
+
+from src.config import PRICE_METHOD_AVERAGE, PRICE_METHOD_VWAP, PRICE_METHOD_TWAP, PRICE_METHOD_CLOSE
+
+
+# Kline columns each price method reads, besides open_time
+REQUIRED_COLUMNS = {
+    PRICE_METHOD_AVERAGE: ["open", "close"],
+    PRICE_METHOD_VWAP: ["open", "high", "low", "close", "volume", "quote_volume"],
+    PRICE_METHOD_TWAP: ["open", "high", "low", "close"],
+    PRICE_METHOD_CLOSE: ["close"],
+}
+
+
+def sum_windows(values: numpy.ndarray, first: numpy.ndarray, last: numpy.ndarray) -> numpy.ndarray:
+    """
+    Sums every values[first[i]:last[i]] slice in one pass.
+
+    Args:
+        values (numpy.ndarray): Values to sum
+        first (numpy.ndarray): Inclusive start index of each slice
+        last (numpy.ndarray): Exclusive end index of each slice, not before its start
+
+    Returns:
+        numpy.ndarray: Sum of each slice, zero for empty slices
+    """
+    if not len(first):
+        return numpy.zeros(0)
+
+    # reduceat over interleaved bounds sums each slice, with a trailing zero so that last may equal len(values)
+    padded = numpy.append(numpy.asarray(values, dtype="<f8"), 0.0)
+    bounds = numpy.empty(2 * len(first), dtype=numpy.intp)
+    bounds[0::2] = first
+    bounds[1::2] = last
+
+    sums = numpy.add.reduceat(padded, bounds)[0::2]
+
+    # reduceat gives values[first] rather than zero for empty slices
+    return numpy.where(last > first, sums, 0.0)
+
+
+def aggregate_klines(klines: Dict[str, numpy.ndarray], window_starts: numpy.ndarray, window_ends: numpy.ndarray,
+                     method: str=PRICE_METHOD_AVERAGE) -> numpy.ndarray:
+    """
+    Computes one price per time window from klines, for every window at once.
+
+    Methods are:
+    - average: mean over the window of the (open + close) / 2 of each kline
+    - vwap: quote volume traded over base volume traded, falling back to twap for
+      windows without any volume
+    - twap: mean over the window of the (open + high + low + close) / 4 of each kline
+    - close: close of the last kline of the window
+
+    Args:
+        klines (Dict[str, numpy.ndarray]): Columns of klines sorted by open_time, with at
+            least open_time and the REQUIRED_COLUMNS of method
+        window_starts (numpy.ndarray): Inclusive start timestamps of sorted, non-overlapping
+            windows, in milliseconds
+        window_ends (numpy.ndarray): Inclusive end timestamps of the windows, in milliseconds
+        method (str): Price method, one of PRICE_METHODS
+
+    Returns:
+        numpy.ndarray: Price of each window, or NaN for windows without klines
+    """
+    if method not in REQUIRED_COLUMNS:
+        raise ValueError(f"Unknown price method {method}")
+
+    first = numpy.searchsorted(klines["open_time"], window_starts, side="left")
+    last = numpy.searchsorted(klines["open_time"], window_ends, side="right")
+    sizes = last - first
+
+    if not len(klines["open_time"]):
+        return numpy.full(len(sizes), numpy.nan)
+
+    if method == PRICE_METHOD_CLOSE:
+        prices = numpy.asarray(klines["close"], dtype="<f8")[numpy.maximum(last - 1, 0)]
+    elif method == PRICE_METHOD_AVERAGE:
+        prices = sum_windows((klines["open"] + klines["close"]) / 2, first, last) / numpy.maximum(sizes, 1)
+    else:
+        typical = (klines["open"] + klines["high"] + klines["low"] + klines["close"]) / 4
+        prices = sum_windows(typical, first, last) / numpy.maximum(sizes, 1)
+
+        if method == PRICE_METHOD_VWAP:
+            volumes = sum_windows(klines["volume"], first, last)
+            traded = volumes > 0
+
+            prices[traded] = sum_windows(klines["quote_volume"], first, last)[traded] / volumes[traded]
+
+    return numpy.where(sizes > 0, prices, numpy.nan)
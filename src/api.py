@@ -1,30 +1,73 @@
 import math
+import threading
+
+import numpy
+
+from bisect import bisect_right
+from operator import itemgetter
+from datetime import datetime, timedelta, timezone
+
+from src.config import (FIAT_USD, BINANCE_AIRDROP, BINANCE_SAVINGS, SOURCE_BINANCE, SOURCE_COINGECKO,
+                        BINANCE_KLINE_LIMIT, HOUR_MILLISECONDS, DAY_MILLISECONDS,
+                        BINANCE_SAVINGS_LIMIT, BINANCE_SAVINGS_MAX_DAYS, BINANCE_DIVIDEND_LIMIT, BINANCE_DIVIDEND_MAX_DAYS,
+                        BINANCE_SYMBOLS_FILENAME, BINANCE_SYMBOLS_TTL,
+                        GECKO_COINS_FILENAME, GECKO_COINS_TTL, GECKO_ID_OVERRIDES, GECKO_RANGE_MARGIN,
+                        KLINE_STORE_INTERVAL, PRICE_METHOD_AVERAGE)
+from src.fx import RateTable
+from src.klines import KlineStore
+from src.aggregation import REQUIRED_COLUMNS, aggregate_klines
+from src.paginator import Paginator
+from src.profiling import profiled, timed, count
+from src.transport import get_transport
+from src.cache import read_json_cache, write_json_cache
+from src.utils import get_timestamp_milliseconds
 
-from pytz import utc
-from datetime import datetime, timedelta
 
-from dotenv import dotenv_values
-from binance.client import Client
-from pycoingecko import CoinGeckoAPI
-from currency_converter import CurrencyConverter
+class BinanceClient:
+    SOURCE = SOURCE_BINANCE
+
+    def __init__(self, cache=None, client=None, klines=None, price_method=PRICE_METHOD_AVERAGE):
+        self.__client = client
+        self.client_lock = threading.Lock()
+        if client is not None:
+            get_transport(SOURCE_BINANCE).install(client.session)
+
+        self.cache = cache
+        self.klines = KlineStore() if klines is None else klines
+        self.price_method = price_method
+        self.symbols = None
+        self.lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        The python-binance client, imported and built on first use.
 
-from src.config import FIAT_USD, BINANCE_AIRDROP, BINANCE_SAVINGS
-from src.utils import calculate_average, get_timestamp_milliseconds
+        python-binance is slow to import and its client pings Binance when built, so runs
+        that never call the API, such as those priced from the cache, the kline store or
+        CoinGecko, never pay for either.
+        """
+        if self.__client is None:
+            with self.client_lock:
+                if self.__client is None:
+                    with timed("binance.build_client"):
+                        from dotenv import dotenv_values
+                        from binance.client import Client
 
+                        config = dotenv_values(".env")
+                        client = Client(api_key=config["API_KEY"], api_secret=config["SECRET_KEY"])
 
-class BinanceClient:
-    def __init__(self):
-        config = dotenv_values(".env")
+                    get_transport(SOURCE_BINANCE).install(client.session)
 
-        self.client = Client(api_key=config["API_KEY"], api_secret=config["SECRET_KEY"])
-        self.converter = CurrencyConverter('http://www.ecb.int/stats/eurofxref/eurofxref-hist.zip')
+                    self.__client = client
 
+        return self.__client
+
+    @profiled("binance.is_ticker_on_binance")
     def is_ticker_on_binance(self, ticker):
         symbol = f"{ticker}USDT"
 
-        result = self.client.get_symbol_info(symbol=symbol)
-
-        return True if result else False
+        return symbol in self.klines or symbol in self.__get_symbol_index()
 
     def get_average_price_for_date(self, ticker, date, currencies=None):
         """
@@ -43,161 +86,320 @@ class BinanceClient:
                 "EUR": some_value (using conversion value from that day)
             }
         """
+        return self.get_average_prices_for_dates(ticker=ticker, dates=[date], currencies=currencies)[date]
+
+    @profiled("binance.get_average_prices_for_dates")
+    def get_average_prices_for_dates(self, ticker, dates, currencies=None):
+        """
+        Given a ticker, returns the historical average price for many dates at once.
+
+        Dates that are not cached are merged into as few contiguous ranges as possible, such
+        that merging never costs an extra page of klines. Each range is read from the local
+        kline store when imported dumps cover it, and is otherwise fetched with a single
+        paginated get_historical_klines call. Each day's price is then computed with
+        price_method, for every day of the range at once, over the klines of the same local
+        day windows that get_average_price_for_date uses.
+
+        Args:
+            ticker: string representing cryptocurrency
+            dates: iterable of datetime objects
+            currencies: list of currencies to convert to
+
+        Returns:
+            A dictionary mapping each date to a dictionary in the same format as
+            get_average_price_for_date
+        """
         symbol = f"{ticker}USDT"
 
-        pacific_end = date.replace(hour=23, minute=59, second=59, microsecond=999999)
+        results = {}
+        missing = []
+        for date in sorted(set(dates)):
+            start_timestamp, end_timestamp = self.__get_day_window(date)
+            window = self.__get_cache_window(start_timestamp, end_timestamp)
 
-        utc_start = date.astimezone(utc)
-        utc_end = pacific_end.astimezone(utc)
+            cached = self.cache.get(SOURCE_BINANCE, symbol, date, window, [FIAT_USD]) if self.cache is not None else None
+            if cached:
+                results[date] = cached
+            else:
+                missing.append((date, start_timestamp, end_timestamp))
 
-        start_timestamp = get_timestamp_milliseconds(utc_start)
-        end_timestamp = get_timestamp_milliseconds(utc_end)
+        now_timestamp = get_timestamp_milliseconds(datetime.now(timezone.utc))
+        for start_timestamp, end_timestamp, windows in self.__get_kline_ranges(missing):
+            klines = self.__get_klines(symbol=symbol, start_timestamp=start_timestamp, end_timestamp=end_timestamp,
+                                       columns=["open_time"] + REQUIRED_COLUMNS[self.price_method])
 
-        klines = self.client.get_historical_klines(symbol=symbol,
-                                                   interval=Client.KLINE_INTERVAL_1HOUR,
-                                                   start_str=start_timestamp,
-                                                   end_str=end_timestamp)
+            with timed("binance.aggregate_klines"):
+                window_prices = aggregate_klines(klines=klines,
+                                                 window_starts=numpy.array([window[1] for window in windows]),
+                                                 window_ends=numpy.array([window[2] for window in windows]),
+                                                 method=self.price_method)
 
-        values = []
-        for line in klines:
-            # result is array of OHLCV starting with timestamp of open - we will use Open and Close values for best representation
-            open_price = float(line[1])
-            close_price = float(line[4])
-            values.append(calculate_average([open_price, close_price]))
+            cache_entries = []
+            for (date, window_start, window_end), price in zip(windows, window_prices.tolist()):
+                if math.isnan(price):
+                    raise ValueError(f"No klines found for {symbol} on {date}")
 
-        mid_day = utc_start.replace(hour=utc_start.hour + 12)
-        prices = { FIAT_USD: calculate_average(values) }
+                prices = { FIAT_USD: price }
+                results[date] = prices
+                cache_entries.append((date, self.__get_cache_window(window_start, window_end), prices,
+                                      window_end < now_timestamp))
 
-        if currencies:
-            for currency in currencies:
-                prices[currency] = self.converter.convert(prices[FIAT_USD], FIAT_USD, currency, date=mid_day)
+            if self.cache is not None:
+                self.cache.put_many(SOURCE_BINANCE, symbol, cache_entries)
 
-        return prices
+        if currencies and results:
+            with timed("fx.convert"):
+                dates = list(results)
+                usd_prices = numpy.array([results[date][FIAT_USD] for date in dates])
+                rate_table = RateTable(currencies=currencies, start_date=min(dates), end_date=max(dates))
 
-    def get_saving_data(self, ticker, start_date, end_date=datetime.now()):
-        """
-        Gets savings data for specific ticker for a date range.
+                for currency in currencies:
+                    converted = rate_table.convert(prices=usd_prices, currency=currency, dates=dates).tolist()
 
-        From the API: The time between startTime and endTime cannot be longer than 30 days.
-        Therefore, we
+                    for date, price in zip(dates, converted):
+                        results[date][currency] = price
 
-        Since API can only return 100 results at max, assume that each day has one savings transaction.
-        Thus, we make X amount of API calls, where X = ((end_date - start_date) / 100 ) + 1
+        return results
 
-        From the API: The time between startTime and endTime cannot be longer than 30 days
+    def get_saving_data(self, ticker, start_date, end_date=None):
+        """
+        Gets savings data for specific ticker for a date range.
 
         Args:
             ticker: string representing cryptocurrency
             start_date: datetime object
-            end_date: datetime object. Defaults to datetime.now().
-        """
-        days_in_between = (end_date - start_date).days + 1
-        iterations = math.ceil(days_in_between / 30)
+            end_date: datetime object, inclusive of the whole day. Defaults to now.
 
-        results = []
-        for i in range(iterations):
-            request_start_date = start_date + timedelta(days=i*30)
-            request_end_date = request_start_date + timedelta(days=30)
+        Returns:
+            List of savings transactions, sorted by time
+        """
+        return list(self.iter_saving_data(ticker=ticker, start_date=start_date, end_date=end_date))
 
-            print(request_start_date, request_end_date)
+    @profiled("binance.iter_saving_data")
+    def iter_saving_data(self, ticker, start_date, end_date=None):
+        """
+        Yields savings data for specific ticker for a date range, sorted by time.
 
-            request_params = {
-                "lendingType": "DAILY",
-                "asset": ticker,
-                "size": 100,
-                "startTime": get_timestamp_milliseconds(request_start_date),
-                "endTime": get_timestamp_milliseconds(request_end_date)
-            }
+        From the API: The time between startTime and endTime cannot be longer than 30 days,
+        and at most 100 results are returned per request.
 
-            sub_results = self.client.get_lending_interest_history(**request_params)
-            results.extend(sub_results)
+        Args:
+            ticker: string representing cryptocurrency
+            start_date: datetime object
+            end_date: datetime object, inclusive of the whole day. Defaults to now.
+        """
+        @profiled("binance.get_lending_interest_history")
+        def fetch(start_timestamp, end_timestamp):
+            return self.client.get_lending_interest_history(lendingType="DAILY",
+                                                            asset=ticker,
+                                                            size=BINANCE_SAVINGS_LIMIT,
+                                                            startTime=start_timestamp,
+                                                            endTime=end_timestamp)
+
+        paginator = Paginator(fetch=fetch,
+                              page_limit=BINANCE_SAVINGS_LIMIT,
+                              max_window=BINANCE_SAVINGS_MAX_DAYS * DAY_MILLISECONDS,
+                              time_key="time")
+
+        return paginator.iterate(*self.__get_history_range(start_date=start_date, end_date=end_date))
+
+    def get_dividend_data(self, ticker, start_date, end_date=None):
+        """
+        Gets dividends data for specific ticker for a date range.
 
-        results.sort(key=lambda x: x["time"])
+        Args:
+            ticker: string representing cryptocurrency
+            start_date: datetime object
+            end_date: datetime object, inclusive of the whole day. Defaults to now.
 
-        return results
+        Returns:
+            List of dividend transactions, sorted by divTime
+        """
+        return list(self.iter_dividend_data(ticker=ticker, start_date=start_date, end_date=end_date))
 
-    def get_dividend_data(self, ticker, start_date, end_date=datetime.now()):
+    @profiled("binance.iter_dividend_data")
+    def iter_dividend_data(self, ticker, start_date, end_date=None):
         """
-        Gets dividends data for specific ticker for a date range.
+        Yields dividends data for specific ticker for a date range, sorted by divTime.
 
-        Since API can only return 500 results at max, assume that each day has one savings transaction.
-        Thus, we make X amount of API calls, where X = ((end_date - start_date) / 500 ) + 1
+        From the API: The time between startTime and endTime cannot be longer than 180 days,
+        and at most 500 results are returned per request.
 
         Args:
             ticker: string representing cryptocurrency
             start_date: datetime object
-            end_date: datetime object. Defaults to datetime.now()
+            end_date: datetime object, inclusive of the whole day. Defaults to now.
+        """
+        @profiled("binance.get_asset_dividend_history")
+        def fetch(start_timestamp, end_timestamp):
+            return self.client.get_asset_dividend_history(asset=ticker,
+                                                          limit=BINANCE_DIVIDEND_LIMIT,
+                                                          startTime=start_timestamp,
+                                                          endTime=end_timestamp)["rows"]
+
+        paginator = Paginator(fetch=fetch,
+                              page_limit=BINANCE_DIVIDEND_LIMIT,
+                              max_window=BINANCE_DIVIDEND_MAX_DAYS * DAY_MILLISECONDS,
+                              time_key="divTime",
+                              id_key="id")
+
+        return paginator.iterate(*self.__get_history_range(start_date=start_date, end_date=end_date))
+
+    """ ============================== Helpers ============================== """
+    def __get_symbol_index(self):
         """
-        days_in_between = (end_date - start_date).days + 1
-        iterations = math.ceil(days_in_between / 100)
+        Gets the set of every symbol listed on Binance.
 
-        results = []
-        for i in range(iterations):
-            request_start_date = start_date + timedelta(days=i*500)
-            request_end_date = request_start_date + timedelta(days=500)
+        The set is built from a single exchange info request and kept on disk for
+        BINANCE_SYMBOLS_TTL seconds, so that repeated runs do not refetch it.
+        """
+        with self.lock:
+            if self.symbols is None:
+                symbols = read_json_cache(BINANCE_SYMBOLS_FILENAME, ttl=BINANCE_SYMBOLS_TTL)
 
-            request_params = {
-                "asset": ticker,
-                "limit": 500,
-                "startTime": get_timestamp_milliseconds(request_start_date),
-                "endTime": get_timestamp_milliseconds(request_end_date)
-            }
+                if symbols is None:
+                    with timed("binance.get_exchange_info"):
+                        exchange_info = self.client.get_exchange_info()
+                    symbols = [info["symbol"] for info in exchange_info["symbols"]]
 
-            sub_results = self.client.get_asset_dividend_history(**request_params)
-            results.extend(sub_results["rows"])
+                    write_json_cache(BINANCE_SYMBOLS_FILENAME, symbols)
 
-        results.sort(key=lambda x: x["divTime"])
+                self.symbols = set(symbols)
 
-        return results
+        return self.symbols
 
-    def __income_helper(self, ticker, start_date, limit, request_dict, savings=True):
+    def __get_klines(self, symbol, start_timestamp, end_timestamp, columns):
         """
-        Helper function for both savings and dividends as they are
-        almost the same.
+        Gets columns of the hourly klines opening between two timestamps.
+
+        Klines come from the local kline store when it covers the whole range, and from
+        get_historical_klines otherwise, in which case only the requested columns are parsed.
 
         Args:
-            ticker: string representing cryptocurrency
-            start_date: datetime object
-            limit: Limit of each API call
-            request_dict: dictionary containing specific request data
+            columns: names of KlineStore.COLUMNS to get
 
         Returns:
-            List of savings or dividend transactions
+            Dictionary of column name to array
         """
-        end_date = datetime.now()
-        days_in_between = (end_date - start_date).days + 1
-        iterations = math.ceil(days_in_between / limit)
+        if self.klines.covers(symbol, start_timestamp, end_timestamp):
+            klines = self.klines.get_klines(symbol, start_timestamp, end_timestamp)
+            count("binance.klines_from_store", len(klines["open_time"]))
 
-        results = []
-        for i in range(iterations):
-            request_start_date = start_date + timedelta(days=i*limit)
-            request_end_date = request_start_date + timedelta(days=limit)
+            return {name: klines[name] for name in columns}
 
-            request_dict["startTime"] = get_timestamp_milliseconds(start_date)
-            request_dict["endTime"] = get_timestamp_milliseconds(end_date)
+        with timed("binance.get_historical_klines"):
+            lines = self.client.get_historical_klines(symbol=symbol,
+                                                      interval=KLINE_STORE_INTERVAL,
+                                                      start_str=start_timestamp,
+                                                      end_str=end_timestamp,
+                                                      limit=BINANCE_KLINE_LIMIT)
+        count("binance.klines", len(lines))
 
-            if savings:
-                sub_results = self.client.get_lending_interest_history(**request_dict)
-            else:
-                sub_results = self.client.get_asset_dividend_history(**request_dict)["rows"]
+        # result is array of OHLCV starting with timestamp of open, in the same order as the dump files
+        positions = dict(zip(KlineStore.COLUMNS, KlineStore.DUMP_COLUMNS))
 
-            results.extend(sub_results)
+        return {name: numpy.fromiter(map(float, map(itemgetter(positions[name]), lines)),
+                                     dtype=KlineStore.COLUMNS[name], count=len(lines))
+                for name in columns}
 
-        if savings:
-            sort_key = "time"
-        else:
-            sort_key = "divTime"
+    def __get_history_range(self, start_date, end_date):
+        """
+        Gets the inclusive millisecond timestamps spanning start_date to the end of end_date.
+        """
+        now = datetime.now()
+        end_date = now if end_date is None else min(now, end_date + timedelta(days=1))
 
-        results.sort(key=lambda x: x[sort_key])
+        return get_timestamp_milliseconds(start_date), get_timestamp_milliseconds(end_date) - 1
 
-        return results
+    def __get_day_window(self, date):
+        """
+        Gets the UTC millisecond timestamps spanning the local day of date.
+        """
+        pacific_end = date.replace(hour=23, minute=59, second=59, microsecond=999999)
+
+        start_timestamp = get_timestamp_milliseconds(date.astimezone(timezone.utc))
+        end_timestamp = get_timestamp_milliseconds(pacific_end.astimezone(timezone.utc))
+
+        return start_timestamp, end_timestamp
+
+    def __get_cache_window(self, start_timestamp, end_timestamp):
+        # Prices from the default method keep the window format that earlier caches were written with
+        if self.price_method == PRICE_METHOD_AVERAGE:
+            return f"{start_timestamp}-{end_timestamp}"
+
+        return f"{start_timestamp}-{end_timestamp}:{self.price_method}"
+
+    def __get_kline_ranges(self, windows):
+        """
+        Merges sorted day windows into ranges of klines to fetch.
+
+        Two neighbouring ranges are merged whenever the merged range needs no more pages of
+        BINANCE_KLINE_LIMIT klines than fetching them separately would.
+
+        Args:
+            windows: list of (date, start_timestamp, end_timestamp), sorted by start_timestamp
+
+        Returns:
+            List of (start_timestamp, end_timestamp, windows in range)
+        """
+        def pages(start_timestamp, end_timestamp):
+            klines = (end_timestamp - start_timestamp) // HOUR_MILLISECONDS + 1
+            return math.ceil(klines / BINANCE_KLINE_LIMIT)
+
+        ranges = []
+        for window in windows:
+            _, start_timestamp, end_timestamp = window
+
+            if ranges:
+                range_start, range_end, range_windows = ranges[-1]
+                merged_end = max(range_end, end_timestamp)
+
+                if pages(range_start, merged_end) <= pages(range_start, range_end) + pages(start_timestamp, end_timestamp):
+                    range_windows.append(window)
+                    ranges[-1] = (range_start, merged_end, range_windows)
+                    continue
+
+            ranges.append((start_timestamp, end_timestamp, [window]))
+
+        return ranges
 
 
 class GeckoClient:
-    def __init__(self):
-        self.client = CoinGeckoAPI()
-        self.converter = CurrencyConverter('http://www.ecb.int/stats/eurofxref/eurofxref-hist.zip')
+    SOURCE = SOURCE_COINGECKO
+    # CoinGecko historical data is a snapshot taken at 00:00 UTC of the requested date
+    CACHE_WINDOW = "00:00 UTC"
+
+    def __init__(self, cache=None, id_overrides=None, client=None):
+        self.__client = client
+        self.client_lock = threading.Lock()
+        if client is not None:
+            get_transport(SOURCE_COINGECKO).install(client.session)
+
+        self.cache = cache
+        self.id_overrides = GECKO_ID_OVERRIDES if id_overrides is None else id_overrides
+        self.coin_ids = None
+        self.lock = threading.Lock()
+
+    @property
+    def client(self):
+        """
+        The pycoingecko client, imported and built on first use.
+        """
+        if self.__client is None:
+            with self.client_lock:
+                if self.__client is None:
+                    with timed("coingecko.build_client"):
+                        from pycoingecko import CoinGeckoAPI
+
+                        client = CoinGeckoAPI()
+
+                    get_transport(SOURCE_COINGECKO).install(client.session)
 
+                    self.__client = client
+
+        return self.__client
+
+    @profiled("coingecko.get_average_price_for_date")
     def get_average_price_for_date(self, ticker, date, currencies=None):
         """
         Given a ticker, returns the historical average price for a specific date.
@@ -215,11 +417,17 @@ class GeckoClient:
                 "EUR": some_value (using conversion value from that day)
             }
         """
-        utc_time = date.astimezone(utc)
         cg_time = date.strftime("%d-%m-%Y")
+        requested = [FIAT_USD] + list(currencies or [])
+
+        if self.cache is not None:
+            cached = self.cache.get(SOURCE_COINGECKO, ticker, date, self.CACHE_WINDOW, requested)
+            if cached:
+                return cached
 
         coin_id = self.__get_coin_id(ticker=ticker)
-        result = self.client.get_coin_history_by_id(id=coin_id, date=cg_time)
+        with timed("coingecko.get_coin_history_by_id"):
+            result = self.client.get_coin_history_by_id(id=coin_id, date=cg_time)
 
         prices = { FIAT_USD: result["market_data"]["current_price"]["usd"] }
 
@@ -227,13 +435,131 @@ class GeckoClient:
             for currency in currencies:
                 prices[currency] = result["market_data"]["current_price"][currency.lower()]
 
+        if self.cache is not None:
+            # Treat the snapshot as final only once the whole UTC day has passed
+            complete = date.replace(tzinfo=timezone.utc) + timedelta(days=1) < datetime.now(timezone.utc)
+            self.cache.put(SOURCE_COINGECKO, ticker, date, self.CACHE_WINDOW, prices, complete=complete)
+
         return prices
 
+    @profiled("coingecko.get_average_prices_for_dates")
+    def get_average_prices_for_dates(self, ticker, dates, currencies=None):
+        """
+        Given a ticker, returns the historical price for many dates at once.
+
+        When more dates are missing from the cache than the number of market chart range
+        requests needed to cover them (one per currency), the whole span is pulled with
+        get_coin_market_chart_range_by_id and each date takes the price closest to 00:00 UTC,
+        matching the snapshot that get_coin_history_by_id returns. Otherwise every date is
+        looked up individually.
+
+        Args:
+            ticker: string representing cryptocurrency
+            dates: iterable of datetime objects
+            currencies: list of currencies to convert to
+
+        Returns:
+            A dictionary mapping each date to a dictionary in the same format as
+            get_average_price_for_date
+        """
+        requested = [FIAT_USD] + list(currencies or [])
+
+        results = {}
+        missing = []
+        for date in sorted(set(dates)):
+            cached = self.cache.get(SOURCE_COINGECKO, ticker, date, self.CACHE_WINDOW, requested) if self.cache is not None else None
+            if cached:
+                results[date] = cached
+            else:
+                missing.append(date)
+
+        if len(missing) > len(requested):
+            results.update(self.__get_prices_from_range(ticker=ticker, dates=missing, currencies=requested))
+
+        for date in missing:
+            if date not in results:
+                results[date] = self.get_average_price_for_date(ticker=ticker, date=date, currencies=currencies)
+
+        return results
+
+    def __get_prices_from_range(self, ticker, dates, currencies):
+        """
+        Prices sorted dates from one market chart range request per currency.
+
+        Dates without a data point within a day of their 00:00 UTC snapshot are left out,
+        so that the caller can fall back to looking them up individually.
+        """
+        coin_id = self.__get_coin_id(ticker=ticker)
+        targets = [int(self.__get_snapshot_time(date).timestamp()) * 1000 for date in dates]
+
+        from_timestamp = targets[0] // 1000 - GECKO_RANGE_MARGIN
+        to_timestamp = targets[-1] // 1000 + GECKO_RANGE_MARGIN
+
+        prices_by_date = {date: {} for date in dates}
+        for currency in currencies:
+            with timed("coingecko.get_coin_market_chart_range_by_id"):
+                result = self.client.get_coin_market_chart_range_by_id(id=coin_id,
+                                                                       vs_currency=currency.lower(),
+                                                                       from_timestamp=from_timestamp,
+                                                                       to_timestamp=to_timestamp)
+            points = result["prices"]
+            times = [point[0] for point in points]
+
+            for date, target in zip(dates, targets):
+                index = bisect_right(times, target)
+                candidates = [point for point in points[max(index - 1, 0):index + 1]
+                              if abs(point[0] - target) <= DAY_MILLISECONDS]
+
+                if candidates:
+                    closest = min(candidates, key=lambda point: abs(point[0] - target))
+                    prices_by_date[date][currency] = closest[1]
+
+        results = {}
+        now = datetime.now(timezone.utc)
+        cache_entries = []
+        for date, prices in prices_by_date.items():
+            if len(prices) < len(currencies):
+                continue
+
+            results[date] = prices
+            cache_entries.append((date, self.CACHE_WINDOW, prices, self.__get_snapshot_time(date) + timedelta(days=1) < now))
+
+        if self.cache is not None:
+            self.cache.put_many(SOURCE_COINGECKO, ticker, cache_entries)
+
+        return results
+
+    def __get_snapshot_time(self, date):
+        return datetime(date.year, date.month, date.day, tzinfo=timezone.utc)
+
     def __get_coin_id(self, ticker):
-        coins = self.client.get_coins_list()
+        if ticker.upper() in self.id_overrides:
+            return self.id_overrides[ticker.upper()]
+
+        return self.__get_coin_id_index().get(ticker.lower())
+
+    def __get_coin_id_index(self):
+        """
+        Gets the dictionary of lowercase symbol to CoinGecko coin id.
+
+        The index is built from a single get_coins_list request on first use and kept on
+        disk for GECKO_COINS_TTL seconds. When several coins share a symbol, the
+        alphabetically first id wins, unless the ticker is in id_overrides.
+        """
+        with self.lock:
+            if self.coin_ids is None:
+                coin_ids = read_json_cache(GECKO_COINS_FILENAME, ttl=GECKO_COINS_TTL)
+
+                if coin_ids is None:
+                    coin_ids = {}
+                    with timed("coingecko.get_coins_list"):
+                        coins = self.client.get_coins_list()
+
+                    for coin in sorted(coins, key=lambda x: x["id"]):
+                        coin_ids.setdefault(coin["symbol"].lower(), coin["id"])
+
+                    write_json_cache(GECKO_COINS_FILENAME, coin_ids)
 
-        for coin in coins:
-            if coin["symbol"] == ticker.lower():
-                return coin["id"]
+                self.coin_ids = coin_ids
 
-        return None
+        return self.coin_ids
@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import sqlite3
+import threading
+
+from glob import glob
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from src.profiling import count
+from src.config import (CACHE_DIR, PRICE_CACHE_FILENAME, PRICE_CACHE_TTL, PRICE_CACHE_MAX_ENTRIES,
+                        PRICE_CACHE_EVICTION_MARGIN)
+
+
+class PriceCache():
+    """
+    Persistent SQLite cache of daily prices, shared by every price source.
+
+    Entries are keyed by (source, symbol, date, window, currency), where window describes
+    the exact time range the price was computed over. Prices for days that had not ended
+    when they were fetched are only trusted for `ttl` seconds, everything else is kept
+    until the cache grows past `max_entries`, at which point the least recently used
+    entries are evicted until it is PRICE_CACHE_EVICTION_MARGIN entries below. The number
+    of entries is only counted when an upper bound of it, kept as entries are written,
+    passes `max_entries`, so writes stay cheap however large the cache is.
+    """
+    def __init__(self, path: str=None, ttl: int=PRICE_CACHE_TTL, max_entries: int=PRICE_CACHE_MAX_ENTRIES):
+        if not path:
+            path = os.path.join(CACHE_DIR, PRICE_CACHE_FILENAME)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.ttl = ttl
+        self.max_entries = max_entries
+
+        # Shared across pricing threads, so every statement is serialized through the lock
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(path, isolation_level=None, check_same_thread=False)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+        self.connection.execute("""
+            CREATE TABLE IF NOT EXISTS prices (
+                source TEXT NOT NULL,
+                symbol TEXT NOT NULL,
+                date TEXT NOT NULL,
+                window TEXT NOT NULL,
+                currency TEXT NOT NULL,
+                price REAL NOT NULL,
+                complete INTEGER NOT NULL,
+                fetched_at REAL NOT NULL,
+                accessed_at REAL NOT NULL,
+                PRIMARY KEY (source, symbol, date, window, currency)
+            )
+        """)
+        self.connection.execute("CREATE INDEX IF NOT EXISTS prices_accessed_at ON prices (accessed_at)")
+
+        # At least the number of entries, as replaced entries are counted again until the next eviction
+        self.entries = self.connection.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+
+    def get(self, source: str, symbol: str, date: datetime, window: str, currencies: List[str]) -> Optional[Dict[str, float]]:
+        """
+        Looks up cached prices.
+
+        Args:
+            source (str): Price source, such as binance or coingecko
+            symbol (str): Symbol or ticker that was priced
+            date (datetime): Day that was priced
+            window (str): Description of the time window the price covers
+            currencies (List[str]): Currencies that must all be present for a hit
+
+        Returns:
+            Optional[Dict[str, float]]: Dictionary of currency to price, or None if any of
+                the requested currencies is missing or expired
+        """
+        now = time.time()
+        placeholders = ",".join("?" for _ in currencies)
+        with self.lock:
+            rows = self.connection.execute(f"""
+                SELECT currency, price FROM prices
+                WHERE source = ? AND symbol = ? AND date = ? AND window = ? AND currency IN ({placeholders})
+                  AND (complete = 1 OR fetched_at >= ?)
+            """, (source, symbol, self.__date_key(date), window, *currencies, now - self.ttl)).fetchall()
+
+            prices = dict(rows)
+            if any(currency not in prices for currency in currencies):
+                count(f"cache.{source}.misses")
+                return None
+
+            self.connection.execute(f"""
+                UPDATE prices SET accessed_at = ?
+                WHERE source = ? AND symbol = ? AND date = ? AND window = ? AND currency IN ({placeholders})
+            """, (now, source, symbol, self.__date_key(date), window, *currencies))
+
+        count(f"cache.{source}.hits")
+        return prices
+
+    def put(self, source: str, symbol: str, date: datetime, window: str, prices: Dict[str, float], complete: bool) -> None:
+        """
+        Stores prices, evicting the least recently used entries if the cache is full.
+
+        Args:
+            source (str): Price source, such as binance or coingecko
+            symbol (str): Symbol or ticker that was priced
+            date (datetime): Day that was priced
+            window (str): Description of the time window the price covers
+            prices (Dict[str, float]): Dictionary of currency to price
+            complete (bool): Whether the window had fully elapsed when the price was fetched
+        """
+        self.put_many(source=source, symbol=symbol, entries=[(date, window, prices, complete)])
+
+    def put_many(self, source: str, symbol: str, entries: Sequence[Tuple[datetime, str, Dict[str, float], bool]]) -> None:
+        """
+        Stores the prices of many days in one transaction, evicting at most once.
+
+        Args:
+            source (str): Price source, such as binance or coingecko
+            symbol (str): Symbol or ticker that was priced
+            entries (Sequence[Tuple]): Tuples of the (date, window, prices, complete) of each
+                day, as the arguments of put
+        """
+        now = time.time()
+        rows = [(source, symbol, self.__date_key(date), window, currency, price, int(complete), now, now)
+                for date, window, prices, complete in entries
+                for currency, price in prices.items()]
+
+        if not rows:
+            return
+
+        with self.lock:
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.executemany("""
+                    INSERT OR REPLACE INTO prices
+                    (source, symbol, date, window, currency, price, complete, fetched_at, accessed_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                """, rows)
+
+                self.entries += len(rows)
+                if self.entries > self.max_entries:
+                    self.__evict()
+
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+    def clear(self) -> None:
+        """
+        Removes every cached price.
+        """
+        with self.lock:
+            self.connection.execute("DELETE FROM prices")
+            self.connection.execute("VACUUM")
+            self.entries = 0
+
+    def __len__(self):
+        with self.lock:
+            return self.connection.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+
+    """ ============================== Helpers ============================== """
+    def __date_key(self, date):
+        return date.strftime("%Y-%m-%d")
+
+    def __evict(self):
+        # Other processes may share the file, so the exact count is taken before evicting
+        self.entries = self.connection.execute("SELECT COUNT(*) FROM prices").fetchone()[0]
+
+        if self.entries > self.max_entries:
+            target = max(0, self.max_entries - PRICE_CACHE_EVICTION_MARGIN)
+            self.connection.execute("""
+                DELETE FROM prices WHERE rowid IN (
+                    SELECT rowid FROM prices ORDER BY accessed_at LIMIT ?
+                )
+            """, (self.entries - target,))
+            self.entries = target
+
+
+def read_json_cache(filename: str, ttl: int) -> Optional[Any]:
+    """
+    Reads a JSON document from the cache directory, if it is fresh enough.
+
+    Args:
+        filename (str): Name of the file within the cache directory
+        ttl (int): Maximum age of the file, in seconds
+
+    Returns:
+        Optional[Any]: Decoded JSON document, or None if missing, stale or unreadable
+    """
+    path = os.path.join(CACHE_DIR, filename)
+
+    try:
+        if time.time() - os.path.getmtime(path) > ttl:
+            count(f"cache.{filename}.misses")
+            return None
+
+        with open(path) as read_file:
+            data = json.load(read_file)
+    except (OSError, ValueError):
+        count(f"cache.{filename}.misses")
+        return None
+
+    count(f"cache.{filename}.hits")
+    return data
+
+
+def write_json_cache(filename: str, data: Any) -> None:
+    """
+    Atomically writes a JSON document to the cache directory.
+
+    Args:
+        filename (str): Name of the file within the cache directory
+        data (Any): JSON serializable document
+    """
+    os.makedirs(CACHE_DIR, exist_ok=True)
+
+    path = os.path.join(CACHE_DIR, filename)
+    temp_path = f"{path}.tmp"
+    with open(temp_path, "w") as write_file:
+        json.dump(data, write_file)
+
+    os.replace(temp_path, path)
+
+
+def clear_json_cache() -> None:
+    """
+    Removes every JSON document from the cache directory.
+    """
+    for path in glob(os.path.join(CACHE_DIR, "*.json")):
+        os.remove(path)
@@ -0,0 +1,89 @@
+import os
+import json
+
+from src.config import CHECKPOINT_DIR
+
+
+class Checkpoint():
+    """
+    Progress of incremental reward tracking for one (ticker, income type).
+
+    Records the output file being appended to, the start date it was tracked from, its
+    header and price method, the time cursor of the last record written, and how many
+    rows and bytes of the output have been written. A record is only considered done
+    once the checkpoint that covers it is saved, so anything written to the output after
+    the last save is discarded when resuming.
+    """
+    def __init__(self, ticker, income_type, directory=CHECKPOINT_DIR):
+        self.path = os.path.join(directory, f"{ticker}_{income_type}.json")
+
+        try:
+            with open(self.path) as read_file:
+                state = json.load(read_file)
+        except (OSError, ValueError):
+            state = {}
+
+        self.output_filename = state.get("output_filename")
+        self.start_date = state.get("start_date")
+        self.fields = state.get("fields")
+        self.price_method = state.get("price_method")
+        self.cursor = state.get("cursor", 0)
+        self.rows = state.get("rows", 0)
+        self.output_size = state.get("output_size", 0)
+
+    def is_resumable(self, output_filename, start_date, fields, price_method):
+        """
+        Checks whether a run can continue from this checkpoint.
+
+        Args:
+            output_filename (str): Output file of the run
+            start_date (str): Start date of the run
+            fields (List[str]): Header of the rows the run writes, which depends on its currencies
+            price_method (str): How the run prices each day
+
+        Returns:
+            bool: True if the run appends rows of the same columns and prices to the same,
+                intact output from the same start date
+        """
+        if self.output_filename != output_filename or self.start_date != start_date:
+            return False
+
+        if self.fields != fields or self.price_method != price_method:
+            return False
+
+        return os.path.exists(output_filename) and os.path.getsize(output_filename) >= self.output_size
+
+    def reset(self, output_filename, start_date, fields, price_method):
+        self.output_filename = output_filename
+        self.start_date = start_date
+        self.fields = fields
+        self.price_method = price_method
+        self.cursor = 0
+        self.rows = 0
+        self.output_size = 0
+
+        self.save()
+
+    def advance(self, cursor, rows, output_size):
+        self.cursor = cursor
+        self.rows += rows
+        self.output_size = output_size
+
+        self.save()
+
+    def save(self):
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, "w") as write_file:
+            json.dump({
+                "output_filename": self.output_filename,
+                "start_date": self.start_date,
+                "fields": self.fields,
+                "price_method": self.price_method,
+                "cursor": self.cursor,
+                "rows": self.rows,
+                "output_size": self.output_size,
+            }, write_file)
+
+        os.replace(temp_path, self.path)
@@ -0,0 +1,213 @@
+import uuid
+import decimal
+
+import numpy
+
+from datetime import datetime
+from typing import List, Sequence
+
+from src.config import (EPOCH, DATE, START_DATE, END_DATE, OUTPUT_FORMAT_PARQUET, OUTPUT_EXTENSIONS,
+                        OUTPUT_DECIMAL_PRECISION, OUTPUT_DECIMAL_SCALE)
+
+
+DATE_FIELDS = (DATE, START_DATE, END_DATE)
+
+
+def get_pyarrow():
+    """
+    Imports pyarrow, which is only needed for Parquet and Arrow output.
+
+    Returns:
+        module: The pyarrow module, with its compute, dataset, ipc and parquet submodules loaded
+    """
+    try:
+        import pyarrow
+        import pyarrow.compute
+        import pyarrow.dataset
+        import pyarrow.ipc
+        import pyarrow.parquet
+    except ImportError:
+        raise ValueError("pyarrow is required for Parquet and Arrow output, install it or use --format csv")
+
+    return pyarrow
+
+
+def build_table(fields: Sequence[str], columns: Sequence):
+    """
+    Builds a typed Arrow table from the columns of a DataStore.
+
+    Date fields become date32 columns, epochs become int64, and every amount, price and
+    value becomes a decimal of OUTPUT_DECIMAL_PRECISION digits. Floats are converted to
+    decimals through their shortest representation, so 0.1 is stored as 0.1 rather than
+    its binary expansion, and are then rounded to OUTPUT_DECIMAL_SCALE places.
+
+    Args:
+        fields (Sequence[str]): Field names, from DataStore.get_fields
+        columns (Sequence): Columns in the same order, from DataStore.get_columns
+
+    Returns:
+        pyarrow.Table: Table with one column per field
+    """
+    pyarrow = get_pyarrow()
+    decimal_type = pyarrow.decimal128(OUTPUT_DECIMAL_PRECISION, OUTPUT_DECIMAL_SCALE)
+
+    # Rounding happens with the full precision of the column, rather than the default 28 digits
+    context = decimal.Context(prec=OUTPUT_DECIMAL_PRECISION)
+    exponent = decimal.Decimal(1).scaleb(-OUTPUT_DECIMAL_SCALE)
+
+    arrays = []
+    for field, column in zip(fields, columns):
+        if field in DATE_FIELDS:
+            arrays.append(pyarrow.array(numpy.array(column, dtype="datetime64[D]"), type=pyarrow.date32()))
+        elif field == EPOCH:
+            arrays.append(pyarrow.array(numpy.asarray(column, dtype=numpy.int64)))
+        else:
+            # repr of a float is its shortest representation, and Decimal parses it even in scientific notation
+            values = [decimal.Decimal(repr(float(value))).quantize(exponent, context=context) for value in column]
+            arrays.append(pyarrow.array(values, type=decimal_type))
+
+    return pyarrow.table(arrays, names=list(fields))
+
+
+def get_compression(output_format: str, compression: str):
+    """
+    Validates a compression codec for an output format.
+
+    Args:
+        output_format (str): parquet or arrow
+        compression (str): Codec name, "none", or None for the format's default
+
+    Returns:
+        Codec name to pass to pyarrow, or None for no compression
+    """
+    if compression == "none":
+        return None if output_format != OUTPUT_FORMAT_PARQUET else "none"
+
+    if compression is None:
+        return "snappy" if output_format == OUTPUT_FORMAT_PARQUET else None
+
+    if output_format != OUTPUT_FORMAT_PARQUET and compression not in ("lz4", "zstd"):
+        raise ValueError(f"Arrow files only support lz4 and zstd compression, not {compression}")
+
+    return compression
+
+
+class ColumnarWriter():
+    """
+    Writes tables into a single Parquet or Arrow IPC file.
+
+    Every write becomes one row group or record batch, so windows of a streamed run are
+    written as they are priced, without holding the whole report in memory.
+    """
+    def __init__(self, output_filename, output_format, compression=None):
+        self.output_filename = output_filename
+        self.output_format = output_format
+        self.compression = get_compression(output_format=output_format, compression=compression)
+
+        self.writer = None
+
+    def write(self, table) -> None:
+        pyarrow = get_pyarrow()
+
+        if self.writer is None:
+            if self.output_format == OUTPUT_FORMAT_PARQUET:
+                self.writer = pyarrow.parquet.ParquetWriter(self.output_filename, table.schema,
+                                                            compression=self.compression)
+            else:
+                options = pyarrow.ipc.IpcWriteOptions(compression=self.compression)
+                self.writer = pyarrow.ipc.new_file(self.output_filename, table.schema, options=options)
+
+        self.writer.write_table(table)
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+            self.writer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+
+def append_to_dataset(tables: List, directory: str, ticker: str, dates: List[datetime], output_format: str,
+                      compression: str=None) -> List[str]:
+    """
+    Appends tables to a dataset partitioned by ticker and year.
+
+    Rows are written under directory/ticker=<ticker>/year=<year>/ in new files, so
+    existing files are never rewritten and the dataset grows with every run. The
+    dataset can be read back with pyarrow.dataset, pandas or any engine that
+    understands hive partitioning.
+
+    Args:
+        tables (List[pyarrow.Table]): Tables of rows to append, from build_table
+        directory (str): Root directory of the dataset
+        ticker (str): Ticker of every row
+        dates (List[datetime]): Date of each row, which decides its year partition
+        output_format (str): parquet or arrow
+        compression (str): Codec name, "none", or None for the format's default
+
+    Returns:
+        List[str]: Paths of the files written
+    """
+    pyarrow = get_pyarrow()
+    dataset = pyarrow.dataset
+
+    table = pyarrow.concat_tables(tables)
+    years = numpy.array(dates, dtype="datetime64[Y]").astype(numpy.int32) + 1970
+    table = table.append_column("ticker", pyarrow.array([ticker] * len(table), type=pyarrow.string()))
+    table = table.append_column("year", pyarrow.array(years, type=pyarrow.int32()))
+
+    compression = get_compression(output_format=output_format, compression=compression)
+    if output_format == OUTPUT_FORMAT_PARQUET:
+        file_format = dataset.ParquetFileFormat()
+        file_options = file_format.make_write_options(compression=compression)
+    else:
+        file_format = dataset.IpcFileFormat()
+        file_options = file_format.make_write_options(compression=compression)
+
+    partitioning = dataset.partitioning(pyarrow.schema([("ticker", pyarrow.string()), ("year", pyarrow.int32())]),
+                                        flavor="hive")
+
+    # A unique name per write, so that appending never replaces files of earlier runs
+    paths = []
+    dataset.write_dataset(table, directory, format=file_format, file_options=file_options,
+                          partitioning=partitioning, existing_data_behavior="overwrite_or_ignore",
+                          basename_template=f"part-{uuid.uuid4().hex}-{{i}}.{OUTPUT_EXTENSIONS[output_format]}",
+                          file_visitor=lambda written_file: paths.append(written_file.path))
+
+    return paths
+
+
+def read_batches(filename: str, batch_rows: int):
+    """
+    Reads a Parquet or Arrow IPC report one batch of rows at a time.
+
+    Args:
+        filename (str): Report file, ending in .parquet or .arrow
+        batch_rows (int): Rows to read at once from Parquet files, whose row groups may
+            be larger, while Arrow files are read one record batch at a time
+
+    Yields:
+        Tuple[List[str], List[numpy.ndarray]]: Field names and columns of each batch, with
+            decimals as floats and dates as datetime64
+    """
+    pyarrow = get_pyarrow()
+
+    if filename.endswith(f".{OUTPUT_EXTENSIONS[OUTPUT_FORMAT_PARQUET]}"):
+        batches = pyarrow.parquet.ParquetFile(filename).iter_batches(batch_size=batch_rows)
+    else:
+        reader = pyarrow.ipc.open_file(filename)
+        batches = (reader.get_batch(index) for index in range(reader.num_record_batches))
+
+    for batch in batches:
+        columns = []
+        for column in batch.columns:
+            if pyarrow.types.is_decimal(column.type):
+                column = column.cast(pyarrow.float64())
+
+            columns.append(column.to_numpy(zero_copy_only=False))
+
+        yield batch.schema.names, columns
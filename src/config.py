@@ -12,6 +12,41 @@ VETHOR = "VTHO"
 BINANCE_AIRDROP = "AIRDROP"
 BINANCE_SAVINGS = "SAVINGS"
 
+""" ============================== Commands ============================== """
+COMMAND_BINANCE_REWARDS = "track-binance-rewards"
+COMMAND_GENERIC_REWARDS = "track-generic-rewards"
+# Jobs of a manifest that load or write in parallel
+MANIFEST_WORKERS = 4
+
+""" ============================== Server ============================== """
+SERVER_SOCKET = ".cache/tracker.sock"
+SERVER_COMMAND_PING = "ping"
+SERVER_COMMAND_PRICE = "price"
+SERVER_COMMAND_SHUTDOWN = "shutdown"
+# Days after a date before its price is kept in memory, as prices of days that have not ended still change
+SERVER_PRICE_SETTLE_DAYS = 2
+
+""" ============================== Binance Exports ============================== """
+# Operations kept when cleaning a Binance transaction export, either exactly or by prefix
+BINANCE_EXPORT_OPERATIONS = [
+    "Deposit",
+    "Withdraw",
+    "Buy",
+    "Sell",
+    "Fee",
+    "Transaction Related",
+]
+BINANCE_EXPORT_OPERATION_PREFIXES = [
+    "Small assets exchange",
+]
+# Rows written together, and bytes buffered per file, when cleaning exports
+CLEANER_BATCH_SIZE = 10000
+CLEANER_BUFFER_SIZE = 1024 * 1024
+# Columns of a Binance transaction export, those the export store indexes rows by, and those that identify a row
+BINANCE_EXPORT_FIELDS = ["User_ID", "UTC_Time", "Account", "Operation", "Coin", "Change", "Remark"]
+BINANCE_EXPORT_KEY_FIELDS = ["UTC_Time", "Coin", "Operation"]
+BINANCE_EXPORT_ROW_FIELDS = ["User_ID", "UTC_Time", "Operation", "Coin", "Change"]
+
 """ ============================== Field Names ============================== """
 EPOCH = "Epoch"
 DATE = "Date"
@@ -21,3 +56,140 @@ AMOUNT = "Amount ({ticker})"
 TXN_FEE = "TXN Fee ({currency})"
 PRICE_USD = "Average Price (USD)"
 VALUE_USD = "Value (USD)"
+PRICE = "Average Price ({currency})"
+VALUE = "Value ({currency})"
+
+# Fields of rollups
+TICKER = "Ticker"
+PERIOD = "Period"
+CURRENCY = "Currency"
+TOTAL_AMOUNT = "Amount"
+TOTAL_VALUE = "Value"
+TOTAL_TXN_FEE = "TXN Fee"
+ROWS = "Rows"
+
+""" ============================== Output ============================== """
+OUTPUT_FORMAT_CSV = "csv"
+OUTPUT_FORMAT_PARQUET = "parquet"
+OUTPUT_FORMAT_ARROW = "arrow"
+OUTPUT_FORMATS = [OUTPUT_FORMAT_CSV, OUTPUT_FORMAT_PARQUET, OUTPUT_FORMAT_ARROW]
+OUTPUT_EXTENSIONS = {
+    OUTPUT_FORMAT_CSV: "csv",
+    OUTPUT_FORMAT_PARQUET: "parquet",
+    OUTPUT_FORMAT_ARROW: "arrow",
+}
+# Arrow IPC files only support lz4 and zstd
+OUTPUT_COMPRESSIONS = ["none", "snappy", "gzip", "zstd", "lz4"]
+# Amounts, prices and values are stored as decimals of this many digits, with this many after the point
+OUTPUT_DECIMAL_PRECISION = 38
+OUTPUT_DECIMAL_SCALE = 18
+# Streamed rows are buffered into files of at least this many rows when appending to a dataset
+DATASET_ROWS_PER_FILE = 100000
+
+""" ============================== Rollups ============================== """
+ROLLUP_FILENAME = "rollup.csv"
+# Saved next to a rollup, with the totals of every report it was built from
+ROLLUP_SOURCES_SUFFIX = ".sources.json"
+# Rows of a report read and totalled together when summarizing
+ROLLUP_CHUNK_ROWS = 100000
+
+""" ============================== Binance ============================== """
+BINANCE_KLINE_LIMIT = 1000
+# Interval of the klines prices are computed from, and so of the kline dumps that can be imported
+KLINE_STORE_INTERVAL = "1h"
+BINANCE_SAVINGS_LIMIT = 100
+BINANCE_SAVINGS_MAX_DAYS = 30
+BINANCE_DIVIDEND_LIMIT = 500
+BINANCE_DIVIDEND_MAX_DAYS = 180
+# Request weight allowed per minute, and the response header reporting the weight used so far
+BINANCE_WEIGHT_LIMIT = 6000
+BINANCE_WEIGHT_HEADER = "x-mbx-used-weight-1m"
+# Request weight of the endpoints the tracker calls, by the end of their path, any other request weighs 1.
+# Savings history weighs as much as the Simple Earn rewards history that replaces it
+BINANCE_ENDPOINT_WEIGHTS = {
+    "/api/v3/klines": 2,
+    "/api/v3/exchangeInfo": 20,
+    "/sapi/v1/lending/union/interestHistory": 150,
+    "/sapi/v1/asset/assetDividend": 10,
+}
+HOUR_MILLISECONDS = 60 * 60 * 1000
+DAY_MILLISECONDS = 24 * HOUR_MILLISECONDS
+
+""" ============================== Price Sources ============================== """
+SOURCE_BINANCE = "binance"
+SOURCE_COINGECKO = "coingecko"
+
+""" ============================== Transport ============================== """
+TRANSPORT_POOL_SIZE = 16
+TRANSPORT_MAX_RETRIES = 5
+# Seconds - the backoff before retry n is drawn uniformly up to min(max, base * 2^n)
+TRANSPORT_BACKOFF_BASE = 0.5
+TRANSPORT_BACKOFF_MAX = 60
+
+""" ============================== Pricing ============================== """
+# Number of price requests allowed in flight at once, per source
+PRICING_CONCURRENCY = {
+    SOURCE_BINANCE: 4,
+    SOURCE_COINGECKO: 2,
+}
+# Days of dates priced together by one request - a Binance chunk fits in a single page of hourly klines
+PRICING_CHUNK_DAYS = {
+    SOURCE_BINANCE: BINANCE_KLINE_LIMIT // 24,
+    SOURCE_COINGECKO: 90,
+}
+
+# History windows fetched at once, and the smallest window that is split when a page is full, in milliseconds
+PAGINATOR_CONCURRENCY = 4
+PAGINATOR_MIN_WINDOW = 1
+# Ways of computing a day's price from its hourly klines - see src/aggregation.py
+PRICE_METHOD_AVERAGE = "average"
+PRICE_METHOD_VWAP = "vwap"
+PRICE_METHOD_TWAP = "twap"
+PRICE_METHOD_CLOSE = "close"
+PRICE_METHODS = [PRICE_METHOD_AVERAGE, PRICE_METHOD_VWAP, PRICE_METHOD_TWAP, PRICE_METHOD_CLOSE]
+
+# Rows priced and written together when streaming
+STREAM_WINDOW_SIZE = 100
+
+""" ============================== Cache ============================== """
+CACHE_DIR = ".cache"
+PRICE_CACHE_FILENAME = "prices.sqlite3"
+# Seconds before a price for a day that had not yet ended when it was fetched is refetched
+PRICE_CACHE_TTL = 60 * 60
+PRICE_CACHE_MAX_ENTRIES = 500000
+# Entries evicted below the maximum at once, so that a full cache is not counted on every write
+PRICE_CACHE_EVICTION_MARGIN = 5000
+BINANCE_SYMBOLS_FILENAME = "binance_symbols.json"
+BINANCE_SYMBOLS_TTL = 24 * 60 * 60
+GECKO_COINS_FILENAME = "coingecko_coins.json"
+GECKO_COINS_TTL = 24 * 60 * 60
+ECB_RATES_FILENAME = "eurofxref-hist.zip"
+ECB_RATES_TTL = 24 * 60 * 60
+# Checkpoints are progress rather than cache, so are kept apart from the cached files
+CHECKPOINT_DIR = ".cache/checkpoints"
+# Imported kline dumps are not refetchable cache either, so --clear-cache leaves them alone
+KLINE_STORE_DIR = ".cache/klines"
+# Ingested Binance exports, which --clear-cache also leaves alone
+EXPORT_STORE_FILENAME = ".cache/exports.sqlite3"
+
+""" ============================== Profiling ============================== """
+PROFILE_FORMATS = ["text", "json"]
+# Upper bounds, in milliseconds, of the latency histogram buckets of every profiled stage
+PROFILE_LATENCY_BUCKETS = [1, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000]
+
+""" ============================== Exchange Rates ============================== """
+ECB_RATES_URL = "https://www.ecb.europa.eu/stats/eurofxref/eurofxref-hist.zip"
+# Days before a span to look for the last published rate, covering the longest run of weekends and holidays
+FX_MAX_CARRY_DAYS = 7
+
+""" ============================== CoinGecko ============================== """
+# Requests allowed per minute on the public API
+GECKO_RATE_LIMIT = 30
+# Seconds of padding around market chart ranges, so the first and last snapshots have neighbours
+GECKO_RANGE_MARGIN = 60 * 60
+# Many CoinGecko coins share a symbol - these tickers always resolve to the given coin id
+GECKO_ID_OVERRIDES = {
+    CARDANO: "cardano",
+    VECHAIN: "vechain",
+    VETHOR: "vethor-token",
+}
@@ -0,0 +1,161 @@
+import os
+import csv
+import sqlite3
+
+from itertools import islice
+from datetime import datetime, timedelta
+from typing import Iterator, List, Sequence
+
+from src.utils import compile_operation_matcher
+from src.config import (EXPORT_STORE_FILENAME, BINANCE_EXPORT_FIELDS, BINANCE_EXPORT_KEY_FIELDS,
+                        BINANCE_EXPORT_ROW_FIELDS, CLEANER_BATCH_SIZE, CLEANER_BUFFER_SIZE)
+
+
+class ExportStore():
+    """
+    SQLite store of Binance transaction exports, indexed for filtered extracts.
+
+    Every row of an export is kept as written, with its position in the export, and is
+    indexed by UTC_Time alone and by Coin and Operation together with UTC_Time, so that
+    extracts by time range, coin or operation only read the rows they return.
+
+    A row is identified by its BINANCE_EXPORT_ROW_FIELDS, along with how many identical
+    rows came before it in its export, since an account can make the same change twice
+    within a second. Ingesting only adds rows that are not stored yet, so overlapping or
+    repeated exports never duplicate rows, and exports of other accounts, coins or
+    operations for the same period never replace each other.
+    """
+    def __init__(self, path=EXPORT_STORE_FILENAME):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self.path = path
+        self.connection = sqlite3.connect(path, isolation_level=None)
+        self.connection.execute("PRAGMA journal_mode=WAL")
+
+        columns = ", ".join(f"{self.__get_column(field)} TEXT NOT NULL" for field in BINANCE_EXPORT_FIELDS)
+        row_columns = ", ".join(map(self.__get_column, BINANCE_EXPORT_ROW_FIELDS))
+        self.connection.execute(f"""
+            CREATE TABLE IF NOT EXISTS rows (id INTEGER PRIMARY KEY, {columns}, occurrence INTEGER NOT NULL)
+        """)
+        self.connection.execute(f"CREATE UNIQUE INDEX IF NOT EXISTS rows_key ON rows ({row_columns}, occurrence)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS rows_utc_time ON rows (utc_time)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS rows_coin ON rows (coin, utc_time)")
+        self.connection.execute("CREATE INDEX IF NOT EXISTS rows_operation ON rows (operation, utc_time)")
+
+    def ingest(self, filename: str) -> int:
+        """
+        Ingests a Binance transaction export, adding the rows that are not stored yet.
+
+        Args:
+            filename (str): Binance export CSV, with at least the BINANCE_EXPORT_KEY_FIELDS columns
+
+        Returns:
+            int: Number of rows added
+        """
+        with open(filename, "r", newline="", buffering=CLEANER_BUFFER_SIZE) as read_file:
+            reader = csv.reader(read_file, skipinitialspace=True, delimiter=",", quotechar="|")
+
+            field_names = [field.strip() for field in next(reader, [])]
+            missing = [field for field in BINANCE_EXPORT_KEY_FIELDS if field not in field_names]
+            if missing:
+                raise ValueError(f"{filename} is not a Binance export, it is missing the columns {', '.join(missing)}")
+
+            # Columns the export lacks, or a short row lacks, are stored empty
+            indexes = [field_names.index(field) if field in field_names else None for field in BINANCE_EXPORT_FIELDS]
+            key_width = max(field_names.index(field) for field in BINANCE_EXPORT_KEY_FIELDS) + 1
+
+            columns = ", ".join(map(self.__get_column, BINANCE_EXPORT_FIELDS))
+            placeholders = ", ".join("?" for _ in BINANCE_EXPORT_FIELDS)
+
+            self.connection.execute("BEGIN")
+            try:
+                self.connection.execute(f"CREATE TEMP TABLE incoming AS SELECT {columns} FROM rows WHERE 0")
+
+                while True:
+                    rows = list(islice(reader, CLEANER_BATCH_SIZE))
+                    if not rows:
+                        break
+
+                    batch = [[row[index] if index is not None and index < len(row) else "" for index in indexes]
+                             for row in rows if len(row) >= key_width]
+
+                    self.connection.executemany(f"INSERT INTO incoming ({columns}) VALUES ({placeholders})", batch)
+
+                # incoming is in export order, so ids keep the order of rows within a second
+                row_columns = ", ".join(map(self.__get_column, BINANCE_EXPORT_ROW_FIELDS))
+                cursor = self.connection.execute(f"""
+                    INSERT OR IGNORE INTO rows ({columns}, occurrence)
+                    SELECT {columns}, ROW_NUMBER() OVER (PARTITION BY {row_columns} ORDER BY rowid) - 1
+                    FROM incoming ORDER BY rowid
+                """)
+                ingested = cursor.rowcount
+                self.connection.execute("DROP TABLE incoming")
+                self.connection.execute("COMMIT")
+            except BaseException:
+                self.connection.execute("ROLLBACK")
+                raise
+
+        return ingested
+
+    def query(self, operations: Sequence=(), operation_prefixes: Sequence=(), coins: Sequence=(),
+              start_date: datetime=None, end_date: datetime=None) -> Iterator[List[str]]:
+        """
+        Yields the stored rows matching every given filter, in time order.
+
+        Operations match like the cleaner's filter, either exactly or by prefix, and are
+        resolved against the operations in the store first, so that the operation index
+        is used for them too.
+
+        Args:
+            operations (Sequence): Operations to keep exactly, or any if neither these nor prefixes are given
+            operation_prefixes (Sequence): Prefixes of operations to keep
+            coins (Sequence): Coins to keep, or any if empty
+            start_date (datetime): First day to keep, in UTC
+            end_date (datetime): Last day to keep, in UTC, inclusive
+
+        Yields:
+            List[str]: Row, in BINANCE_EXPORT_FIELDS order
+        """
+        conditions = []
+        parameters = []
+
+        if operations or operation_prefixes:
+            matcher = compile_operation_matcher(operations=operations, prefixes=operation_prefixes)
+            stored = [operation for (operation,) in self.connection.execute("SELECT DISTINCT operation FROM rows")]
+
+            matched = [operation for operation in stored if matcher.match(operation.strip())]
+            conditions.append(f"operation IN ({', '.join('?' for _ in matched)})")
+            parameters.extend(matched)
+
+        if coins:
+            conditions.append(f"coin IN ({', '.join('?' for _ in coins)})")
+            parameters.extend(coins)
+
+        # UTC_Time is YYYY-MM-DD HH:MM:SS, so compares in time order as text
+        if start_date:
+            conditions.append("utc_time >= ?")
+            parameters.append(start_date.strftime("%Y-%m-%d"))
+
+        if end_date:
+            conditions.append("utc_time < ?")
+            parameters.append((end_date + timedelta(days=1)).strftime("%Y-%m-%d"))
+
+        columns = ", ".join(map(self.__get_column, BINANCE_EXPORT_FIELDS))
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+
+        cursor = self.connection.execute(f"SELECT {columns} FROM rows {where} ORDER BY utc_time, id", parameters)
+        while True:
+            rows = cursor.fetchmany(CLEANER_BATCH_SIZE)
+            if not rows:
+                break
+
+            yield from rows
+
+    def close(self) -> None:
+        self.connection.close()
+
+    """ ============================== Helpers ============================== """
+    def __get_column(self, field):
+        return field.lower()
@@ -0,0 +1,173 @@
+import os
+import time
+import threading
+
+import numpy
+
+from datetime import date as Date, datetime
+from typing import List, Sequence
+from urllib.request import urlopen
+
+from src.config import (CACHE_DIR, ECB_RATES_FILENAME, ECB_RATES_TTL, ECB_RATES_URL, FIAT_USD, FX_MAX_CARRY_DAYS,
+                        SOURCE_COINGECKO)
+
+
+converter = None
+offline = False
+lock = threading.Lock()
+
+
+def set_offline(enabled: bool) -> None:
+    """
+    Toggles offline mode, in which the cached ECB rates are used without being refreshed.
+
+    Args:
+        enabled (bool): Whether to run offline
+    """
+    global offline
+    offline = enabled
+
+
+def get_converter():
+    """
+    Gets the process-wide currency converter, creating it on first use.
+
+    The converter is loaded from a copy of the ECB history kept in the cache directory,
+    which is refreshed once it is older than ECB_RATES_TTL. If the file cannot be
+    downloaded, a stale copy is used, and without any copy the rates bundled with
+    CurrencyConverter are used.
+
+    Returns:
+        CurrencyConverter: Shared currency converter
+    """
+    global converter
+
+    with lock:
+        if converter is None:
+            from currency_converter import CurrencyConverter
+
+            path = get_rates_file()
+            converter = CurrencyConverter(path) if path else CurrencyConverter()
+
+    return converter
+
+
+def get_native_currencies(currencies: Sequence[str], source: str) -> List[str]:
+    """
+    Gets the currencies that ECB does not publish rates for, which are quoted by the price
+    source itself instead of being converted from USD.
+
+    CoinGecko quotes prices in many currencies, but Binance prices are only in USD, so
+    a currency without an ECB rate cannot be priced from Binance at all.
+
+    Args:
+        currencies (Sequence[str]): Currencies besides USD
+        source (str): Source the prices are fetched from
+
+    Returns:
+        List[str]: Currencies to fetch from the source, in the order given
+    """
+    supported = get_converter().currencies if currencies else set()
+    native = [currency for currency in currencies if currency not in supported]
+
+    if native and source != SOURCE_COINGECKO:
+        raise ValueError(f"No exchange rates for {', '.join(native)}, the supported currencies are "
+                         f"{', '.join(sorted(supported))}")
+
+    return native
+
+
+def get_rates_file() -> str:
+    """
+    Gets the path to the cached ECB history, refreshing it if it is stale.
+
+    Returns:
+        str: Path to the cached file, or None if there is no usable copy
+    """
+    path = os.path.join(CACHE_DIR, ECB_RATES_FILENAME)
+    exists = os.path.exists(path)
+
+    if offline or (exists and time.time() - os.path.getmtime(path) <= ECB_RATES_TTL):
+        return path if exists else None
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    temp_path = f"{path}.tmp"
+    try:
+        with urlopen(ECB_RATES_URL, timeout=30) as response, open(temp_path, "wb") as write_file:
+            write_file.write(response.read())
+
+        os.replace(temp_path, path)
+    except OSError:
+        print("Note: Could not refresh ECB exchange rates, using the last known rates.")
+
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+
+        return path if exists else None
+
+    return path
+
+
+class RateTable():
+    """
+    USD exchange rates for every day of a date span, looked up once per run.
+
+    Rates are kept as one NumPy array per currency, indexed by day, so converting many
+    prices is a single vectorized multiplication. Days without an ECB rate, such as
+    weekends and holidays, carry the last published rate forward, looking up to
+    FX_MAX_CARRY_DAYS before the span for it.
+    """
+    def __init__(self, currencies: Sequence[str], start_date: datetime, end_date: datetime, converter=None):
+        """
+        Args:
+            currencies: currencies to convert USD to
+            start_date: first day of the span
+            end_date: last day of the span, inclusive
+            converter: CurrencyConverter to read rates from, defaults to the shared converter
+        """
+        converter = converter or get_converter()
+
+        self.start = start_date.toordinal()
+        self.end = end_date.toordinal()
+        self.rates = {currency: self.__get_rates(converter, currency) for currency in currencies}
+
+    def covers(self, currencies: Sequence[str], start_date: datetime, end_date: datetime) -> bool:
+        return (all(currency in self.rates for currency in currencies)
+                and self.start <= start_date.toordinal() and end_date.toordinal() <= self.end)
+
+    def convert(self, prices: numpy.ndarray, currency: str, dates: List[datetime]) -> numpy.ndarray:
+        """
+        Converts USD prices to a currency, each at the rate of its date.
+
+        Args:
+            prices (numpy.ndarray): Prices in USD
+            currency (str): Currency to convert to
+            dates (List[datetime]): Date of each price, within the span of the table
+
+        Returns:
+            numpy.ndarray: Prices in currency
+        """
+        days = numpy.fromiter((date.toordinal() for date in dates), dtype=numpy.int64, count=len(dates))
+
+        return numpy.asarray(prices, dtype=numpy.float64) * self.rates[currency][days - self.start]
+
+    """ ============================== Helpers ============================== """
+    def __get_rates(self, converter, currency):
+        from currency_converter import RateNotFoundError
+
+        if currency == FIAT_USD:
+            return numpy.ones(self.end - self.start + 1)
+
+        rates = numpy.empty(self.end - self.start + 1)
+        rate = None
+        for day in range(self.start - FX_MAX_CARRY_DAYS, self.end + 1):
+            try:
+                rate = float(converter.convert(1, FIAT_USD, currency, date=Date.fromordinal(day)))
+            except RateNotFoundError:
+                if rate is None and day >= self.start:
+                    raise ValueError(f"No {currency} exchange rate on or before {Date.fromordinal(day)}")
+
+            if day >= self.start:
+                rates[day - self.start] = rate
+
+        return rates
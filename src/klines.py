@@ -0,0 +1,228 @@
+import io
+import os
+import re
+import json
+import calendar
+import threading
+import zipfile
+
+import numpy
+
+from typing import Dict, Iterable, List, Tuple
+
+from src.config import KLINE_STORE_DIR, KLINE_STORE_INTERVAL, DAY_MILLISECONDS
+
+
+DUMP_FILENAME = re.compile(r"(?P<symbol>[A-Z0-9]+)-(?P<interval>\w+)-(?P<year>\d{4})-(?P<month>\d{2})(?:-(?P<day>\d{2}))?\.(?:zip|csv)\Z")
+
+
+class KlineStore():
+    """
+    Memory-mapped columnar store of hourly Binance klines, imported from the public data dumps.
+
+    Every symbol is a directory holding one raw array file per column, sorted by open_time,
+    along with coverage.json listing the time ranges the imported files span. A range is
+    only answered from the store when it is fully covered, so that gaps in Binance's own
+    history are not mistaken for files that were never imported.
+    """
+    COLUMNS = {
+        "open_time": "<i8",
+        "open": "<f8",
+        "high": "<f8",
+        "low": "<f8",
+        "close": "<f8",
+        "volume": "<f8",
+        "quote_volume": "<f8",
+    }
+    # Positions of COLUMNS in the dump CSVs
+    DUMP_COLUMNS = (0, 1, 2, 3, 4, 5, 7)
+
+    def __init__(self, directory=KLINE_STORE_DIR):
+        self.directory = directory
+
+        self.columns = {}
+        self.coverage = {}
+        self.lock = threading.Lock()
+
+    def __contains__(self, symbol):
+        return bool(self.__get_coverage(symbol))
+
+    def covers(self, symbol, start, end):
+        """
+        Checks whether every kline opening between start and end was imported.
+
+        Args:
+            symbol (str): Symbol, such as BTCUSDT
+            start (int): Inclusive start timestamp, in milliseconds
+            end (int): Inclusive end timestamp, in milliseconds
+
+        Returns:
+            bool: True if a single imported range spans start to end
+        """
+        return any(range_start <= start and end <= range_end for range_start, range_end in self.__get_coverage(symbol))
+
+    def get_klines(self, symbol, start, end) -> Dict[str, numpy.ndarray]:
+        """
+        Gets the klines opening between start and end.
+
+        Args:
+            symbol (str): Symbol, such as BTCUSDT
+            start (int): Inclusive start timestamp, in milliseconds
+            end (int): Inclusive end timestamp, in milliseconds
+
+        Returns:
+            Dict[str, numpy.ndarray]: Dictionary of column name to a read-only view of the
+                column, sorted by open_time
+        """
+        columns = self.__get_columns(symbol)
+        if not columns:
+            return {name: numpy.empty(0, dtype=dtype) for name, dtype in self.COLUMNS.items()}
+
+        first = numpy.searchsorted(columns["open_time"], start, side="left")
+        last = numpy.searchsorted(columns["open_time"], end, side="right")
+
+        return {name: column[first:last] for name, column in columns.items()}
+
+    def import_files(self, filenames: Iterable[str]) -> Dict[str, int]:
+        """
+        Imports Binance kline dumps, such as BTCUSDT-1h-2021-01.zip, into the store.
+
+        Files are named SYMBOL-INTERVAL-YYYY-MM or SYMBOL-INTERVAL-YYYY-MM-DD, either zipped as
+        published or extracted to CSV, and only the hourly interval is accepted. Klines that
+        were already imported are replaced.
+
+        Args:
+            filenames (Iterable[str]): Dump files to import
+
+        Returns:
+            Dict[str, int]: Dictionary of symbol to the number of klines it now holds
+        """
+        dumps = {}
+        for filename in filenames:
+            symbol, period, columns = self.__read_dump(filename)
+            dumps.setdefault(symbol, []).append((period, columns))
+
+        imported = {}
+        for symbol, symbol_dumps in dumps.items():
+            with self.lock:
+                self.columns.pop(symbol, None)
+                self.coverage.pop(symbol, None)
+
+            existing = self.__get_columns(symbol)
+            coverage = self.__get_coverage(symbol) + [period for period, _ in symbol_dumps]
+
+            # New klines come first, so that they win over existing ones with the same open_time
+            parts = [columns for _, columns in symbol_dumps] + ([existing] if existing else [])
+            merged = {name: numpy.concatenate([part[name] for part in parts]) for name in self.COLUMNS}
+
+            _, indexes = numpy.unique(merged["open_time"], return_index=True)
+            merged = {name: column[indexes] for name, column in merged.items()}
+
+            self.__write(symbol=symbol, columns=merged, coverage=self.__merge_ranges(coverage))
+            imported[symbol] = len(indexes)
+
+        return imported
+
+    """ ============================== Helpers ============================== """
+    def __get_columns(self, symbol):
+        with self.lock:
+            if symbol not in self.columns:
+                columns = {}
+                for name, dtype in self.COLUMNS.items():
+                    path = os.path.join(self.directory, symbol, name)
+
+                    if not os.path.exists(path) or not os.path.getsize(path):
+                        columns = {}
+                        break
+
+                    columns[name] = numpy.memmap(path, dtype=dtype, mode="r")
+
+                self.columns[symbol] = columns
+
+        return self.columns[symbol]
+
+    def __get_coverage(self, symbol):
+        with self.lock:
+            if symbol not in self.coverage:
+                try:
+                    with open(os.path.join(self.directory, symbol, "coverage.json")) as read_file:
+                        self.coverage[symbol] = [tuple(period) for period in json.load(read_file)]
+                except (OSError, ValueError):
+                    self.coverage[symbol] = []
+
+        return list(self.coverage[symbol])
+
+    def __write(self, symbol, columns, coverage):
+        directory = os.path.join(self.directory, symbol)
+        os.makedirs(directory, exist_ok=True)
+
+        # Every file is replaced atomically, and coverage last, so an interrupted import never claims missing klines
+        for name, dtype in self.COLUMNS.items():
+            path = os.path.join(directory, name)
+            columns[name].astype(dtype).tofile(f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+
+        path = os.path.join(directory, "coverage.json")
+        with open(f"{path}.tmp", "w") as write_file:
+            json.dump(coverage, write_file)
+        os.replace(f"{path}.tmp", path)
+
+        with self.lock:
+            self.columns.pop(symbol, None)
+            self.coverage.pop(symbol, None)
+
+    def __read_dump(self, filename) -> Tuple[str, Tuple[int, int], Dict[str, numpy.ndarray]]:
+        match = DUMP_FILENAME.match(os.path.basename(filename))
+        if not match:
+            raise ValueError(f"{filename} is not named like a Binance kline dump, such as BTCUSDT-1h-2021-01.zip")
+
+        if match["interval"] != KLINE_STORE_INTERVAL:
+            raise ValueError(f"{filename} holds {match['interval']} klines, only {KLINE_STORE_INTERVAL} klines can be imported")
+
+        if filename.endswith(".zip"):
+            with zipfile.ZipFile(filename) as archive:
+                with archive.open(archive.namelist()[0]) as read_file:
+                    rows = self.__parse_dump(io.TextIOWrapper(read_file))
+        else:
+            with open(filename) as read_file:
+                rows = self.__parse_dump(read_file)
+
+        columns = {name: rows[:, index] for index, name in enumerate(self.COLUMNS)}
+        columns["open_time"] = columns["open_time"].astype("<i8")
+
+        # Dumps from 2025 onwards have microsecond timestamps
+        microseconds = columns["open_time"] > 10 ** 14
+        columns["open_time"][microseconds] //= 1000
+
+        year, month = int(match["year"]), int(match["month"])
+        if match["day"]:
+            start = calendar.timegm((year, month, int(match["day"]), 0, 0, 0)) * 1000
+            end = start + DAY_MILLISECONDS - 1
+        else:
+            start = calendar.timegm((year, month, 1, 0, 0, 0)) * 1000
+            end = start + calendar.monthrange(year, month)[1] * DAY_MILLISECONDS - 1
+
+        return match["symbol"], (start, end), columns
+
+    def __parse_dump(self, read_file) -> numpy.ndarray:
+        lines = [line for line in read_file if line.strip()]
+
+        # Newer dumps start with a header row
+        if lines and not lines[0][0].isdigit():
+            lines = lines[1:]
+
+        if not lines:
+            return numpy.empty((0, len(self.COLUMNS)))
+
+        return numpy.loadtxt(lines, delimiter=",", usecols=self.DUMP_COLUMNS, dtype="<f8", ndmin=2)
+
+    def __merge_ranges(self, ranges) -> List[Tuple[int, int]]:
+        merged = []
+        for start, end in sorted(ranges):
+            # Ranges are inclusive, so a range starting right after the previous one ends is contiguous
+            if merged and start <= merged[-1][1] + 1:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+
+        return merged
@@ -0,0 +1,158 @@
+import json
+import asyncio
+
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from src.fx import get_native_currencies
+from src.models.coin import Coin
+from src.pricing import AsyncPriceClient
+from src.api import BinanceClient, GeckoClient
+from src.config import (BINANCE_AIRDROP, COMMAND_BINANCE_REWARDS, COMMAND_GENERIC_REWARDS,
+                        MANIFEST_WORKERS, PRICE_METHOD_AVERAGE, OUTPUT_FORMAT_CSV, OUTPUT_EXTENSIONS)
+
+
+# Keys every job of each command needs
+JOB_KEYS = {
+    COMMAND_BINANCE_REWARDS: ["ticker", "start_date", "end_date"],
+    COMMAND_GENERIC_REWARDS: ["ticker", "input_filename"],
+}
+
+
+def load_manifest(manifest_filename: str) -> List[Dict]:
+    """
+    Reads the jobs of a manifest file.
+
+    The manifest is either JSON or, when the file name ends in .yaml or .yml, YAML. It
+    contains a list of jobs, either at the top level or under a "jobs" key, where each job
+    has a "ticker" and a "command" of track-binance-rewards or track-generic-rewards,
+    along with the arguments of that command:
+    - track-binance-rewards: "start_date", "end_date" and optionally "income_type" and "group_by_day"
+    - track-generic-rewards: "input_filename"
+    Any job may also set "output" and "currencies".
+
+    Args:
+        manifest_filename (str): Path to the manifest file
+
+    Returns:
+        List[Dict]: List of jobs
+    """
+    with open(manifest_filename) as read_file:
+        if manifest_filename.endswith((".yaml", ".yml")):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("PyYAML is required to read YAML manifests, or use a JSON manifest instead")
+
+            manifest = yaml.safe_load(read_file)
+        else:
+            manifest = json.load(read_file)
+
+    jobs = manifest["jobs"] if isinstance(manifest, dict) else manifest
+
+    for index, job in enumerate(jobs):
+        if job.get("command") not in JOB_KEYS:
+            raise ValueError(f"Job {index} has unknown command {job.get('command')!r}")
+
+        missing = [key for key in JOB_KEYS[job["command"]] if key not in job]
+        if missing:
+            raise ValueError(f"Job {index} is missing {', '.join(missing)}")
+
+    return jobs
+
+
+class ManifestRunner():
+    """
+    Runs many tracker jobs together with one set of clients.
+
+    Jobs are run in three stages. First every job loads its rows, then USD prices are
+    fetched once per ticker for the union of all dates the jobs need, and finally each job
+    receives its prices, converts them to its own currencies and writes its output.
+    Loading and writing run jobs in parallel, while pricing shares one AsyncPriceClient
+    per source so that the per-source concurrency limits apply across every job. Jobs
+    that load no rows, such as a window without any records, are reported and skipped,
+    and the other jobs are still written.
+    """
+    def __init__(self, jobs, currencies=None, cache=None, concurrency=None, workers=MANIFEST_WORKERS,
+                 price_method=PRICE_METHOD_AVERAGE, output_format=OUTPUT_FORMAT_CSV, compression=None, dataset=None,
+                 rollup=None):
+        self.jobs = jobs
+        self.currencies = currencies
+        self.concurrency = concurrency or {}
+        self.workers = workers
+
+        self.output_format = output_format
+        self.compression = compression
+        self.dataset = dataset
+        self.rollup = rollup
+
+        self.binance = BinanceClient(cache=cache, price_method=price_method)
+        self.gecko = GeckoClient(cache=cache)
+
+    def run(self) -> None:
+        coins = [self.__get_coin(index=index, job=job) for index, job in enumerate(self.jobs)]
+
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            list(executor.map(self.__load, self.jobs, coins))
+
+            for job, coin in zip(self.jobs, coins):
+                if not coin.processed_data:
+                    print(f"Skipping {job['command']} for {job['ticker']}, it has no records to write")
+
+            coins = [coin for coin in coins if coin.processed_data]
+            prices = asyncio.run(self.__get_prices(coins=coins))
+
+            for coin in coins:
+                coin.apply_prices(prices_by_date=prices[self.__get_group(coin)])
+
+            list(executor.map(lambda coin: coin.write_to_disk(), coins))
+
+    """ ============================== Helpers ============================== """
+    def __get_coin(self, index, job):
+        ticker = job["ticker"]
+        output_filename = job.get("output")
+
+        if output_filename is None and sum(other["ticker"] == ticker for other in self.jobs) > 1:
+            identifier = str(int(datetime.now().timestamp())*1000)
+            output_filename = f"{ticker}_{identifier}_{index}.{OUTPUT_EXTENSIONS[self.output_format]}"
+
+        return Coin(ticker=ticker, currencies=job.get("currencies", self.currencies), output_filename=output_filename,
+                    concurrency=self.concurrency, binance=self.binance, gecko=self.gecko,
+                    output_format=self.output_format, compression=self.compression, dataset=self.dataset,
+                    rollup=self.rollup)
+
+    def __load(self, job, coin):
+        if job["command"] == COMMAND_BINANCE_REWARDS:
+            coin.load_income(income_type=job.get("income_type", BINANCE_AIRDROP),
+                             start_date=job["start_date"],
+                             end_date=job["end_date"],
+                             group_by_day=job.get("group_by_day", False))
+        else:
+            coin.load_data(input_filename=job["input_filename"])
+
+    def __get_group(self, coin):
+        return (coin.ticker, coin.get_price_client().SOURCE)
+
+    async def __get_prices(self, coins):
+        pricers = {client.SOURCE: AsyncPriceClient(client=client, concurrency=self.concurrency.get(client.SOURCE))
+                   for client in (self.binance, self.gecko)}
+
+        # Every job of a group is priced in USD over the union of their dates, and converts to its own currencies,
+        # so only currencies without ECB rates are fetched, for every job of the group that needs one
+        dates_by_group = {}
+        currencies_by_group = {}
+        for coin in coins:
+            group = self.__get_group(coin)
+            dates_by_group.setdefault(group, set()).update(coin.processed_data.dates)
+            currencies_by_group.setdefault(group, set()).update(get_native_currencies(currencies=coin.currencies,
+                                                                                      source=group[1]))
+
+        groups = list(dates_by_group)
+        results = await asyncio.gather(*[
+            pricers[source].get_average_prices_for_dates(ticker=ticker, dates=dates_by_group[(ticker, source)],
+                                                         currencies=sorted(currencies_by_group[(ticker, source)]) or None)
+            for ticker, source in groups
+        ])
+
+        return dict(zip(groups, results))
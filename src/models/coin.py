@@ -1,41 +1,251 @@
+import os
 import csv
+import asyncio
 
 from datetime import datetime
 
+from src.fx import RateTable, get_native_currencies
 from src.api import BinanceClient, GeckoClient
-from src.models.data import Data, CardanoData, SavingsData
+from src.columnar import ColumnarWriter, build_table, append_to_dataset
+from src.pricing import AsyncPriceClient
+from src.profiling import profiled, timed, count
+from src.models.data import Data, CardanoData, SavingsData, DataStore
 from src.utils import string_to_datetime, datetime_range, timestamp_to_datetime
-from src.config import CARDANO, VECHAIN, VETHOR, BINANCE_AIRDROP, BINANCE_SAVINGS
+from src.config import (CARDANO, VECHAIN, VETHOR, BINANCE_AIRDROP, BINANCE_SAVINGS, FIAT_USD, STREAM_WINDOW_SIZE,
+                        PRICE_METHOD_AVERAGE, OUTPUT_FORMAT_CSV, OUTPUT_EXTENSIONS, DATASET_ROWS_PER_FILE)
 
 
 class Coin():
-    def __init__(self, ticker, currencies, output_filename=None):
+    def __init__(self, ticker, currencies, output_filename=None, cache=None, concurrency=None, binance=None, gecko=None,
+                 price_method=PRICE_METHOD_AVERAGE, output_format=OUTPUT_FORMAT_CSV, compression=None, dataset=None,
+                 rollup=None):
         self.ticker = ticker
-        self.currencies = currencies
-        self.processed_data = []
+        # USD prices are always included, so only the other currencies are converted to
+        self.currencies = [currency.upper() for currency in currencies or [] if currency.upper() != FIAT_USD]
+        self.concurrency = concurrency or {}
+        self.processed_data = DataStore()
 
-        self.gecko = GeckoClient()
-        self.binance = BinanceClient()
+        # Clients are built on first use, so a run never builds one it does not need
+        self.cache = cache
+        self.price_method = price_method
+        self.__gecko = gecko
+        self.__binance = binance
+        self.price_client = None
+        self.rate_table = None
+
+        self.output_format = output_format
+        self.compression = compression
+        # Directory of a Parquet or Arrow dataset to append to, instead of writing output_filename
+        self.dataset = dataset
+        # Rollup that every written row is also added to
+        self.rollup = rollup
 
         if not output_filename:
             identifier = str(int(datetime.now().timestamp())*1000)
-            self.output_filename = f"{self.ticker}_{identifier}.csv"
+            self.output_filename = f"{self.ticker}_{identifier}.{OUTPUT_EXTENSIONS[output_format]}"
         else:
             self.output_filename = output_filename
 
+    @property
+    def binance(self):
+        if self.__binance is None:
+            self.__binance = BinanceClient(cache=self.cache, price_method=self.price_method)
+
+        return self.__binance
+
+    @property
+    def gecko(self):
+        if self.__gecko is None:
+            self.__gecko = GeckoClient(cache=self.cache)
+
+        return self.__gecko
+
     def process_data(self, input_filename):
+        self.load_data(input_filename=input_filename)
+        self.price_data()
+
+    def load_data(self, input_filename):
+        self.processed_data.extend(self.__read_data(input_filename=input_filename))
+
+    def stream_data(self, input_filename, window_size=STREAM_WINDOW_SIZE):
+        """
+        Reads, prices and writes input_filename one window of rows at a time.
+
+        Unlike process_data followed by write_to_disk, only window_size rows are held in
+        memory at once, and each window is flushed to disk as soon as it is priced, so the
+        first rows appear quickly and everything written so far survives an interruption.
+
+        Args:
+            input_filename (str): CSV file to read from that contains reward information
+            window_size (int): Number of rows to price and write together
+        """
+        rows = self.__read_data(input_filename=input_filename)
+        windows = self.__price_windows(client=self.get_price_client(), rows=rows, window_size=window_size)
+
+        self.__write_windows(windows=windows)
+
+    def process_income(self, income_type, start_date, end_date, group_by_day=False):
+        self.load_income(income_type=income_type, start_date=start_date, end_date=end_date, group_by_day=group_by_day)
+        self.price_data()
+
+    def load_income(self, income_type, start_date, end_date, group_by_day=False):
+        """
+        Fetches the savings interest or airdrops of a date range.
+
+        Args:
+            income_type (str): Income type
+            start_date (str): Start date to process from
+            end_date (str): End date to process to
+            group_by_day (bool): Whether to sum the records of each day into one row,
+                instead of keeping a row per record
+        """
+        start_date = string_to_datetime(start_date)
+        end_date = string_to_datetime(end_date)
+
+        # Savings and airdrops only exist for coins on Binance
+        self.price_client = self.binance
+
+        records = self.__read_income(income_type=income_type, start_date=start_date, end_date=end_date)
+        self.processed_data.extend(data for _, data in records)
+
+        if group_by_day:
+            with timed("coin.group_by_day"):
+                self.processed_data = self.processed_data.group_by_day()
+
+    def stream_income(self, income_type, start_date, end_date, checkpoint, window_size=STREAM_WINDOW_SIZE):
+        """
+        Fetches, prices and appends only the income that is newer than a checkpoint.
+
+        Records after the checkpoint's cursor are priced and appended to the output in
+        windows of about window_size rows, saving the checkpoint after each window, so a
+        later run only fetches new records and an interrupted run resumes from the last
+        saved window. If the checkpoint belongs to another output or start date, or its
+        output was written with other currencies or another price method, the output is
+        rewritten from start_date.
+
+        Args:
+            income_type (str): Income type
+            start_date (str): Start date to process from
+            end_date (str): End date to process to
+            checkpoint (Checkpoint): Checkpoint of this ticker and income type
+            window_size (int): Number of rows to price and write together
+        """
+        self.price_client = self.binance
+        fields = SavingsData.get_fields(ticker=self.ticker, currencies=self.currencies)
+
+        if checkpoint.is_resumable(output_filename=self.output_filename, start_date=start_date, fields=fields,
+                                   price_method=self.price_method):
+            # Drop anything written after the checkpoint was last saved
+            with open(self.output_filename, "r+") as write_file:
+                write_file.truncate(checkpoint.output_size)
+
+            fetch_start = max(string_to_datetime(start_date), datetime.fromtimestamp(checkpoint.cursor // 1000))
+        else:
+            if checkpoint.rows and checkpoint.output_filename == self.output_filename:
+                print(f"Currencies, price method or start date changed since the last run, rewriting {self.output_filename}")
+
+            checkpoint.reset(output_filename=self.output_filename, start_date=start_date, fields=fields,
+                             price_method=self.price_method)
+            fetch_start = string_to_datetime(start_date)
+
+            # The output is rewritten from start_date, so its earlier rows leave the rollup too
+            self.__discard_from_rollup()
+
+        records = self.__read_income(income_type=income_type, start_date=fetch_start, end_date=string_to_datetime(end_date))
+        records = ((time, data) for time, data in records if time > checkpoint.cursor)
+
+        written = 0
+        for window, cursor in self.__get_income_windows(records=records, window_size=window_size):
+            self.__price_rows(client=self.binance, rows=window)
+
+            with timed("coin.write_window"), open(self.output_filename, "a" if checkpoint.rows else "w", newline="") as write_file:
+                writer = csv.writer(write_file)
+
+                if not checkpoint.rows:
+                    writer.writerow(window.get_fields(ticker=self.ticker))
+
+                writer.writerows(window.get_rows())
+
+                write_file.flush()
+                os.fsync(write_file.fileno())
+                output_size = write_file.tell()
+
+            checkpoint.advance(cursor=cursor, rows=len(window), output_size=output_size)
+            self.__add_to_rollup(rows=window)
+            written += len(window)
+
+        if written:
+            print(f"{written} new rows appended to {self.output_filename}")
+        else:
+            print(f"No new records since the last run, {self.output_filename} is up to date")
+
+    def price_data(self):
+        self.__price_rows(client=self.get_price_client(), rows=self.processed_data)
+
+    def apply_prices(self, prices_by_date):
+        """
+        Sets prices for every loaded row from already fetched USD prices, converting them to
+        the other currencies.
+
+        Args:
+            prices_by_date (Dict[datetime, Dict[str, float]]): Prices for at least every
+                loaded date, in the format returned by get_average_prices_for_dates, along
+                with any currencies get_native_currencies gives for the price client
+        """
+        self.__apply_prices(rows=self.processed_data, prices_by_date=prices_by_date, client=self.get_price_client())
+
+    @profiled("coin.get_price_client")
+    def get_price_client(self):
+        # Decided once per ticker, as every row of a run is priced from the same source
+        if self.price_client is None:
+            if self.binance.is_ticker_on_binance(ticker=self.ticker):
+                self.price_client = self.binance
+            else:
+                self.price_client = self.gecko
+
+        return self.price_client
+
+    @profiled("coin.write_to_disk")
+    def write_to_disk(self):
+        if not self.processed_data:
+            raise ValueError("Data not yet processed!")
+
+        if self.dataset:
+            self.__append_to_dataset(windows=[self.processed_data])
+        elif self.output_format == OUTPUT_FORMAT_CSV:
+            with open(self.output_filename, "w", newline="") as write_file:
+                writer = csv.writer(write_file)
+
+                writer.writerow(self.processed_data.get_fields(ticker=self.ticker))
+                writer.writerows(self.processed_data.get_rows())
+
+            print(f"CSV File written to {self.output_filename}")
+        else:
+            with ColumnarWriter(output_filename=self.output_filename, output_format=self.output_format,
+                                compression=self.compression) as writer:
+                writer.write(self.__build_table(rows=self.processed_data))
+
+            print(f"{self.output_format.capitalize()} File written to {self.output_filename}")
+
+        # Rows appended to a dataset are added to the rollup by the files they were written to
+        if not self.dataset:
+            self.__discard_from_rollup()
+            self.__add_to_rollup(rows=self.processed_data)
+
+
+    """ ============================== Helpers ============================== """
+    @profiled("coin.read_data")
+    def __read_data(self, input_filename):
         with open(input_filename, newline="") as read_file:
             reader = csv.reader(read_file, skipinitialspace=True, delimiter=",", quotechar="|")
 
             if self.ticker == CARDANO:
                 for row in reader:
-                    data = CardanoData(epoch=row[0],
-                                       start_date=string_to_datetime(row[1]),
-                                       end_date=string_to_datetime(row[2]),
-                                       amount=float(row[3]),
-                                       txn_fee=0)
-
-                    self.processed_data.append(data)
+                    yield CardanoData(epoch=row[0],
+                                      start_date=string_to_datetime(row[1]),
+                                      end_date=string_to_datetime(row[2]),
+                                      amount=float(row[3]),
+                                      txn_fee=0)
             elif self.ticker == VETHOR:
                 row = next(reader)
                 start_date = string_to_datetime(row[0])
@@ -43,73 +253,184 @@ class Coin():
                 vtho_per_day = float(row[2])
 
                 for date in datetime_range(start=start_date, end=end_date):
-                    data = Data(date=date,
-                                amount=vtho_per_day,
-                                txn_fee=0)
-
-                    self.processed_data.append(data)
+                    yield Data(date=date,
+                               amount=vtho_per_day,
+                               txn_fee=0)
             else:
                 for row in reader:
-                    data = Data(date=string_to_datetime(row[0]),
-                                amount=float(row[1]),
-                                txn_fee=float(row[2]))
+                    yield Data(date=string_to_datetime(row[0]),
+                               amount=float(row[1]),
+                               txn_fee=float(row[2]))
+
+    @profiled("coin.read_income")
+    def __read_income(self, income_type, start_date, end_date):
+        if income_type == BINANCE_SAVINGS:
+            results = self.binance.iter_saving_data(ticker=self.ticker, start_date=start_date, end_date=end_date)
+            for res in results:
+                yield res["time"], SavingsData(amount=float(res["interest"]),
+                                               date=timestamp_to_datetime(res["time"]))
+        elif income_type == BINANCE_AIRDROP:
+            results = self.binance.iter_dividend_data(ticker=self.ticker, start_date=start_date, end_date=end_date)
+            for res in results:
+                yield res["divTime"], SavingsData(amount=float(res["amount"]),
+                                                  date=timestamp_to_datetime(res["divTime"]))
 
-                    self.processed_data.append(data)
+    def __get_income_windows(self, records, window_size):
+        # Windows only end between records with different times, so that the cursor never splits a timestamp
+        window = DataStore()
+        cursor = None
+        for time, data in records:
+            if len(window) >= window_size and time != cursor:
+                yield window, cursor
+                window = DataStore()
 
-        for row in self.processed_data:
-            if self.binance.is_ticker_on_binance(ticker=self.ticker):
-                prices = self.binance.get_average_price_for_date(ticker=self.ticker, date=row.date, currencies=self.currencies)
-            else:
-                prices = self.gecko.get_average_price_for_date(ticker=self.ticker, date=row.date, currencies=self.currencies)
+            window.append(data)
+            cursor = time
 
-            for currency, price in prices.items():
-                row.price_and_value[currency] = {
-                    "price": price,
-                    "value": row.amount * price
-                }
+        if window:
+            yield window, cursor
 
-    def process_income(self, income_type, start_date, end_date):
-        start_date = string_to_datetime(start_date)
-        end_date = string_to_datetime(end_date)
+    def __price_windows(self, client, rows, window_size):
+        window = DataStore()
+        for row in rows:
+            window.append(row)
 
-        if income_type == BINANCE_SAVINGS:
-            results = self.binance.get_saving_data(ticker=self.ticker, start_date=start_date, end_date=end_date)
-            for res in results:
-                data = SavingsData(amount=float(res["interest"]),
-                                   date=timestamp_to_datetime(res["time"]))
+            if len(window) == window_size:
+                self.__price_rows(client=client, rows=window)
+                yield window
+                window = DataStore()
 
-                self.processed_data.append(data)
-        elif income_type == BINANCE_AIRDROP:
-            results = self.binance.get_dividend_data(ticker=self.ticker, start_date=start_date, end_date=end_date)
-            for res in results:
-                data = SavingsData(amount=float(res["amount"]),
-                                   date=timestamp_to_datetime(res["divTime"]))
-                self.processed_data.append(data)
+        if window:
+            self.__price_rows(client=client, rows=window)
+            yield window
 
-        for row in self.processed_data:
-            prices = self.binance.get_average_price_for_date(ticker=self.ticker, date=row.date, currencies=self.currencies)
+    def __write_windows(self, windows):
+        if self.dataset:
+            return self.__append_to_dataset(windows=windows)
 
-            for currency, price in prices.items():
-                row.price_and_value[currency] = {
-                    "price": price,
-                    "value": row.amount * price
-                }
+        self.__discard_from_rollup()
+        windows = map(self.__add_to_rollup, windows)
 
-    def write_to_disk(self):
-        if not self.processed_data:
-            raise ValueError("Data not yet processed!")
+        if self.output_format != OUTPUT_FORMAT_CSV:
+            return self.__write_columnar_windows(windows=windows)
 
-        with open(self.output_filename, "w", newline="") as write_file:
-            writer = csv.DictWriter(write_file, fieldnames=self.__get_fieldnames())
+        write_file = None
+        try:
+            for window in windows:
+                if write_file is None:
+                    write_file = open(self.output_filename, "w", newline="")
+                    writer = csv.writer(write_file)
+                    writer.writerow(window.get_fields(ticker=self.ticker))
 
-            writer.writeheader()
+                with timed("coin.write_window"):
+                    writer.writerows(window.get_rows())
+                    write_file.flush()
+        finally:
+            if write_file is not None:
+                write_file.close()
 
-            for row in self.processed_data:
-                writer.writerow(row.to_dict(ticker=self.ticker))
+        if write_file is None:
+            raise ValueError("No data to write!")
 
         print(f"CSV File written to {self.output_filename}")
 
+    def __write_columnar_windows(self, windows):
+        written = False
+        with ColumnarWriter(output_filename=self.output_filename, output_format=self.output_format,
+                            compression=self.compression) as writer:
+            for window in windows:
+                with timed("coin.write_window"):
+                    writer.write(self.__build_table(rows=window))
+                written = True
 
-    """ ============================== Helpers ============================== """
-    def __get_fieldnames(self):
-        return self.processed_data[0].get_fields(ticker=self.ticker)
+        if not written:
+            raise ValueError("No data to write!")
+
+        print(f"{self.output_format.capitalize()} File written to {self.output_filename}")
+
+    def __append_to_dataset(self, windows):
+        # Windows are buffered so that a streamed run does not leave one small file per window
+        tables, dates, rows = [], [], 0
+        for window in windows:
+            tables.append(self.__build_table(rows=window))
+            dates.extend(window.dates)
+
+            if len(dates) >= DATASET_ROWS_PER_FILE:
+                self.__flush_to_dataset(tables=tables, dates=dates)
+                rows += len(dates)
+                tables, dates = [], []
+
+        if dates:
+            self.__flush_to_dataset(tables=tables, dates=dates)
+            rows += len(dates)
+
+        if not rows:
+            raise ValueError("No data to write!")
+
+        print(f"{rows} rows appended to the {self.output_format} dataset in {self.dataset}")
+
+    def __flush_to_dataset(self, tables, dates):
+        with timed("coin.write_window"):
+            paths = append_to_dataset(tables=tables, directory=self.dataset, ticker=self.ticker,
+                                      dates=dates, output_format=self.output_format, compression=self.compression)
+
+        if self.rollup is not None:
+            with timed("coin.add_to_rollup"):
+                for path in paths:
+                    self.rollup.add_file(filename=path)
+
+    def __add_to_rollup(self, rows):
+        if self.rollup is not None:
+            with timed("coin.add_to_rollup"):
+                self.rollup.add_store(ticker=self.ticker, store=rows,
+                                      source=self.rollup.get_source(self.output_filename))
+
+        return rows
+
+    def __discard_from_rollup(self):
+        # Called before the output is written from the start, so its rows are never counted twice
+        if self.rollup is not None:
+            self.rollup.discard(self.rollup.get_source(self.output_filename))
+
+    def __build_table(self, rows):
+        return build_table(fields=rows.get_fields(ticker=self.ticker), columns=rows.get_columns())
+
+    @profiled("coin.price_rows")
+    def __price_rows(self, client, rows):
+        pricer = AsyncPriceClient(client=client, concurrency=self.concurrency.get(client.SOURCE))
+
+        # Currencies with ECB rates are converted from USD in __apply_prices, so only the others are fetched
+        native = get_native_currencies(currencies=self.currencies, source=client.SOURCE)
+        prices_by_date = asyncio.run(pricer.get_average_prices_for_dates(ticker=self.ticker, dates=rows.dates,
+                                                                         currencies=native or None))
+
+        self.__apply_prices(rows=rows, prices_by_date=prices_by_date, client=client)
+
+    @profiled("coin.apply_prices")
+    def __apply_prices(self, rows, prices_by_date, client):
+        count("coin.rows_priced", len(rows))
+
+        rows.set_prices(FIAT_USD, [prices_by_date[date][FIAT_USD] for date in rows.dates])
+
+        native = get_native_currencies(currencies=self.currencies, source=client.SOURCE)
+        for currency in native:
+            rows.set_prices(currency, [prices_by_date[date][currency] for date in rows.dates])
+
+        converted = [currency for currency in self.currencies if currency not in native]
+        if converted and rows:
+            rate_table = self.__get_rate_table(currencies=converted, start_date=min(rows.dates), end_date=max(rows.dates))
+
+            for currency in converted:
+                rows.set_prices(currency, rate_table.convert(prices=rows.prices[FIAT_USD], currency=currency, dates=rows.dates))
+
+    @profiled("coin.get_rate_table")
+    def __get_rate_table(self, currencies, start_date, end_date):
+        # Streamed windows reuse the table while it covers them, and otherwise grow it to cover both spans
+        if self.rate_table is None or not self.rate_table.covers(currencies, start_date, end_date):
+            if self.rate_table is not None:
+                start_date = min(start_date, datetime.fromordinal(self.rate_table.start))
+                end_date = max(end_date, datetime.fromordinal(self.rate_table.end))
+
+            self.rate_table = RateTable(currencies=currencies, start_date=start_date, end_date=end_date)
+
+        return self.rate_table
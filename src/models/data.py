@@ -1,36 +1,51 @@
+import numpy
+
+from array import array
+from datetime import datetime
+
 from src.utils import datetime_to_string
 from src.config import (EPOCH, DATE, START_DATE, END_DATE, AMOUNT,
-                        TXN_FEE, FIAT_USD, PRICE_USD, VALUE_USD, CARDANO)
+                        TXN_FEE, FIAT_USD, PRICE_USD, VALUE_USD, PRICE, VALUE)
 
 
 class Data():
+    __slots__ = ("date", "amount", "txn_fee")
+
     def __init__(self, date, amount, txn_fee):
         self.date = date
         self.amount = amount
         self.txn_fee = txn_fee
-        self.price_and_value = {}
 
-    def get_fields(self, ticker):
-        return [DATE, AMOUNT.format(ticker=ticker), TXN_FEE.format(currency=ticker), PRICE_USD, VALUE_USD, TXN_FEE.format(currency=FIAT_USD)]
+    @classmethod
+    def get_fields(cls, ticker, currencies=()):
+        fields = [DATE, AMOUNT.format(ticker=ticker), TXN_FEE.format(currency=ticker), PRICE_USD, VALUE_USD, TXN_FEE.format(currency=FIAT_USD)]
 
-    def to_dict(self, ticker):
-        amount_field = AMOUNT.format(ticker=ticker)
-        ticker_fee_field = TXN_FEE.format(currency=ticker)
-        usd_fee_field = TXN_FEE.format(currency=FIAT_USD)
+        for currency in currencies:
+            fields += [PRICE.format(currency=currency), VALUE.format(currency=currency), TXN_FEE.format(currency=currency)]
 
-        price = self.price_and_value[FIAT_USD]["price"]
+        return fields
 
-        return {
-            DATE: datetime_to_string(self.date),
-            amount_field: self.amount,
-            ticker_fee_field: self.txn_fee,
-            PRICE_USD: price,
-            VALUE_USD: self.price_and_value[FIAT_USD]["value"],
-            usd_fee_field: self.txn_fee * price
-        }
+    @classmethod
+    def get_columns(cls, store):
+        txn_fees = numpy.frombuffer(store.txn_fees)
+        columns = [
+            store.dates,
+            numpy.frombuffer(store.amounts),
+            txn_fees,
+            store.prices[FIAT_USD],
+            store.values[FIAT_USD],
+            txn_fees * store.prices[FIAT_USD]
+        ]
+
+        for currency in store.get_currencies():
+            columns += [store.prices[currency], store.values[currency], txn_fees * store.prices[currency]]
+
+        return columns
 
 
 class CardanoData(Data):
+    __slots__ = ("epoch", "start_date", "end_date")
+
     def __init__(self, epoch, start_date, end_date, amount, txn_fee):
         super().__init__(date=end_date, amount=amount, txn_fee=txn_fee)
 
@@ -38,37 +53,168 @@ class CardanoData(Data):
         self.start_date = start_date
         self.end_date = end_date
 
-    def get_fields(self, ticker):
-        return [EPOCH, START_DATE, END_DATE, AMOUNT.format(ticker=ticker), PRICE_USD, VALUE_USD]
+    @classmethod
+    def get_fields(cls, ticker, currencies=()):
+        fields = [EPOCH, START_DATE, END_DATE, AMOUNT.format(ticker=ticker), PRICE_USD, VALUE_USD]
 
-    def to_dict(self, ticker=CARDANO):
-        amount_field = AMOUNT.format(ticker=ticker)
+        for currency in currencies:
+            fields += [PRICE.format(currency=currency), VALUE.format(currency=currency)]
 
-        return {
-            EPOCH: self.epoch,
-            START_DATE: datetime_to_string(self.start_date),
-            END_DATE: datetime_to_string(self.end_date),
-            amount_field: self.amount,
-            PRICE_USD: self.price_and_value[FIAT_USD]["price"],
-            VALUE_USD: self.price_and_value[FIAT_USD]["value"],
-        }
+        return fields
+
+    @classmethod
+    def get_columns(cls, store):
+        columns = [
+            store.epochs,
+            store.start_dates,
+            store.dates,
+            numpy.frombuffer(store.amounts),
+            store.prices[FIAT_USD],
+            store.values[FIAT_USD]
+        ]
+
+        for currency in store.get_currencies():
+            columns += [store.prices[currency], store.values[currency]]
+
+        return columns
 
 
 class SavingsData(Data):
+    __slots__ = ()
+
     def __init__(self, date, amount):
         super().__init__(date=date, amount=amount, txn_fee=0)
 
-    def get_fields(self, ticker):
-        return [DATE, AMOUNT.format(ticker=ticker), PRICE_USD, VALUE_USD]
-
-    def to_dict(self, ticker):
-        amount_field = AMOUNT.format(ticker=ticker)
+    @classmethod
+    def get_fields(cls, ticker, currencies=()):
+        fields = [DATE, AMOUNT.format(ticker=ticker), PRICE_USD, VALUE_USD]
+
+        for currency in currencies:
+            fields += [PRICE.format(currency=currency), VALUE.format(currency=currency)]
+
+        return fields
+
+    @classmethod
+    def get_columns(cls, store):
+        columns = [
+            store.dates,
+            numpy.frombuffer(store.amounts),
+            store.prices[FIAT_USD],
+            store.values[FIAT_USD]
+        ]
+
+        for currency in store.get_currencies():
+            columns += [store.prices[currency], store.values[currency]]
+
+        return columns
+
+
+class DataStore():
+    """
+    Columnar store of processed rows.
+
+    Rows of a single Data type are appended into per-field columns - dates in a list and
+    amounts and fees in packed double arrays - instead of being kept as objects. Prices
+    and values are NumPy arrays per currency, with values computed for every row at once.
+    """
+    def __init__(self):
+        self.data_type = None
+
+        self.dates = []
+        self.amounts = array("d")
+        self.txn_fees = array("d")
+
+        # Only populated for CardanoData
+        self.epochs = []
+        self.start_dates = []
+
+        self.prices = {}
+        self.values = {}
+
+    def append(self, data):
+        if self.data_type is None:
+            self.data_type = type(data)
+        elif type(data) is not self.data_type:
+            raise TypeError(f"Cannot store {type(data).__name__} alongside {self.data_type.__name__}")
+
+        self.dates.append(data.date)
+        self.amounts.append(data.amount)
+        self.txn_fees.append(data.txn_fee)
+
+        if isinstance(data, CardanoData):
+            self.epochs.append(data.epoch)
+            self.start_dates.append(data.start_date)
+
+    def extend(self, rows):
+        for data in rows:
+            self.append(data)
+
+    def group_by_day(self):
+        """
+        Gets a store with one row per date, in order of first appearance, whose amount and
+        fee are the sums of the rows on that date.
+
+        Returns:
+            DataStore: Grouped store, without prices
+        """
+        if self.data_type is CardanoData:
+            raise ValueError("Cardano rows span epochs rather than days, so cannot be grouped by day")
+
+        indexes = {}
+        groups = numpy.fromiter((indexes.setdefault(date, len(indexes)) for date in self.dates),
+                                dtype=numpy.intp, count=len(self.dates))
+
+        grouped = DataStore()
+        grouped.data_type = self.data_type
+        grouped.dates = list(indexes)
+        grouped.amounts = array("d", numpy.bincount(groups, weights=numpy.frombuffer(self.amounts),
+                                                    minlength=len(indexes)).tobytes())
+        grouped.txn_fees = array("d", numpy.bincount(groups, weights=numpy.frombuffer(self.txn_fees),
+                                                     minlength=len(indexes)).tobytes())
+
+        return grouped
+
+    def set_prices(self, currency, prices):
+        """
+        Sets the price of every row in a currency, and computes the matching values.
+
+        Args:
+            currency (str): Currency the prices are in
+            prices (Sequence[float]): Price for each row, in row order
+        """
+        self.prices[currency] = numpy.asarray(prices, dtype=numpy.float64)
+        self.values[currency] = numpy.frombuffer(self.amounts) * self.prices[currency]
+
+    def get_currencies(self):
+        """
+        Gets the currencies other than USD that rows are priced in, in the order they were set.
+        """
+        return [currency for currency in self.prices if currency != FIAT_USD]
 
-        price = self.price_and_value[FIAT_USD]["price"]
-
-        return {
-            DATE: datetime_to_string(self.date),
-            amount_field: self.amount,
-            PRICE_USD: price,
-            VALUE_USD: self.price_and_value[FIAT_USD]["value"]
-        }
+    def get_fields(self, ticker):
+        return self.data_type.get_fields(ticker=ticker, currencies=self.get_currencies())
+
+    def get_columns(self):
+        """
+        Gets the columns of the store in get_fields order, with dates as lists of datetimes
+        and amounts, prices and values as NumPy arrays.
+        """
+        return self.data_type.get_columns(store=self)
+
+    def get_rows(self):
+        """
+        Gets the rows of the store, each as a list of values in get_fields order, formatted for CSV.
+        """
+        columns = []
+        for column in self.get_columns():
+            if isinstance(column, numpy.ndarray):
+                column = column.tolist()
+            elif column and isinstance(column[0], datetime):
+                column = [datetime_to_string(date) for date in column]
+
+            columns.append(column)
+
+        return zip(*columns)
+
+    def __len__(self):
+        return len(self.dates)
@@ -0,0 +1,117 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+from src.config import PAGINATOR_CONCURRENCY, PAGINATOR_MIN_WINDOW
+
+
+class Paginator():
+    """
+    Adaptive paginator for history endpoints that take a time window and a page limit.
+
+    The range is covered by consecutive windows that are fetched concurrently. Window sizes
+    adapt to the density of the records returned so far, aiming for half a page each, and
+    never exceed max_window. A window that returns a full page may have been truncated, so
+    it is split in half and both halves are fetched instead, down to single milliseconds.
+    Records a window returns from outside its bounds, such as those on the edge of the next
+    window, are left to the window they belong to, and records are also deduplicated by
+    id_key when they have one. Identical records returned within one window are all kept.
+    Records are yielded sorted by time_key as soon as every window before them has been
+    fetched.
+    """
+    def __init__(self, fetch, page_limit, max_window, time_key, id_key=None,
+                 concurrency=PAGINATOR_CONCURRENCY, min_window=PAGINATOR_MIN_WINDOW):
+        """
+        Args:
+            fetch: function taking inclusive start and end timestamps, in milliseconds, and
+                returning the list of records in that window
+            page_limit: maximum number of records fetch can return at once
+            max_window: largest window the endpoint accepts, in milliseconds
+            time_key: key of the record timestamp, in milliseconds
+            id_key: key of the unique record id, if records have one
+            concurrency: maximum number of windows fetched at once
+            min_window: smallest window, in milliseconds, which is not split any further
+        """
+        self.fetch = fetch
+        self.page_limit = page_limit
+        self.max_window = max_window
+        self.time_key = time_key
+        self.id_key = id_key
+        self.concurrency = concurrency
+        self.min_window = min_window
+
+        self.records_seen = 0
+        self.time_seen = 0
+
+    def iterate(self, start, end):
+        """
+        Yields every record between start and end, sorted by time.
+
+        Args:
+            start: inclusive start timestamp, in milliseconds
+            end: inclusive end timestamp, in milliseconds
+
+        Yields:
+            dict: Records sorted by time_key
+        """
+        next_start = start
+        pending = deque()
+        in_flight = {}
+        completed = []
+        seen = set()
+
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            while next_start <= end or pending or in_flight:
+                while len(in_flight) < self.concurrency and (pending or next_start <= end):
+                    if pending:
+                        window = pending.popleft()
+                    else:
+                        window = (next_start, min(next_start + self.__get_window_size() - 1, end))
+                        next_start = window[1] + 1
+
+                    in_flight[executor.submit(self.fetch, *window)] = window
+
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                for future in done:
+                    window = in_flight.pop(future)
+                    records = future.result()
+
+                    if len(records) >= self.page_limit:
+                        if window[1] - window[0] + 1 <= self.min_window:
+                            raise ValueError(f"The window from {window[0]} to {window[1]} returned a full page of "
+                                             f"{len(records)} records and is too short to split further")
+
+                        middle = (window[0] + window[1]) // 2
+                        pending.extendleft([(middle + 1, window[1]), (window[0], middle)])
+                        continue
+
+                    self.records_seen += len(records)
+                    self.time_seen += window[1] - window[0] + 1
+
+                    # Records of other windows within the range are returned by those windows too
+                    completed.append((window, [record for record in records
+                                               if window[0] <= record[self.time_key] <= window[1]
+                                               or not start <= record[self.time_key] <= end]))
+
+                # Every record before the earliest unfinished window is final
+                frontier = min([window[0] for window in list(in_flight.values()) + list(pending)]
+                               + [next_start if next_start <= end else end + 1])
+
+                ready = [records for window, records in completed if window[1] < frontier]
+                completed = [(window, records) for window, records in completed if window[1] >= frontier]
+
+                for record in sorted((record for records in ready for record in records), key=lambda x: x[self.time_key]):
+                    if self.id_key is None:
+                        yield record
+                    elif record[self.id_key] not in seen:
+                        seen.add(record[self.id_key])
+                        yield record
+
+    """ ============================== Helpers ============================== """
+    def __get_window_size(self):
+        if not self.records_seen:
+            return self.max_window
+
+        density = self.records_seen / self.time_seen
+        target = (self.page_limit // 2) / density
+
+        return int(max(self.min_window, min(self.max_window, target)))
@@ -0,0 +1,102 @@
+import asyncio
+
+from datetime import timedelta
+
+from src.config import PRICING_CONCURRENCY, PRICING_CHUNK_DAYS
+
+
+class AsyncPriceClient():
+    """
+    Async counterpart of BinanceClient and GeckoClient.
+
+    Dates are split into chunks of chunk_days, each priced by one call to the wrapped
+    client's get_average_prices_for_dates on a worker thread, with at most concurrency
+    chunks in flight. Identical (ticker, date, currencies) lookups that are already in
+    flight are shared instead of being requested again.
+    """
+    def __init__(self, client, concurrency=None, chunk_days=None):
+        self.client = client
+        self.concurrency = concurrency or PRICING_CONCURRENCY[client.SOURCE]
+        self.chunk_days = chunk_days or PRICING_CHUNK_DAYS[client.SOURCE]
+
+        self.in_flight = {}
+        self.semaphore = None
+        self.loop = None
+
+    async def get_average_price_for_date(self, ticker, date, currencies=None):
+        """
+        Given a ticker, returns the historical average price for a specific date.
+
+        Args:
+            ticker: string representing cryptocurrency
+            date: datetime object
+            currencies: list of currencies to convert to
+
+        Returns:
+            A dictionary in the same format as the wrapped client's get_average_price_for_date
+        """
+        results = await self.get_average_prices_for_dates(ticker=ticker, dates=[date], currencies=currencies)
+
+        return results[date]
+
+    async def get_average_prices_for_dates(self, ticker, dates, currencies=None):
+        """
+        Given a ticker, concurrently returns the historical average price for many dates.
+
+        Args:
+            ticker: string representing cryptocurrency
+            dates: iterable of datetime objects
+            currencies: list of currencies to convert to
+
+        Returns:
+            A dictionary mapping each date to a dictionary in the same format as the wrapped
+            client's get_average_price_for_date, ordered by date
+        """
+        loop = asyncio.get_running_loop()
+        if self.loop is not loop:
+            self.loop = loop
+            self.semaphore = asyncio.Semaphore(self.concurrency)
+
+        tasks = {}
+        new_dates = []
+        for date in sorted(set(dates)):
+            key = self.__get_key(ticker, date, currencies)
+
+            if key in self.in_flight:
+                tasks[date] = self.in_flight[key]
+            else:
+                new_dates.append(date)
+
+        for chunk in self.__get_chunks(new_dates):
+            task = loop.create_task(self.__fetch(ticker=ticker, dates=chunk, currencies=currencies))
+
+            for date in chunk:
+                self.in_flight[self.__get_key(ticker, date, currencies)] = task
+                tasks[date] = task
+
+        await asyncio.gather(*set(tasks.values()))
+
+        return {date: tasks[date].result()[date] for date in sorted(tasks)}
+
+    """ ============================== Helpers ============================== """
+    async def __fetch(self, ticker, dates, currencies):
+        try:
+            async with self.semaphore:
+                return await asyncio.to_thread(self.client.get_average_prices_for_dates,
+                                               ticker=ticker, dates=dates, currencies=currencies)
+        finally:
+            for date in dates:
+                self.in_flight.pop(self.__get_key(ticker, date, currencies), None)
+
+    def __get_chunks(self, dates):
+        chunks = []
+        for date in dates:
+            if chunks and date - chunks[-1][0] < timedelta(days=self.chunk_days):
+                chunks[-1].append(date)
+            else:
+                chunks.append([date])
+
+        return chunks
+
+    def __get_key(self, ticker, date, currencies):
+        return (ticker, date, tuple(currencies or []))
@@ -0,0 +1,239 @@
+import time
+import inspect
+import threading
+import functools
+
+from bisect import bisect_left
+from contextlib import contextmanager
+from typing import Any, Dict, Iterable
+
+from src.config import PROFILE_LATENCY_BUCKETS
+
+
+enabled = False
+started = None
+stages = {}
+counters = {}
+lock = threading.Lock()
+
+
+class Stage():
+    """
+    Accumulated timings of one instrumented stage.
+
+    Besides the call count and total, minimum and maximum seconds, durations are counted
+    into a histogram whose bucket upper bounds, in milliseconds, are PROFILE_LATENCY_BUCKETS.
+    """
+    __slots__ = ("calls", "seconds", "min_seconds", "max_seconds", "buckets")
+
+    def __init__(self):
+        self.calls = 0
+        self.seconds = 0.0
+        self.min_seconds = None
+        self.max_seconds = 0.0
+        self.buckets = [0] * (len(PROFILE_LATENCY_BUCKETS) + 1)
+
+    def add(self, seconds):
+        self.calls += 1
+        self.seconds += seconds
+        self.min_seconds = seconds if self.min_seconds is None else min(self.min_seconds, seconds)
+        self.max_seconds = max(self.max_seconds, seconds)
+        self.buckets[bisect_left(PROFILE_LATENCY_BUCKETS, seconds * 1000)] += 1
+
+    def to_dict(self):
+        labels = [f"<={bound}ms" for bound in PROFILE_LATENCY_BUCKETS] + [f">{PROFILE_LATENCY_BUCKETS[-1]}ms"]
+
+        return {
+            "calls": self.calls,
+            "seconds": round(self.seconds, 6),
+            "mean_ms": round(self.seconds / self.calls * 1000, 3) if self.calls else 0,
+            "min_ms": round((self.min_seconds or 0) * 1000, 3),
+            "max_ms": round(self.max_seconds * 1000, 3),
+            "histogram": {label: count for label, count in zip(labels, self.buckets) if count},
+        }
+
+
+def enable() -> None:
+    """
+    Turns on instrumentation, discarding anything recorded so far.
+
+    Until it is enabled, every instrumented stage runs untimed.
+    """
+    global enabled, started
+
+    with lock:
+        stages.clear()
+        counters.clear()
+        started = time.perf_counter()
+        enabled = True
+
+
+def observe(name: str, seconds: float) -> None:
+    """
+    Records one duration of a stage.
+
+    Args:
+        name (str): Name of the stage, such as binance.get_average_prices_for_dates
+        seconds (float): Duration to record
+    """
+    if not enabled:
+        return
+
+    with lock:
+        if name not in stages:
+            stages[name] = Stage()
+
+        stages[name].add(seconds)
+
+
+def count(name: str, amount: int=1) -> None:
+    """
+    Adds to a counter, such as cache hits or rows processed.
+
+    Args:
+        name (str): Name of the counter
+        amount (int): Amount to add
+    """
+    if not enabled:
+        return
+
+    with lock:
+        counters[name] = counters.get(name, 0) + amount
+
+
+@contextmanager
+def timed(name: str):
+    """
+    Times the body of a with statement as one call of a stage.
+
+    Args:
+        name (str): Name of the stage
+    """
+    if not enabled:
+        yield
+        return
+
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe(name, time.perf_counter() - start)
+
+
+def timed_iter(name: str, iterable: Iterable, seconds: float=0.0) -> Iterable:
+    """
+    Yields from iterable, timing the work done to produce its items as a stage.
+
+    Time spent by the consumer between items is not counted, so that lazily read or
+    fetched data is attributed to the stage that produces it.
+
+    Args:
+        name (str): Name of the stage
+        iterable (Iterable): Iterable to time
+        seconds (float): Seconds already spent creating iterable
+    """
+    iterator = iter(iterable)
+
+    try:
+        while True:
+            start = time.perf_counter()
+            try:
+                item = next(iterator)
+            except StopIteration:
+                return
+            finally:
+                seconds += time.perf_counter() - start
+
+            yield item
+    finally:
+        observe(name, seconds)
+
+
+def profiled(name: str):
+    """
+    Decorator timing every call of a function as a stage.
+
+    When the function returns a generator, such as a lazily paginated history, the time
+    to exhaust the generator is included, following timed_iter.
+
+    Args:
+        name (str): Name of the stage
+    """
+    def decorator(function):
+        @functools.wraps(function)
+        def wrapper(*args, **kwargs):
+            if not enabled:
+                return function(*args, **kwargs)
+
+            start = time.perf_counter()
+            try:
+                result = function(*args, **kwargs)
+            finally:
+                seconds = time.perf_counter() - start
+
+            if inspect.isgenerator(result):
+                return timed_iter(name, result, seconds=seconds)
+
+            observe(name, seconds)
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def get_report() -> Dict[str, Any]:
+    """
+    Gets everything recorded since instrumentation was enabled.
+
+    Stages nest, such as a price lookup within the pricing of a file, and stages run on
+    worker threads add up their durations across threads, so stage totals can exceed the
+    wall time.
+
+    Returns:
+        Dict[str, Any]: Dictionary of wall_seconds, stages, counters and the counters of
+            every HTTP transport
+    """
+    # Imported here, as the transport is itself instrumented
+    from src.transport import get_transport_stats
+
+    with lock:
+        return {
+            "wall_seconds": round(time.perf_counter() - started, 6) if started is not None else 0,
+            "stages": {name: stage.to_dict() for name, stage in sorted(stages.items())},
+            "counters": dict(sorted(counters.items())),
+            "transports": get_transport_stats(),
+        }
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    """
+    Formats a report from get_report as plain text.
+
+    Args:
+        report (Dict[str, Any]): Report to format
+
+    Returns:
+        str: Human readable report
+    """
+    lines = [f"Wall time: {report['wall_seconds']:.3f}s", "",
+             f"{'Stage':<44}{'Calls':>8}{'Total s':>10}{'Mean ms':>10}{'Max ms':>10}"]
+
+    for name, stage in report["stages"].items():
+        lines.append(f"{name:<44}{stage['calls']:>8}{stage['seconds']:>10.3f}{stage['mean_ms']:>10.2f}{stage['max_ms']:>10.2f}")
+
+        if stage["histogram"]:
+            lines.append("    " + ", ".join(f"{label}: {count}" for label, count in stage["histogram"].items()))
+
+    if report["counters"]:
+        lines += ["", f"{'Counter':<44}{'Value':>8}"]
+        lines += [f"{name:<44}{value:>8}" for name, value in report["counters"].items()]
+
+    if report["transports"]:
+        lines.append("")
+
+    for source, stats in report["transports"].items():
+        lines.append(f"HTTP {source}: " + ", ".join(f"{name}={value}" for name, value in stats.items()))
+
+    return "\n".join(lines)
+
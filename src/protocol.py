@@ -0,0 +1,78 @@
+import json
+import socket
+
+from typing import Any, Dict
+
+from src.config import SERVER_SOCKET
+
+
+def encode(message: Dict) -> bytes:
+    """
+    Encodes a request or response as one line of JSON.
+    """
+    return json.dumps(message, separators=(",", ":")).encode() + b"\n"
+
+
+def decode(line: bytes) -> Dict:
+    """
+    Decodes one line of JSON into a request or response.
+    """
+    message = json.loads(line)
+    if not isinstance(message, dict):
+        raise ValueError("Messages must be JSON objects")
+
+    return message
+
+
+class ServerConnection():
+    """
+    Connection to a tracker server, started with the serve command.
+
+    Requests and responses are JSON objects, one per line, over a Unix socket. Every
+    request has a "command" and the arguments of that command, and every response has
+    "ok" with either a "result" or an "error". A connection can send any number of
+    requests, which the server answers in order.
+    """
+    def __init__(self, socket_path=SERVER_SOCKET):
+        self.socket = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+
+        try:
+            self.socket.connect(socket_path)
+        except OSError:
+            self.socket.close()
+            raise ValueError(f"No tracker server is listening on {socket_path}, start one with serve")
+
+        self.read_file = self.socket.makefile("rb")
+
+    def request(self, command: str, **arguments) -> Any:
+        """
+        Sends a request and waits for its response.
+
+        Args:
+            command (str): Command to run
+            arguments: Arguments of the command
+
+        Returns:
+            Any: Result of the command
+        """
+        self.socket.sendall(encode({"command": command, **arguments}))
+
+        line = self.read_file.readline()
+        if not line:
+            raise ValueError("The tracker server closed the connection")
+
+        response = decode(line)
+        if not response["ok"]:
+            raise ValueError(response["error"])
+
+        return response["result"]
+
+    def close(self) -> None:
+        self.read_file.close()
+        self.socket.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
@@ -0,0 +1,314 @@
+import os
+import re
+import csv
+import json
+import threading
+
+import numpy
+
+from itertools import islice
+from typing import Dict, Iterable, List
+
+from src.config import (DATE, END_DATE, AMOUNT, TXN_FEE, VALUE, TICKER, PERIOD, CURRENCY, TOTAL_AMOUNT, TOTAL_VALUE,
+                        TOTAL_TXN_FEE, ROWS, OUTPUT_EXTENSIONS, OUTPUT_FORMAT_PARQUET, OUTPUT_FORMAT_ARROW,
+                        ROLLUP_CHUNK_ROWS, ROLLUP_SOURCES_SUFFIX)
+
+
+AMOUNT_FIELD = re.compile(re.escape(AMOUNT).replace(r"\{ticker\}", r"(?P<ticker>.+)") + r"\Z")
+VALUE_FIELD = re.compile(re.escape(VALUE).replace(r"\{currency\}", r"(?P<currency>.+)") + r"\Z")
+COLUMNAR_EXTENSIONS = tuple(f".{OUTPUT_EXTENSIONS[output_format]}"
+                            for output_format in (OUTPUT_FORMAT_PARQUET, OUTPUT_FORMAT_ARROW))
+
+
+class Rollup():
+    """
+    Totals of amount, value and fee per ticker, month and currency, across any number of reports.
+
+    Rows are folded into the totals as they are added, so memory only grows with the
+    number of months rather than rows, and a rollup saved earlier can be loaded and have
+    new reports or other rollups merged into it without reading the old reports again.
+    Yearly totals are derived from the monthly ones when saved.
+
+    Totals are kept per source, the absolute path of the report they came from, and are
+    saved next to the rollup in a ROLLUP_SOURCES_SUFFIX file. Adding a report that was
+    already added replaces its totals rather than adding to them, and a report file that
+    has not changed since is skipped, so summarizing or tracking into the same report
+    again never counts its rows twice.
+    """
+    FIELDS = [TICKER, PERIOD, CURRENCY, TOTAL_AMOUNT, TOTAL_VALUE, TOTAL_TXN_FEE, ROWS]
+
+    def __init__(self):
+        # Source to its (ticker, YYYY-MM, currency) to [amount, value, fee, rows]
+        self.sources = {}
+        # Source to the [size, mtime] of the file its totals were read from
+        self.fingerprints = {}
+        self.lock = threading.Lock()
+
+    @classmethod
+    def load(cls, filename):
+        """
+        Loads a rollup saved with save.
+
+        Args:
+            filename (str): Rollup file
+
+        Returns:
+            Rollup: Rollup with the totals of every source of the file
+        """
+        rollup = cls()
+        rollup.add_file(filename=filename)
+
+        return rollup
+
+    @staticmethod
+    def get_source(filename):
+        """
+        Gets the source that rows written to, or read from, a report file are kept under.
+        """
+        return os.path.abspath(filename)
+
+    def discard(self, source):
+        """
+        Drops the totals of a source, before its report is written again from the start.
+
+        Args:
+            source (str): Source, from get_source
+        """
+        with self.lock:
+            self.sources.pop(source, None)
+            self.fingerprints.pop(source, None)
+
+    def add_store(self, ticker, store, source):
+        """
+        Adds the priced rows of a DataStore.
+
+        Args:
+            ticker (str): Ticker of the rows
+            store (DataStore): Priced rows
+            source (str): Source the rows were written to, from get_source
+        """
+        if store:
+            self.add_columns(fields=store.get_fields(ticker=ticker), columns=store.get_columns(), source=source)
+
+    def add_file(self, filename, chunk_rows=ROLLUP_CHUNK_ROWS) -> bool:
+        """
+        Adds a report written by the tracker, as CSV, Parquet or Arrow, or merges a saved rollup.
+
+        Reports are read chunk_rows rows at a time, and replace the totals they were
+        added with before. A report whose size and modification time are unchanged since
+        it was added is skipped.
+
+        Args:
+            filename (str): Report or rollup file
+            chunk_rows (int): Rows to read and total together
+
+        Returns:
+            bool: False if the report was skipped as unchanged, True otherwise
+        """
+        source = self.get_source(filename)
+        status = os.stat(filename)
+        fingerprint = [status.st_size, status.st_mtime_ns]
+
+        if self.fingerprints.get(source) == fingerprint:
+            return False
+
+        if filename.endswith(COLUMNAR_EXTENSIONS):
+            from src.columnar import read_batches
+
+            self.discard(source)
+            for fields, columns in read_batches(filename=filename, batch_rows=chunk_rows):
+                self.add_columns(fields=fields, columns=columns, source=source)
+        else:
+            with open(filename, newline="") as read_file:
+                reader = csv.reader(read_file)
+                fields = next(reader, None)
+
+                if fields == self.FIELDS:
+                    return self.__merge_rollup(filename=filename, rows=reader)
+
+                self.discard(source)
+                while fields is not None:
+                    chunk = list(islice(reader, chunk_rows))
+                    if not chunk:
+                        break
+
+                    self.add_columns(fields=fields, columns=list(zip(*chunk)), source=source)
+
+        with self.lock:
+            self.fingerprints[source] = fingerprint
+
+        return True
+
+    def add_columns(self, fields: List[str], columns: List, source: str):
+        """
+        Adds the columns of a report, as from DataStore.get_columns or a report file.
+
+        The ticker comes from the amount field, and every currency with a value field is
+        totalled, along with its fee field if the report has one.
+
+        Args:
+            fields (List[str]): Field names of the report
+            columns (List): Columns in the same order, with dates as datetimes, datetime64
+                or mm/dd/yyyy strings, and numbers as floats or their strings
+            source (str): Source the columns belong to, from get_source
+        """
+        by_field = dict(zip(fields, columns))
+
+        tickers = [match["ticker"] for match in map(AMOUNT_FIELD.match, fields) if match]
+        if len(tickers) != 1:
+            raise ValueError(f"Expected one amount field in a report, found {len(tickers)}")
+
+        ticker = tickers[0]
+        dates = by_field[DATE] if DATE in by_field else by_field[END_DATE]
+        if not len(dates):
+            return
+
+        # Months as YYYY-MM keys
+        if isinstance(dates[0], str):
+            months = [f"{date[6:10]}-{date[0:2]}" for date in dates]
+        else:
+            months = numpy.array(dates, dtype="datetime64[M]").astype(str).tolist()
+
+        indexes = {}
+        groups = numpy.fromiter((indexes.setdefault(month, len(indexes)) for month in months),
+                                dtype=numpy.intp, count=len(months))
+
+        def sum_by_month(column):
+            return numpy.bincount(groups, weights=numpy.asarray(column, dtype=numpy.float64),
+                                  minlength=len(indexes)).tolist()
+
+        amounts = sum_by_month(by_field[AMOUNT.format(ticker=ticker)])
+        rows = numpy.bincount(groups, minlength=len(indexes)).tolist()
+
+        totals = {}
+        for currency in [match["currency"] for match in map(VALUE_FIELD.match, fields) if match]:
+            fee_field = TXN_FEE.format(currency=currency)
+
+            values = sum_by_month(by_field[VALUE.format(currency=currency)])
+            fees = sum_by_month(by_field[fee_field]) if fee_field in by_field else [0.0] * len(indexes)
+
+            for month, index in indexes.items():
+                totals[(ticker, month, currency)] = [amounts[index], values[index], fees[index], rows[index]]
+
+        self.__merge_totals(source=source, totals=totals)
+
+    def merge(self, other):
+        """
+        Adds the sources of another rollup, replacing any this rollup already has.
+
+        Args:
+            other (Rollup): Rollup to merge
+        """
+        with other.lock:
+            sources = {source: {key: list(total) for key, total in totals.items()}
+                       for source, totals in other.sources.items()}
+            fingerprints = dict(other.fingerprints)
+
+        with self.lock:
+            self.sources.update(sources)
+            for source in sources:
+                self.fingerprints.pop(source, None)
+            self.fingerprints.update(fingerprints)
+
+    def get_totals(self) -> Dict:
+        """
+        Gets the monthly totals of every source together.
+
+        Returns:
+            Dict: Dictionary of each (ticker, YYYY-MM, currency) to [amount, value, fee, rows]
+        """
+        totals = {}
+        with self.lock:
+            for source_totals in self.sources.values():
+                for key, total in source_totals.items():
+                    existing = totals.setdefault(key, [0.0, 0.0, 0.0, 0])
+
+                    for index, amount in enumerate(total):
+                        existing[index] += amount
+
+        return totals
+
+    def get_rows(self) -> Iterable[list]:
+        """
+        Gets the rows of the rollup in FIELDS order, with each year's total followed by its months.
+        """
+        totals = self.get_totals()
+
+        for (ticker, month, currency), total in list(totals.items()):
+            year_total = totals.setdefault((ticker, month[:4], currency), [0.0, 0.0, 0.0, 0])
+            for index, amount in enumerate(total):
+                year_total[index] += amount
+
+        for (ticker, period, currency), total in sorted(totals.items()):
+            yield [ticker, period, currency] + total
+
+    def save(self, filename):
+        """
+        Writes the rollup to a CSV file, and its sources next to it, replacing both atomically.
+
+        Args:
+            filename (str): Rollup file
+        """
+        with open(f"{filename}.tmp", "w", newline="") as write_file:
+            writer = csv.writer(write_file)
+
+            writer.writerow(self.FIELDS)
+            writer.writerows(self.get_rows())
+
+        with self.lock:
+            sources = {
+                source: {
+                    "fingerprint": self.fingerprints.get(source),
+                    "totals": [list(key) + total for key, total in sorted(totals.items())],
+                }
+                for source, totals in self.sources.items()
+            }
+
+        sources_filename = f"{filename}{ROLLUP_SOURCES_SUFFIX}"
+        with open(f"{sources_filename}.tmp", "w") as write_file:
+            json.dump(sources, write_file)
+
+        # The sources are what a rollup is loaded from, so they are replaced last
+        os.replace(f"{filename}.tmp", filename)
+        os.replace(f"{sources_filename}.tmp", sources_filename)
+
+    def __len__(self):
+        return len(self.get_totals())
+
+    """ ============================== Helpers ============================== """
+    def __merge_rollup(self, filename, rows):
+        sources_filename = f"{filename}{ROLLUP_SOURCES_SUFFIX}"
+
+        other = Rollup()
+        if os.path.exists(sources_filename):
+            with open(sources_filename) as read_file:
+                sources = json.load(read_file)
+
+            for source, state in sources.items():
+                other.sources[source] = {(ticker, period, currency): [amount, value, fee, count]
+                                         for ticker, period, currency, amount, value, fee, count in state["totals"]}
+                if state["fingerprint"] is not None:
+                    other.fingerprints[source] = state["fingerprint"]
+        else:
+            # Saved without its sources, so its totals can only be kept as one source of their own
+            totals = {}
+            for ticker, period, currency, amount, value, fee, count in rows:
+                # Yearly rows are derived from the monthly ones
+                if len(period) == len("YYYY-MM"):
+                    totals[(ticker, period, currency)] = [float(amount), float(value), float(fee), int(count)]
+
+            other.sources[self.get_source(filename)] = totals
+
+        self.merge(other)
+
+        return True
+
+    def __merge_totals(self, source, totals: Dict):
+        with self.lock:
+            source_totals = self.sources.setdefault(source, {})
+
+            for key, total in totals.items():
+                existing = source_totals.setdefault(key, [0.0, 0.0, 0.0, 0])
+
+                for index, amount in enumerate(total):
+                    existing[index] += amount
@@ -0,0 +1,311 @@
+import os
+import asyncio
+import threading
+import socketserver
+
+import numpy
+
+from datetime import datetime, timedelta
+from concurrent.futures import Future
+
+from src.fx import RateTable, get_converter, get_native_currencies
+from src.api import BinanceClient, GeckoClient
+from src.models.coin import Coin
+from src.manifest import JOB_KEYS
+from src.pricing import AsyncPriceClient
+from src.protocol import ServerConnection, encode, decode
+from src.profiling import timed, count
+from src.utils import string_to_datetime, datetime_to_string
+from src.config import (FIAT_USD, BINANCE_AIRDROP, COMMAND_BINANCE_REWARDS, SERVER_SOCKET, SERVER_COMMAND_PING,
+                        SERVER_COMMAND_PRICE, SERVER_COMMAND_SHUTDOWN, SERVER_PRICE_SETTLE_DAYS,
+                        PRICE_METHOD_AVERAGE, OUTPUT_FORMAT_CSV)
+
+
+# Keys every request of each command needs
+REQUEST_KEYS = {
+    SERVER_COMMAND_PRICE: ["ticker", "dates"],
+    **JOB_KEYS,
+}
+
+
+class RequestHandler(socketserver.StreamRequestHandler):
+    def handle(self):
+        for line in self.rfile:
+            self.wfile.write(encode(self.server.tracker.handle(line)))
+
+
+class TrackerServer():
+    """
+    Long-running tracker that answers price lookups and reports over a Unix socket.
+
+    One BinanceClient and GeckoClient, with their symbol and coin lists, the exchange
+    rates and the price cache stay loaded between requests, and the prices of days that
+    have settled are also kept in memory, so repeated lookups never reach the price cache
+    or the APIs. Requests run on their own threads, and one that needs prices another is
+    already fetching waits for that fetch instead of repeating it. Requests follow the
+    protocol of ServerConnection, with the commands:
+    - ping: answers "pong"
+    - price: prices of "ticker" on each of "dates", in USD and "currencies"
+    - track-binance-rewards and track-generic-rewards: runs a report from the same keys
+      as a manifest job, and answers its output and number of rows
+    - shutdown: stops the server
+    """
+    def __init__(self, socket_path=SERVER_SOCKET, currencies=None, cache=None, concurrency=None,
+                 price_method=PRICE_METHOD_AVERAGE, output_format=OUTPUT_FORMAT_CSV, compression=None, dataset=None):
+        self.socket_path = socket_path
+        self.currencies = currencies or []
+        self.concurrency = concurrency or {}
+        self.price_method = price_method
+        self.output = {
+            "output_format": output_format,
+            "compression": compression,
+            "dataset": dataset,
+        }
+
+        self.binance = BinanceClient(cache=cache, price_method=price_method)
+        self.gecko = GeckoClient(cache=cache)
+
+        # (ticker, source) to settled prices by date, and ticker to the client it is priced from
+        self.prices = {}
+        self.price_clients = {}
+        # (ticker, source, date, currencies) to the Future of the request fetching it
+        self.in_flight = {}
+        self.rate_table = None
+        self.lock = threading.Lock()
+        self.server = None
+
+    def serve(self) -> None:
+        """
+        Listens on socket_path until a shutdown request or an interrupt.
+        """
+        self.__remove_stale_socket()
+
+        if os.path.dirname(self.socket_path):
+            os.makedirs(os.path.dirname(self.socket_path), exist_ok=True)
+
+        if self.currencies:
+            get_converter()
+
+        self.server = socketserver.ThreadingUnixStreamServer(self.socket_path, RequestHandler)
+        self.server.daemon_threads = True
+        self.server.tracker = self
+
+        print(f"Serving on {self.socket_path}")
+        try:
+            self.server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.server.server_close()
+            os.remove(self.socket_path)
+
+    def handle(self, line: bytes) -> dict:
+        """
+        Runs one request.
+
+        Args:
+            line (bytes): Request, as a line of JSON
+
+        Returns:
+            dict: Response, with either a result or the error the request failed with
+        """
+        count("server.requests")
+
+        try:
+            request = decode(line)
+            command = request.get("command")
+
+            missing = [key for key in REQUEST_KEYS.get(command, []) if key not in request]
+            if missing:
+                raise ValueError(f"Request is missing {', '.join(missing)}")
+
+            if command == SERVER_COMMAND_PING:
+                result = "pong"
+            elif command == SERVER_COMMAND_PRICE:
+                with timed("server.price"):
+                    result = self.get_prices(ticker=request["ticker"], dates=request["dates"],
+                                             currencies=request.get("currencies"))
+            elif command in JOB_KEYS:
+                with timed("server.run_job"):
+                    result = self.run_job(job=request)
+            elif command == SERVER_COMMAND_SHUTDOWN:
+                # shutdown waits for serve_forever to return, so cannot run on a request thread
+                threading.Thread(target=self.server.shutdown).start()
+                result = "stopping"
+            else:
+                raise ValueError(f"Unknown command {command!r}")
+        except Exception as error:
+            return {"ok": False, "error": str(error)}
+
+        return {"ok": True, "result": result}
+
+    def get_prices(self, ticker, dates, currencies=None):
+        """
+        Gets the prices of a ticker for many dates.
+
+        Args:
+            ticker (str): Ticker of the cryptocurrency
+            dates (List[str]): Dates, as mm/dd/yyyy
+            currencies (List[str]): Currencies besides USD, defaults to those the server was started with
+
+        Returns:
+            Dict[str, Dict[str, float]]: Dictionary of each date to its price in each currency
+        """
+        currencies = self.currencies if currencies is None else currencies
+        currencies = [currency.upper() for currency in currencies if currency.upper() != FIAT_USD]
+        dates = [string_to_datetime(date) for date in dates]
+
+        client = self.__get_price_client(ticker)
+        native = get_native_currencies(currencies=currencies, source=client.SOURCE)
+        prices_by_date = self.__get_prices(ticker=ticker, client=client, dates=dates, currencies=native)
+
+        results = {datetime_to_string(date): {currency: prices_by_date[date][currency] for currency in [FIAT_USD] + native}
+                   for date in dates}
+
+        converted = [currency for currency in currencies if currency not in native]
+        if converted and dates:
+            rate_table = self.__get_rate_table(currencies=converted, start_date=min(dates), end_date=max(dates))
+            usd_prices = numpy.array([prices_by_date[date][FIAT_USD] for date in dates])
+
+            for currency in converted:
+                converted_prices = rate_table.convert(prices=usd_prices, currency=currency, dates=dates).tolist()
+
+                for date, price in zip(dates, converted_prices):
+                    results[datetime_to_string(date)][currency] = price
+
+        return results
+
+    def run_job(self, job):
+        """
+        Runs a report, priced from the prices the server keeps.
+
+        Args:
+            job (Dict): Report to run, with the keys of a manifest job, and optionally the
+                output_format, compression and dataset to write it with
+
+        Returns:
+            Dict: Dictionary of the output the report was written to, and its number of rows
+        """
+        output = {key: job.get(key, default) for key, default in self.output.items()}
+        coin = Coin(ticker=job["ticker"], currencies=job.get("currencies", self.currencies),
+                    output_filename=job.get("output"), concurrency=self.concurrency, binance=self.binance,
+                    gecko=self.gecko, price_method=self.price_method, **output)
+
+        if job["command"] == COMMAND_BINANCE_REWARDS:
+            coin.load_income(income_type=job.get("income_type", BINANCE_AIRDROP),
+                             start_date=job["start_date"],
+                             end_date=job["end_date"],
+                             group_by_day=job.get("group_by_day", False))
+        else:
+            coin.price_client = self.__get_price_client(coin.ticker)
+            coin.load_data(input_filename=job["input_filename"])
+
+        if coin.processed_data:
+            native = get_native_currencies(currencies=coin.currencies, source=coin.price_client.SOURCE)
+            coin.apply_prices(prices_by_date=self.__get_prices(ticker=coin.ticker, client=coin.price_client,
+                                                               dates=coin.processed_data.dates, currencies=native))
+        coin.write_to_disk()
+
+        return {
+            "output": os.path.abspath(output["dataset"] or coin.output_filename),
+            "rows": len(coin.processed_data),
+        }
+
+    """ ============================== Helpers ============================== """
+    def __get_price_client(self, ticker):
+        with self.lock:
+            client = self.price_clients.get(ticker)
+
+        # Looked up outside the lock, as it may fetch the symbol list
+        if client is None:
+            client = self.binance if self.binance.is_ticker_on_binance(ticker=ticker) else self.gecko
+
+            with self.lock:
+                client = self.price_clients.setdefault(ticker, client)
+
+        return client
+
+    def __get_prices(self, ticker, client, dates, currencies):
+        requested = [FIAT_USD] + currencies
+
+        # Dates another request is already fetching are waited for instead of being fetched again
+        with self.lock:
+            known = self.prices.setdefault((ticker, client.SOURCE), {})
+            missing = []
+            waiting = {}
+            for date in sorted(set(dates)):
+                key = (ticker, client.SOURCE, date, tuple(currencies))
+
+                if all(currency in known.get(date, {}) for currency in requested):
+                    continue
+                elif key in self.in_flight:
+                    waiting[date] = self.in_flight[key]
+                else:
+                    missing.append(date)
+
+            future = Future()
+            for date in missing:
+                self.in_flight[(ticker, client.SOURCE, date, tuple(currencies))] = future
+
+        if missing:
+            count("server.prices_fetched", len(missing))
+
+            try:
+                pricer = AsyncPriceClient(client=client, concurrency=self.concurrency.get(client.SOURCE))
+                future.set_result(asyncio.run(pricer.get_average_prices_for_dates(ticker=ticker, dates=missing,
+                                                                                  currencies=currencies or None)))
+            except BaseException as error:
+                future.set_exception(error)
+                raise
+            finally:
+                with self.lock:
+                    for date in missing:
+                        self.in_flight.pop((ticker, client.SOURCE, date, tuple(currencies)), None)
+
+        fetched = dict(future.result()) if missing else {}
+        for date, other in waiting.items():
+            prices = other.result()
+            if date in prices:
+                fetched[date] = prices[date]
+
+        with self.lock:
+            # Prices of days that may not have ended everywhere are refetched through the price cache next time
+            settled = datetime.now() - timedelta(days=SERVER_PRICE_SETTLE_DAYS)
+            for date, prices in fetched.items():
+                if date < settled:
+                    known.setdefault(date, {}).update({currency: prices[currency] for currency in requested})
+
+            results = {}
+            for date in dates:
+                if date not in known and date not in fetched:
+                    raise ValueError(f"No price found for {ticker} on {datetime_to_string(date)}")
+
+                results[date] = fetched[date] if date in fetched else dict(known[date])
+
+        return results
+
+    def __get_rate_table(self, currencies, start_date, end_date):
+        # Requests share one table, which grows to cover every currency and span requested so far
+        with self.lock:
+            if self.rate_table is None or not self.rate_table.covers(currencies, start_date, end_date):
+                if self.rate_table is not None:
+                    currencies = sorted(set(currencies) | set(self.rate_table.rates))
+                    start_date = min(start_date, datetime.fromordinal(self.rate_table.start))
+                    end_date = max(end_date, datetime.fromordinal(self.rate_table.end))
+
+                self.rate_table = RateTable(currencies=currencies, start_date=start_date, end_date=end_date)
+
+            return self.rate_table
+
+    def __remove_stale_socket(self):
+        if not os.path.exists(self.socket_path):
+            return
+
+        try:
+            with ServerConnection(socket_path=self.socket_path) as connection:
+                connection.request(SERVER_COMMAND_PING)
+        except ValueError:
+            # Left behind by a server that did not exit cleanly
+            os.remove(self.socket_path)
+        else:
+            raise ValueError(f"A tracker server is already listening on {self.socket_path}")
@@ -0,0 +1,282 @@
+import time
+import random
+import threading
+
+from typing import Dict
+from datetime import datetime, timezone
+from email.utils import parsedate_to_datetime
+from urllib.parse import urlsplit
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from src.profiling import observe
+
+from src.config import (SOURCE_BINANCE, SOURCE_COINGECKO, BINANCE_WEIGHT_LIMIT, BINANCE_WEIGHT_HEADER,
+                        BINANCE_ENDPOINT_WEIGHTS, GECKO_RATE_LIMIT, TRANSPORT_POOL_SIZE, TRANSPORT_MAX_RETRIES,
+                        TRANSPORT_BACKOFF_BASE, TRANSPORT_BACKOFF_MAX)
+
+
+class RateLimiter():
+    """
+    Thread-safe token bucket that refills capacity tokens every period seconds.
+
+    The bucket can be corrected with the usage a server reports, so that requests made
+    elsewhere with the same key or IP are accounted for, and paused when a server asks
+    clients to back off.
+    """
+    def __init__(self, capacity, period=60):
+        self.capacity = capacity
+        self.rate = capacity / period
+
+        self.tokens = capacity
+        self.updated = time.monotonic()
+        self.paused_until = 0
+        self.lock = threading.Lock()
+
+    def acquire(self, tokens=1):
+        """
+        Blocks until tokens are available, then takes them.
+
+        Args:
+            tokens (int): Number of tokens to take
+
+        Returns:
+            float: Seconds spent waiting
+        """
+        waited = 0
+        while True:
+            with self.lock:
+                now = self.__refill()
+                wait = max(self.paused_until - now, (tokens - self.tokens) / self.rate, 0)
+
+                if not wait:
+                    self.tokens -= tokens
+                    return waited
+
+            time.sleep(wait)
+            waited += wait
+
+    def sync(self, used):
+        """
+        Lowers the available tokens to what the server reports as unused.
+
+        Args:
+            used (int): Tokens the server reports as used in the current period
+        """
+        with self.lock:
+            self.__refill()
+            self.tokens = min(self.tokens, self.capacity - used)
+
+    def pause(self, seconds):
+        with self.lock:
+            self.paused_until = max(self.paused_until, time.monotonic() + seconds)
+
+    def __refill(self):
+        now = time.monotonic()
+        self.tokens = min(self.capacity, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+        return now
+
+
+class Transport():
+    """
+    Rate-limited HTTP transport installed onto a client's requests session.
+
+    Connections are pooled on the session's keep-alive adapters. Every request first takes
+    its endpoint's weight in tokens from the limiter, which is kept in sync with the used
+    weight header when the server sends one. Connection errors, 429 and 418 responses and
+    server errors are retried with jittered exponential backoff, honouring Retry-After in
+    seconds or as an HTTP date. While a throttled request waits to be retried, the limiter
+    is paused for as long, so that other threads wait too. Counters of what happened are
+    kept in stats, and the latency of every response is profiled as http.<name>.
+    """
+    RETRY_STATUSES = (418, 429, 500, 502, 503, 504)
+
+    def __init__(self, limiter, weight_header=None, weights=None, max_retries=TRANSPORT_MAX_RETRIES,
+                 backoff_base=TRANSPORT_BACKOFF_BASE, backoff_max=TRANSPORT_BACKOFF_MAX, name="http"):
+        self.limiter = limiter
+        self.weight_header = weight_header
+        # End of an endpoint's path to its weight, any other request weighs 1
+        self.weights = weights or {}
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.name = name
+
+        self.lock = threading.Lock()
+        self.stats = {
+            "requests": 0,
+            "retries": 0,
+            "throttled": 0,
+            "errors": 0,
+            "bytes": 0,
+            "waited_seconds": 0.0,
+            "used_weight": 0,
+        }
+
+    def install(self, session: requests.Session) -> None:
+        """
+        Routes every request of session through this transport.
+
+        Args:
+            session (requests.Session): Session used by a client
+        """
+        # Retries are handled here, so the adapters must not retry on their own
+        adapter = HTTPAdapter(pool_connections=TRANSPORT_POOL_SIZE, pool_maxsize=TRANSPORT_POOL_SIZE, max_retries=0)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        send = session.request
+        session.request = lambda method, url, **kwargs: self.request(send, method, url, **kwargs)
+
+    def request(self, send, method, url, **kwargs) -> requests.Response:
+        """
+        Sends a request, waiting for the rate limit and retrying failures.
+
+        Args:
+            send: Function that sends a request, such as requests.Session.request
+            method (str): HTTP method
+            url (str): URL to request
+
+        Returns:
+            requests.Response: Final response, which may still be an error response
+        """
+        weight = self.__get_weight(url)
+
+        for attempt in range(self.max_retries + 1):
+            self.__count("waited_seconds", self.limiter.acquire(weight))
+            self.__count("requests")
+
+            start = time.perf_counter()
+            try:
+                response = send(method, url, **kwargs)
+            except (requests.ConnectionError, requests.Timeout):
+                self.__count("errors")
+
+                if attempt == self.max_retries:
+                    raise
+
+                self.__count("retries")
+                time.sleep(self.__get_backoff(attempt))
+                continue
+
+            self.__count("bytes", len(response.content))
+            observe(f"http.{self.name}", time.perf_counter() - start)
+
+            if self.weight_header and self.weight_header in response.headers:
+                used = int(response.headers[self.weight_header])
+                self.limiter.sync(used)
+
+                with self.lock:
+                    self.stats["used_weight"] = used
+
+            if response.status_code not in self.RETRY_STATUSES:
+                return response
+
+            if response.status_code in (418, 429):
+                self.__count("throttled")
+            else:
+                self.__count("errors")
+
+            retry_after = self.get_retry_after(response)
+
+            # Bans longer than the backoff cap are not worth waiting out
+            if attempt == self.max_retries or (retry_after or 0) > self.backoff_max:
+                return response
+
+            wait = max(retry_after or 0, self.__get_backoff(attempt))
+            if response.status_code in (418, 429):
+                self.limiter.pause(wait)
+
+            self.__count("retries")
+            time.sleep(wait)
+
+        return response
+
+    def get_retry_after(self, response: requests.Response) -> float:
+        """
+        Gets the seconds a response asks to wait before retrying.
+
+        Args:
+            response (requests.Response): Response, with Retry-After in seconds or as an HTTP date
+
+        Returns:
+            float: Seconds to wait, or None if the response has no usable Retry-After
+        """
+        value = response.headers.get("Retry-After", "").strip()
+        if not value:
+            return None
+
+        try:
+            return max(float(value), 0)
+        except ValueError:
+            pass
+
+        try:
+            retry_at = parsedate_to_datetime(value)
+        except (TypeError, ValueError):
+            return None
+
+        if retry_at.tzinfo is None:
+            retry_at = retry_at.replace(tzinfo=timezone.utc)
+
+        return max((retry_at - datetime.now(timezone.utc)).total_seconds(), 0)
+
+    """ ============================== Helpers ============================== """
+    def __get_weight(self, url):
+        path = urlsplit(url).path.rstrip("/")
+
+        for endpoint, weight in self.weights.items():
+            if path.endswith(endpoint):
+                return weight
+
+        return 1
+
+    def __get_backoff(self, attempt):
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * 2 ** attempt))
+
+    def __count(self, name, amount=1):
+        with self.lock:
+            self.stats[name] += amount
+
+
+transports = {}
+transports_lock = threading.Lock()
+
+
+def get_transport(source: str) -> Transport:
+    """
+    Gets the process-wide transport for a price source, creating it on first use.
+
+    Args:
+        source (str): Price source, such as binance or coingecko
+
+    Returns:
+        Transport: Shared transport of the source
+    """
+    with transports_lock:
+        if source not in transports:
+            if source == SOURCE_BINANCE:
+                transports[source] = Transport(limiter=RateLimiter(capacity=BINANCE_WEIGHT_LIMIT),
+                                               weight_header=BINANCE_WEIGHT_HEADER, weights=BINANCE_ENDPOINT_WEIGHTS,
+                                               name=source)
+            elif source == SOURCE_COINGECKO:
+                transports[source] = Transport(limiter=RateLimiter(capacity=GECKO_RATE_LIMIT), name=source)
+            else:
+                raise ValueError(f"Unknown price source {source}")
+
+        return transports[source]
+
+
+def get_transport_stats() -> Dict[str, Dict]:
+    """
+    Gets the counters of every transport created so far.
+
+    Returns:
+        Dict[str, Dict]: Dictionary of price source to a copy of its counters
+    """
+    with transports_lock:
+        return {source: dict(transport.stats) for source, transport in transports.items()}
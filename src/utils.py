@@ -1,7 +1,7 @@
-import csv
+import re
 
 from collections.abc import Sequence
-from typing import List, Dict, Iterator
+from typing import Iterator, Pattern
 
 from datetime import datetime, timedelta
 
@@ -66,19 +66,6 @@ def datetime_range(start: datetime=None, end: datetime=None) -> Iterator:
             yield start + timedelta(days=i)
 
 
-def calculate_average(nums: List[int]) -> float:
-    """
-    Calculates average for an input list of numbers.
-
-    Args:
-        nums (List[int]): List of numbers
-
-    Returns:
-        float: Average of input list
-    """
-    return sum(nums) / len(nums)
-
-
 def get_timestamp_milliseconds(date: datetime) -> float:
     """
     Gets timestamp, in milliseconds.
@@ -92,24 +79,33 @@ def get_timestamp_milliseconds(date: datetime) -> float:
     return int(datetime.timestamp(date))*1000
 
 
-def write_csv_to_file(field_names: Sequence, output_prefix: str, data_to_write: List[Dict]) -> None:
+def get_output_filename(output_prefix: str) -> str:
     """
-    Writes data to a CSV.
+    Generates an output CSV file name.
 
     Args:
-        field_names (Sequence): Field names of the CSV file
         output_prefix (str): Prefix of the output CSV file name - the name is postfixed
             with the current time in milliseconds
-        data_to_write (List[Dict]): Data to write, list of dictionaries where each dictionary
-            has every element of field_names as keys
+
+    Returns:
+        str: Output CSV file name
+    """
+    return f"{output_prefix}_{get_timestamp_milliseconds(date=datetime.now())}.csv"
+
+
+def compile_operation_matcher(operations: Sequence, prefixes: Sequence=()) -> Pattern:
     """
-    output_file_name = f"{output_prefix}_{get_timestamp_milliseconds(date=datetime.now())}.csv"
-    with open(output_file_name, "w", newline="") as write_file:
-        writer = csv.DictWriter(write_file, fieldnames=field_names)
+    Compiles a pattern that matches operations, either exactly or by prefix.
 
-        writer.writeheader()
+    Args:
+        operations (Sequence): Operations that must match exactly
+        prefixes (Sequence): Prefixes that any matching operation may start with
 
-        for row in data_to_write:
-            writer.writerow(row)
+    Returns:
+        Pattern: Compiled pattern - use its match method on a stripped operation
+    """
+    alternatives = [f"(?:{'|'.join(map(re.escape, operations))})\\Z"] if operations else []
+    if prefixes:
+        alternatives.append("|".join(map(re.escape, prefixes)))
 
-    print(f"CSV File written to {output_file_name}")
+    return re.compile("|".join(alternatives) or "(?!)")
@@ -0,0 +1,78 @@
+import csv
+
+import pytest
+
+from src import fx
+from src.api import BinanceClient
+from src.checkpoint import Checkpoint
+from src.models.coin import Coin
+from src.config import BINANCE_SAVINGS, PRICE_METHOD_AVERAGE, PRICE_METHOD_VWAP
+from benchmarks.fakes import FakeServer, FakeBinanceClient
+
+
+@pytest.fixture
+def binance(tmp_path, monkeypatch):
+    # Rates come from the copy bundled with CurrencyConverter, and every cache is kept in tmp_path
+    monkeypatch.chdir(tmp_path)
+    monkeypatch.setattr(fx, "offline", True)
+
+    return BinanceClient(client=FakeBinanceClient(server=FakeServer()))
+
+
+def track(binance, checkpoint, end_date, currencies=None, price_method=PRICE_METHOD_AVERAGE):
+    coin = Coin(ticker="BNB", currencies=currencies, output_filename="income.csv", binance=binance,
+                price_method=price_method)
+    coin.stream_income(income_type=BINANCE_SAVINGS, start_date="01/01/2021", end_date=end_date,
+                       checkpoint=checkpoint)
+
+    with open("income.csv", newline="") as read_file:
+        return list(csv.reader(read_file))
+
+
+def test_resume_appends_new_rows(binance, tmp_path):
+    first = track(binance, Checkpoint(ticker="BNB", income_type=BINANCE_SAVINGS, directory=tmp_path), "01/10/2021")
+    second = track(binance, Checkpoint(ticker="BNB", income_type=BINANCE_SAVINGS, directory=tmp_path), "01/20/2021")
+
+    assert second[:len(first)] == first
+    assert len(second) == 21
+
+
+def test_resume_with_changed_currencies_rewrites_output(binance, tmp_path):
+    track(binance, Checkpoint(ticker="BNB", income_type=BINANCE_SAVINGS, directory=tmp_path), "01/10/2021")
+
+    checkpoint = Checkpoint(ticker="BNB", income_type=BINANCE_SAVINGS, directory=tmp_path)
+    rows = track(binance, checkpoint, "01/20/2021", currencies=["EUR"])
+
+    assert rows[0][-2:] == ["Average Price (EUR)", "Value (EUR)"]
+    assert len(rows) == 21
+    assert all(len(row) == len(rows[0]) for row in rows)
+    assert checkpoint.fields == rows[0]
+
+
+def test_resume_with_changed_price_method_rewrites_output(binance, tmp_path, capsys):
+    first = track(binance, Checkpoint(ticker="BNB", income_type=BINANCE_SAVINGS, directory=tmp_path), "01/10/2021")
+    capsys.readouterr()
+
+    checkpoint = Checkpoint(ticker="BNB", income_type=BINANCE_SAVINGS, directory=tmp_path)
+    rows = track(binance, checkpoint, "01/10/2021", price_method=PRICE_METHOD_VWAP)
+
+    assert "rewriting income.csv" in capsys.readouterr().out
+    assert len(rows) == len(first)
+    assert checkpoint.price_method == PRICE_METHOD_VWAP
+
+
+def test_is_resumable_requires_same_fields_and_price_method(tmp_path):
+    output_filename = str(tmp_path / "income.csv")
+    (tmp_path / "income.csv").write_text("Date\n")
+
+    checkpoint = Checkpoint(ticker="BNB", income_type=BINANCE_SAVINGS, directory=tmp_path)
+    checkpoint.reset(output_filename=output_filename, start_date="01/01/2021", fields=["Date"],
+                     price_method=PRICE_METHOD_AVERAGE)
+
+    loaded = Checkpoint(ticker="BNB", income_type=BINANCE_SAVINGS, directory=tmp_path)
+    assert loaded.is_resumable(output_filename=output_filename, start_date="01/01/2021", fields=["Date"],
+                               price_method=PRICE_METHOD_AVERAGE)
+    assert not loaded.is_resumable(output_filename=output_filename, start_date="01/01/2021",
+                                   fields=["Date", "Value (EUR)"], price_method=PRICE_METHOD_AVERAGE)
+    assert not loaded.is_resumable(output_filename=output_filename, start_date="01/01/2021", fields=["Date"],
+                                   price_method=PRICE_METHOD_VWAP)
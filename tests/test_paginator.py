@@ -0,0 +1,59 @@
+import pytest
+
+from src.paginator import Paginator
+
+
+def get_fetch(records, overlap=0):
+    """
+    Fetch over records that, like some history endpoints, also returns overlap milliseconds past the window end.
+    """
+    calls = []
+
+    def fetch(start, end):
+        calls.append((start, end))
+        return [record for record in records if start <= record["time"] <= end + overlap]
+
+    fetch.calls = calls
+    return fetch
+
+
+def test_identical_records_within_a_window_are_kept():
+    records = [{"time": 5, "amount": "1"}, {"time": 5, "amount": "1"}, {"time": 9, "amount": "1"}]
+    paginator = Paginator(fetch=get_fetch(records), page_limit=10, max_window=100, time_key="time")
+
+    assert list(paginator.iterate(0, 99)) == records
+
+
+def test_records_on_window_boundaries_are_not_duplicated():
+    records = [{"time": time, "amount": "1"} for time in (3, 10, 10, 20, 29)]
+    fetch = get_fetch(records, overlap=1)
+    paginator = Paginator(fetch=fetch, page_limit=10, max_window=10, time_key="time", concurrency=2)
+
+    assert [record["time"] for record in paginator.iterate(0, 29)] == [3, 10, 10, 20, 29]
+    assert (0, 9) in fetch.calls
+
+
+def test_records_are_deduplicated_by_id():
+    records = [{"id": 1, "time": 5}, {"id": 1, "time": 6}, {"id": 2, "time": 6}]
+    paginator = Paginator(fetch=get_fetch(records), page_limit=10, max_window=100, time_key="time", id_key="id")
+
+    assert [record["id"] for record in paginator.iterate(0, 99)] == [1, 2]
+
+
+def test_full_pages_are_split():
+    records = [{"time": time} for time in range(0, 100, 10)]
+
+    def fetch(start, end):
+        return [record for record in records if start <= record["time"] <= end][:4]
+
+    paginator = Paginator(fetch=fetch, page_limit=4, max_window=100, time_key="time")
+
+    assert list(paginator.iterate(0, 99)) == records
+
+
+def test_full_page_in_the_shortest_window_raises():
+    records = [{"time": 5, "amount": "1"}] * 4
+    paginator = Paginator(fetch=get_fetch(records), page_limit=4, max_window=100, time_key="time")
+
+    with pytest.raises(ValueError):
+        list(paginator.iterate(0, 99))
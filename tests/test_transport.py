@@ -0,0 +1,98 @@
+import time
+
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import pytest
+import requests
+
+from src.transport import RateLimiter, Transport
+
+
+class RecordingLimiter(RateLimiter):
+    def __init__(self):
+        super().__init__(capacity=1000)
+        self.acquired = []
+        self.pauses = []
+
+    def acquire(self, tokens=1):
+        self.acquired.append(tokens)
+        return 0
+
+    def pause(self, seconds):
+        self.pauses.append(seconds)
+
+
+def get_response(status_code, headers=None):
+    response = requests.Response()
+    response.status_code = status_code
+    response.headers.update(headers or {})
+    response._content = b""
+
+    return response
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    monkeypatch.setattr(time, "sleep", lambda seconds: None)
+
+    return Transport(limiter=RecordingLimiter(), weights={"/api/v3/klines": 2}, max_retries=2, backoff_max=60)
+
+
+@pytest.mark.parametrize("value, expected", [
+    ("120", 120),
+    (" 1.5 ", 1.5),
+    ("-3", 0),
+    ("Wed, 21 Oct 2015 07:28:00 GMT", 0),
+    ("soon", None),
+    ("", None),
+])
+def test_retry_after(transport, value, expected):
+    assert transport.get_retry_after(get_response(429, {"Retry-After": value})) == expected
+
+
+def test_retry_after_http_date(transport):
+    retry_at = datetime.now(timezone.utc) + timedelta(seconds=90)
+    retry_after = transport.get_retry_after(get_response(429, {"Retry-After": format_datetime(retry_at, usegmt=True)}))
+
+    assert 85 <= retry_after <= 90
+
+
+def test_retry_after_missing(transport):
+    assert transport.get_retry_after(get_response(429)) is None
+
+
+def test_throttled_request_is_retried_after_pausing_the_limiter(transport):
+    responses = iter([get_response(429, {"Retry-After": "2"}), get_response(200)])
+    response = transport.request(lambda method, url, **kwargs: next(responses), "GET", "https://api.binance.com/api/v3/ping")
+
+    assert response.status_code == 200
+    assert transport.limiter.pauses == [2]
+    assert transport.stats["retries"] == 1
+
+
+def test_malformed_retry_after_falls_back_to_backoff(transport):
+    responses = iter([get_response(429, {"Retry-After": "soon"}), get_response(200)])
+    response = transport.request(lambda method, url, **kwargs: next(responses), "GET", "https://api.binance.com/api/v3/ping")
+
+    assert response.status_code == 200
+    assert len(transport.limiter.pauses) == 1
+    assert 0 <= transport.limiter.pauses[0] <= transport.backoff_base
+
+
+def test_ban_longer_than_backoff_is_not_waited_out(transport):
+    ban = get_response(418, {"Retry-After": "600"})
+    response = transport.request(lambda method, url, **kwargs: ban, "GET", "https://api.binance.com/api/v3/ping")
+
+    assert response is ban
+    assert transport.limiter.pauses == []
+    assert transport.stats["retries"] == 0
+
+
+def test_requests_take_their_endpoint_weight(transport):
+    send = lambda method, url, **kwargs: get_response(200)
+
+    transport.request(send, "GET", "https://api.binance.com/api/v3/klines")
+    transport.request(send, "GET", "https://api.binance.com/api/v3/ping")
+
+    assert transport.limiter.acquired == [2, 1]